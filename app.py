@@ -1,9 +1,18 @@
+import hashlib
+import io
+
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
 import numpy as np
 
+from recoveriq.aggregate import KpiAggregate
+from recoveriq.engine import (compute_levers, compute_risks, compute_scatter, compute_score,
+                              generate_demo_data)
+from recoveriq.compressed import SUFFIXES, open_upload
+from recoveriq.ingest import read_upload
+
 st.set_page_config(
     page_title="RecoverIQ | Collections Intelligence",
     page_icon="⚡", layout="wide",
@@ -175,60 +184,41 @@ html, body, [data-testid="stAppViewContainer"] {
 """, unsafe_allow_html=True)
 
 # ── Demo data ─────────────────────────────────────────────────────────────────
-def generate_demo_data(n=500):
-    rng = np.random.default_rng(42)
-    dispositions = rng.choice(
-        ["PTP","RTP","Not_Evaluated","Callback","Connected_No_Outcome","Unreachable"],
-        size=n, p=[0.22,0.12,0.18,0.15,0.13,0.20])
-    states    = rng.choice(["active","inactive","completed"], size=n, p=[0.55,0.25,0.20])
-    attempted = rng.integers(1, 16, size=n)
-    connected = np.minimum(np.where(
-        np.isin(dispositions, ["PTP","Callback","Connected_No_Outcome"]),
-        rng.integers(1, attempted+1), rng.integers(0, 3, size=n)), attempted)
-    return pd.DataFrame({
-        "Lead_ID": [f"L{10000+i}" for i in range(n)],
-        "Lead_Entity_Disposition": dispositions, "Lead_State": states,
-        "AI_Attempted_Calls": attempted, "AI_Connected_Calls": connected,
-        "Total_Spend_INR": rng.uniform(5, 45, size=n).round(2),
-    })
-
-# ── KPI computation ───────────────────────────────────────────────────────────
-def compute_kpis(df):
-    t   = len(df)
-    ptp = int((df["Lead_Entity_Disposition"]=="PTP").sum())
-    cn  = int((df["AI_Connected_Calls"]>0).sum())
-    att = int((df["AI_Attempted_Calls"]>0).sum())
-    act = int((df["Lead_State"]=="active").sum())
-    sp  = float(df["Total_Spend_INR"].sum())
-    cm  = df["AI_Connected_Calls"]>0
+demo_data = st.cache_data(show_spinner=False)(generate_demo_data)
+
+# ── Cached compute ────────────────────────────────────────────────────────────
+# Everything derived from the frame is memoised on the dataset fingerprint (a
+# content hash), so widget reruns reuse it instead of re-aggregating.  The frame
+# itself is passed as ``_df``, which Streamlit leaves out of the cache key.
+DEMO_FP = "demo-500"
+CACHE_ENTRIES = 8
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+def analyse(fp, _df):
+    agg = KpiAggregate.from_frame(_df)
+    k = agg.kpis()
+    # Every tally below is a rollup of the aggregate's segment cube, not a pass over the rows
+    calls = agg.disp_calls
+    grp = pd.DataFrame({"Lead_Entity_Disposition": list(calls),
+                        "connected": [agg.disp_connected.get(d, 0) for d in calls],
+                        "total": list(calls.values())})
+    grp["not_conn"] = grp["total"] - grp["connected"]
+    disp_vc = pd.DataFrame(list(agg.dispositions.items()), columns=["Disposition","Count"])
+    att_labels, att_counts = agg.attempt_distribution()
+    sunburst = agg.cube.rollup("state", "disposition")
     return dict(
-        total=t, ptp_count=ptp, ptp_pct=ptp/t*100,
-        connected_leads=cn, connection_rate=cn/t*100,
-        attempted_leads=att, active_count=act, active_pct=act/t*100,
-        total_spend=sp, cost_per_ptp=sp/ptp if ptp else 0,
-        avg_attempts=float(df["AI_Attempted_Calls"].mean()),
-        avg_conn=float(df.loc[cm,"AI_Attempted_Calls"].mean()) if cm.sum() else 0,
-        avg_no_conn=float(df.loc[~cm,"AI_Attempted_Calls"].mean()) if (~cm).sum() else 0,
-        attempt_eff=cn/att*100 if att else 0,
-        completed=int((df["Lead_State"]=="completed").sum()),
-        ne_count=int((df["Lead_Entity_Disposition"]=="Not_Evaluated").sum()),
-        ne_pct=(df["Lead_Entity_Disposition"]=="Not_Evaluated").sum()/t*100,
-        overatt=int(((df["AI_Attempted_Calls"]>12)&(df["AI_Connected_Calls"]==0)).sum()),
-        overatt_pct=((df["AI_Attempted_Calls"]>12)&(df["AI_Connected_Calls"]==0)).sum()/t*100,
-        smean=float(df["Total_Spend_INR"].mean()),
-        sstd=float(df["Total_Spend_INR"].std()),
-        outliers=int((df["Total_Spend_INR"]>df["Total_Spend_INR"].mean()+2*df["Total_Spend_INR"].std()).sum()),
+        k=k, score=compute_score(k), risks=compute_risks(k), levers=compute_levers(k),
+        states=pd.Series(agg.states),
+        conn_by_disp=grp, disp_vc=disp_vc,
+        scatter=compute_scatter(_df, agg),
+        att_vc=pd.Series(att_counts, index=att_labels),
+        spend_hist=agg.spend_histogram(16),
+        sunburst=pd.DataFrame([(s, d, n) for (s, d), n in sunburst.items()],
+                              columns=["Lead_State", "Lead_Entity_Disposition", "count"]),
     )
 
-def compute_score(k):
-    ps = min(k["ptp_pct"]/25*10,10); cs=min(k["connection_rate"]/60*10,10)
-    a  = max(0,10-max(0,(k["active_pct"]-50)/50*10))
-    co = min(150/k["cost_per_ptp"]*10,10) if k["cost_per_ptp"] else 0
-    sc = round(ps*.4+cs*.3+a*.15+co*.15, 1)
-    if sc>=7: grade,col="#22c55e","Strong"
-    elif sc>=4: grade,col="#f59e0b","Needs Optimization"
-    else: grade,col="#ef4444","At Risk"
-    return sc, col, grade, dict(ptp=round(ps*.4,2),conn=round(cs*.3,2),act=round(a*.15,2),cost=round(co*.15,2))
+def use_frame(df, fp, lbl):
+    st.session_state.df, st.session_state.fp, st.session_state.lbl = df, fp, lbl
 
 # ── Plotly theme ──────────────────────────────────────────────────────────────
 PLY = dict(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)",
@@ -238,10 +228,213 @@ PLY = dict(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)",
 DISP_C = dict(PTP="#22c55e",RTP="#ef4444",Not_Evaluated="#f59e0b",
               Callback="#3b82f6",Connected_No_Outcome="#a855f7",Unreachable="#475569")
 
+# ── Cached figures ────────────────────────────────────────────────────────────
+# Every chart's Plotly spec is built once per dataset fingerprint as well, from
+# the cached aggregates, and kept as the plain dict st.plotly_chart draws; a
+# rerun on the same data rebuilds no figure.
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+def figures(fp, _a):
+    a = _a
+    k, s = a["k"], a["score"]
+    score, score_col = s["value"], s["color"]
+    figs = {}
+
+    # Gauge chart
+    fig_gauge = go.Figure(go.Indicator(
+        mode="gauge+number+delta",
+        value=score,
+        delta={"reference": 5, "valueformat": ".1f",
+               "font": {"size": 14, "color": "#94a3b8"}},
+        number={"font": {"size": 48, "color": score_col, "family": "Inter"},
+                "suffix": "/10"},
+        gauge={
+            "axis": {"range": [0,10], "tickwidth": 1, "tickcolor": "#1a3050",
+                     "tickfont": {"color": "#475569", "size": 10}},
+            "bar":  {"color": score_col, "thickness": 0.2},
+            "bgcolor": "rgba(0,0,0,0)", "borderwidth": 0,
+            "steps": [
+                {"range": [0,4],  "color": "rgba(239,68,68,0.07)"},
+                {"range": [4,7],  "color": "rgba(245,158,11,0.07)"},
+                {"range": [7,10], "color": "rgba(34,197,94,0.07)"},
+            ],
+            "threshold": {"line": {"color": score_col, "width": 2}, "thickness": 0.7, "value": score},
+        },
+    ))
+    fig_gauge.update_layout(**PLY, height=220)
+    figs["gauge"] = fig_gauge
+
+    # Score breakdown horizontal bar
+    labels_s = ["PTP Rate (40%)", "Connection (30%)", "Active Mgmt (15%)", "Cost Eff. (15%)"]
+    vals_s   = list(s["components"].values())
+    maxs_s   = s["max_scores"]
+    cols_s   = ["#3b82f6", "#22c55e", "#a855f7", "#c9a84c"]
+
+    fig_sb = go.Figure()
+    fig_sb.add_trace(go.Bar(x=maxs_s, y=labels_s, orientation="h",
+        marker_color=[c+"18" for c in cols_s], showlegend=False, hoverinfo="skip",
+        marker=dict(cornerradius=4)))
+    fig_sb.add_trace(go.Bar(x=vals_s, y=labels_s, orientation="h",
+        marker_color=cols_s, showlegend=False,
+        text=[f"{v:.2f}/{m}" for v,m in zip(vals_s,maxs_s)],
+        textposition="outside", textfont=dict(color="#94a3b8", size=11),
+        marker=dict(cornerradius=4)))
+    fig_sb.update_layout(**PLY, barmode="overlay", height=220,
+        title=dict(text="Score Component Breakdown", font=dict(size=12, color="#475569"), x=0),
+        xaxis=dict(range=[0,4.6], showgrid=False, zeroline=False, showticklabels=False),
+        yaxis=dict(showgrid=False, color="#94a3b8"),
+    )
+    figs["score_breakdown"] = fig_sb
+
+    # Lead state donut
+    state_counts = a["states"]
+    fig_state = go.Figure(go.Pie(
+        labels=state_counts.index, values=state_counts.values, hole=0.58,
+        marker_colors=["#3b82f6", "#475569", "#22c55e"],
+        textinfo="percent+label", textfont=dict(color="#e8edf5", size=11),
+        hovertemplate="%{label}: %{value:,} (%{percent})<extra></extra>",
+    ))
+    fig_state.update_layout(**PLY, height=200,
+        title=dict(text="Lead State Distribution", font=dict(size=12, color="#475569"), x=0),
+        showlegend=False)
+    figs["states"] = fig_state
+
+    # Conversion funnel
+    stages_f = ["Total Leads","Attempted","Connected","PTP","Completed"]
+    vals_f   = [k["total"], k["attempted_leads"], k["connected_leads"], k["ptp_count"], k["completed_leads"]]
+    f_colors = ["#0f2035","#122540","#0f2d3a","#14302a","#0d2535"]
+    f_borders= ["#3b82f6","#6366f1","#22c55e","#c9a84c","#06b6d4"]
+    fig_fun = go.Figure(go.Funnel(
+        y=stages_f, x=vals_f,
+        textinfo="value+percent initial",
+        textfont=dict(color="#e8edf5", size=12),
+        marker=dict(color=f_colors, line=dict(color=f_borders, width=2)),
+        connector=dict(line=dict(color="#122030", width=1)),
+    ))
+    fig_fun.update_layout(**PLY, height=340,
+        title=dict(text="Campaign Conversion Funnel", font=dict(size=12, color="#475569"), x=0))
+    figs["funnel"] = fig_fun
+
+    # Connection by disposition (stacked bar)
+    grp = a["conn_by_disp"]
+    fig_cdisp = go.Figure()
+    fig_cdisp.add_trace(go.Bar(name="Connected",     x=grp["Lead_Entity_Disposition"], y=grp["connected"],
+        marker_color="#22c55ebb", marker=dict(line=dict(color="#22c55e",width=1)), marker_cornerradius=3))
+    fig_cdisp.add_trace(go.Bar(name="Not Connected", x=grp["Lead_Entity_Disposition"], y=grp["not_conn"],
+        marker_color="#ef4444bb", marker=dict(line=dict(color="#ef4444",width=1)), marker_cornerradius=3))
+    fig_cdisp.update_layout(**PLY, barmode="stack", height=240,
+        title=dict(text="Connection Rate by Disposition", font=dict(size=12, color="#475569"), x=0),
+        xaxis=dict(showgrid=False, color="#94a3b8"),
+        yaxis=dict(showgrid=True, gridcolor="#122030", color="#94a3b8"),
+        legend=dict(font=dict(color="#94a3b8", size=11), bgcolor="rgba(0,0,0,0)"))
+    figs["conn_by_disp"] = fig_cdisp
+
+    # Disposition bar + donut
+    disp_vc = a["disp_vc"]
+    d_cols  = [DISP_C.get(d,"#475569") for d in disp_vc["Disposition"]]
+    fig_bar = go.Figure(go.Bar(
+        x=disp_vc["Disposition"], y=disp_vc["Count"],
+        marker_color=[c+"aa" for c in d_cols],
+        marker=dict(line=dict(color=d_cols,width=1.5), cornerradius=4),
+        text=disp_vc["Count"], textposition="outside", textfont=dict(color="#94a3b8",size=11),
+    ))
+    fig_bar.update_layout(**PLY, height=260,
+        title=dict(text="Disposition Distribution", font=dict(size=12,color="#475569"),x=0),
+        xaxis=dict(showgrid=False,color="#94a3b8"),
+        yaxis=dict(showgrid=True,gridcolor="#122030",color="#94a3b8"), showlegend=False)
+    figs["dispositions"] = fig_bar
+
+    fig_dn = go.Figure(go.Pie(
+        labels=disp_vc["Disposition"], values=disp_vc["Count"], hole=0.58,
+        marker_colors=[c+"bb" for c in d_cols],
+        marker=dict(line=dict(color=d_cols,width=1.5)),
+        textinfo="percent", textfont=dict(color="#e8edf5",size=11),
+        hovertemplate="%{label}: %{value:,}<extra></extra>",
+    ))
+    fig_dn.update_layout(**PLY, height=260,
+        title=dict(text="Disposition Mix", font=dict(size=12,color="#475569"),x=0),
+        showlegend=True, legend=dict(font=dict(color="#94a3b8",size=10),bgcolor="rgba(0,0,0,0)"))
+    figs["disposition_mix"] = fig_dn
+
+    # Scatter: attempts vs spend, coloured by disposition
+    # (every lead for small campaigns, else exact density cells sized by lead count)
+    sc = a["scatter"]
+    dense = sc["mode"] == "density"
+    pts = sc["cells"] if dense else sc
+    d_idx = np.asarray(pts["d"], dtype=int)
+    top = max(pts["n"]) if dense and pts["n"] else 1
+    fig_sc = go.Figure()
+    for i, disp in enumerate(sc["dispositions"]):
+        m = d_idx == i
+        x, y = np.asarray(pts["x"])[m], np.asarray(pts["y"])[m]
+        n = np.asarray(pts["n"])[m] if dense else None
+        fig_sc.add_trace(go.Scatter(
+            x=x, y=y, customdata=n,
+            mode="markers", name=disp.replace("_"," "),
+            marker=dict(color=DISP_C.get(disp,"#475569"), opacity=0.7, line=dict(width=0),
+                        size=3 + 14*np.sqrt(n/top) if dense else 5),
+            hovertemplate=f"<b>{disp}</b><br>Attempts: %{{x}}<br>Spend: ₹%{{y:.2f}}"
+                          + ("<br>Leads: %{customdata:,}" if dense else "") + "<extra></extra>",
+        ))
+    if dense and sc["outliers"]["x"]:
+        fig_sc.add_trace(go.Scatter(
+            x=sc["outliers"]["x"], y=sc["outliers"]["y"], mode="markers", name="Cost outliers",
+            marker=dict(symbol="x-thin", size=7, line=dict(color="#ef4444", width=1.5)),
+            hovertemplate="<b>Cost outlier</b><br>Attempts: %{x}<br>Spend: ₹%{y:.2f}<extra></extra>",
+        ))
+    fig_sc.update_layout(**PLY, height=300,
+        title=dict(text="Spend vs AI Attempts" + (" (lead density)" if dense else ""), font=dict(size=12,color="#475569"),x=0),
+        xaxis=dict(title="AI Attempts", showgrid=True, gridcolor="#122030", color="#94a3b8"),
+        yaxis=dict(title="Spend (₹)",   showgrid=True, gridcolor="#122030", color="#94a3b8"),
+        legend=dict(font=dict(color="#94a3b8",size=10), bgcolor="rgba(0,0,0,0)"),
+    )
+    figs["scatter"] = fig_sc
+
+    # Attempt distribution histogram
+    att_vc = a["att_vc"]
+    fig_att = go.Figure(go.Bar(
+        x=att_vc.index, y=att_vc.values,
+        marker_color=[f"hsl({220-i/len(att_vc)*60:.0f},65%,58%)" for i in range(len(att_vc))],
+        marker=dict(cornerradius=3),
+    ))
+    fig_att.update_layout(**PLY, height=300,
+        title=dict(text="Attempt Count Distribution", font=dict(size=12,color="#475569"),x=0),
+        xaxis=dict(title="Attempts", showgrid=False, color="#94a3b8"),
+        yaxis=dict(title="Leads",    showgrid=True,  gridcolor="#122030", color="#94a3b8"),
+        showlegend=False,
+    )
+    figs["attempts"] = fig_att
+
+    # Spend distribution histogram
+    sp_counts, sp_edges = a["spend_hist"]
+    fig_sp = go.Figure(go.Bar(
+        x=(sp_edges[:-1] + sp_edges[1:]) / 2, y=sp_counts, width=np.diff(sp_edges),
+        marker_color="#c9a84c", marker_line_color="#8a6f2e", marker_line_width=1, opacity=0.8,
+        marker=dict(cornerradius=3),
+    ))
+    fig_sp.update_layout(**PLY, height=280,
+        title=dict(text="Spend Distribution per Lead", font=dict(size=12,color="#475569"),x=0),
+        xaxis=dict(title="Spend (₹)", showgrid=False, color="#94a3b8"),
+        yaxis=dict(title="Leads",     showgrid=True,  gridcolor="#122030", color="#94a3b8"),
+        showlegend=False,
+    )
+    figs["spend"] = fig_sp
+
+    # Sunburst: state × disposition
+    sun_df = a["sunburst"]
+    fig_sun = px.sunburst(sun_df, path=["Lead_State","Lead_Entity_Disposition"], values="count",
+        color="Lead_State",
+        color_discrete_map={"active":"#3b82f6","inactive":"#475569","completed":"#22c55e"})
+    fig_sun.update_traces(textfont=dict(color="#e8edf5",size=11), insidetextorientation="radial",
+                          marker=dict(line=dict(color="#0f1f35",width=1.5)))
+    fig_sun.update_layout(**PLY, height=280,
+        title=dict(text="Lead State × Disposition Breakdown", font=dict(size=12,color="#475569"),x=0))
+    figs["sunburst"] = fig_sun
+
+    return {name: fig.to_dict() for name, fig in figs.items()}
+
 # ── Session — auto-load demo ──────────────────────────────────────────────────
 if "df" not in st.session_state:
-    st.session_state.df = generate_demo_data()
-    st.session_state.lbl = "Demo Data · 500 leads"
+    use_frame(demo_data(), DEMO_FP, "Demo Data · 500 leads")
 
 # ── Sidebar ───────────────────────────────────────────────────────────────────
 with st.sidebar:
@@ -257,31 +450,27 @@ with st.sidebar:
     </div>
     """, unsafe_allow_html=True)
 
-    uploaded = st.file_uploader("Upload CSV", type=["csv"], label_visibility="collapsed",
+    uploaded = st.file_uploader("Upload CSV", type=list(SUFFIXES), label_visibility="collapsed",
         help="Required: Lead_Entity_Disposition, Lead_State, AI_Attempted_Calls, AI_Connected_Calls, Total_Spend_INR")
     if st.button("↺  Reset to Demo Data", use_container_width=True):
-        st.session_state.df = generate_demo_data()
-        st.session_state.lbl = "Demo Data · 500 leads"
+        use_frame(demo_data(), DEMO_FP, "Demo Data · 500 leads")
         st.rerun()
 
-    if uploaded:
+    # Parse an upload once; reruns with the same file still selected keep the loaded frame
+    if uploaded and uploaded.file_id != st.session_state.get("upload_id"):
         try:
-            raw = pd.read_csv(uploaded)
-            if "Total_Spend (INR)" in raw.columns:
-                raw = raw.rename(columns={"Total_Spend (INR)":"Total_Spend_INR"})
-            req = {"Lead_Entity_Disposition","Lead_State","AI_Attempted_Calls","AI_Connected_Calls","Total_Spend_INR"}
-            miss = req - set(raw.columns)
-            if miss: st.error(f"Missing: {', '.join(miss)}")
-            else:
-                st.session_state.df = raw
-                st.session_state.lbl = f"{uploaded.name} · {len(raw):,} leads"
-                st.rerun()
+            data = uploaded.getvalue()
+            raw  = read_upload(open_upload(io.BytesIO(data)))
+            st.session_state.upload_id = uploaded.file_id
+            use_frame(raw, hashlib.sha256(data).hexdigest(), f"{uploaded.name} · {len(raw):,} leads")
+            st.rerun()
         except Exception as e:
             st.error(str(e))
 
     if st.session_state.df is not None:
-        kb = compute_kpis(st.session_state.df)
-        sc, _, _, _ = compute_score(kb)
+        ab = analyse(st.session_state.fp, st.session_state.df)
+        kb = ab["k"]
+        sc = ab["score"]["value"]
         st.markdown("---")
         st.markdown(f"""
         <div style="font-size:10px;color:#475569;margin-bottom:8px;text-transform:uppercase;letter-spacing:0.7px">Live Snapshot</div>
@@ -297,8 +486,11 @@ with st.sidebar:
 
 # ── Data ──────────────────────────────────────────────────────────────────────
 df = st.session_state.df
-k  = compute_kpis(df)
-score, score_col, grade, comps = compute_score(k)
+a  = analyse(st.session_state.fp, df)
+figs = figures(st.session_state.fp, a)
+k  = a["k"]
+s  = a["score"]
+score, score_col, grade = s["value"], s["color"], s["grade"]
 
 # ── Header ────────────────────────────────────────────────────────────────────
 lbl = st.session_state.get("lbl", "Demo Data")
@@ -356,7 +548,7 @@ st.markdown(f"""
   {hp("Connection", f"{k['connection_rate']:.1f}%", "50%", "30%")}
   {hp("Cost/PTP", f"₹{k['cost_per_ptp']:.0f}", "₹150", "₹300", True)}
   {hp("Active", f"{k['active_pct']:.1f}%", "50%", "70%", True)}
-  {hp("Attempt Eff.", f"{k['attempt_eff']:.1f}%", "50%", "30%")}
+  {hp("Attempt Eff.", f"{k['attempt_efficiency']:.1f}%", "50%", "30%")}
   {hp("Score", f"{score}/10", "7/10", "4/10")}
 </div>""", unsafe_allow_html=True)
 
@@ -378,65 +570,12 @@ with c1:
     </div>""", unsafe_allow_html=True)
 
 with c2:
-    # Gauge chart
-    fig_gauge = go.Figure(go.Indicator(
-        mode="gauge+number+delta",
-        value=score,
-        delta={"reference": 5, "valueformat": ".1f",
-               "font": {"size": 14, "color": "#94a3b8"}},
-        number={"font": {"size": 48, "color": score_col, "family": "Inter"},
-                "suffix": "/10"},
-        gauge={
-            "axis": {"range": [0,10], "tickwidth": 1, "tickcolor": "#1a3050",
-                     "tickfont": {"color": "#475569", "size": 10}},
-            "bar":  {"color": score_col, "thickness": 0.2},
-            "bgcolor": "rgba(0,0,0,0)", "borderwidth": 0,
-            "steps": [
-                {"range": [0,4],  "color": "rgba(239,68,68,0.07)"},
-                {"range": [4,7],  "color": "rgba(245,158,11,0.07)"},
-                {"range": [7,10], "color": "rgba(34,197,94,0.07)"},
-            ],
-            "threshold": {"line": {"color": score_col, "width": 2}, "thickness": 0.7, "value": score},
-        },
-    ))
-    fig_gauge.update_layout(**PLY, height=220)
-    st.plotly_chart(fig_gauge, use_container_width=True, config={"displayModeBar": False})
+    st.plotly_chart(figs["gauge"], use_container_width=True, config={"displayModeBar": False})
 
 with c3:
-    # Score breakdown horizontal bar
-    labels_s = ["PTP Rate (40%)", "Connection (30%)", "Active Mgmt (15%)", "Cost Eff. (15%)"]
-    vals_s   = [comps["ptp"], comps["conn"], comps["act"], comps["cost"]]
-    maxs_s   = [4.0, 3.0, 1.5, 1.5]
-    cols_s   = ["#3b82f6", "#22c55e", "#a855f7", "#c9a84c"]
+    st.plotly_chart(figs["score_breakdown"], use_container_width=True, config={"displayModeBar": False})
 
-    fig_sb = go.Figure()
-    fig_sb.add_trace(go.Bar(x=maxs_s, y=labels_s, orientation="h",
-        marker_color=[c+"18" for c in cols_s], showlegend=False, hoverinfo="skip",
-        marker=dict(cornerradius=4)))
-    fig_sb.add_trace(go.Bar(x=vals_s, y=labels_s, orientation="h",
-        marker_color=cols_s, showlegend=False,
-        text=[f"{v:.2f}/{m}" for v,m in zip(vals_s,maxs_s)],
-        textposition="outside", textfont=dict(color="#94a3b8", size=11),
-        marker=dict(cornerradius=4)))
-    fig_sb.update_layout(**PLY, barmode="overlay", height=220,
-        title=dict(text="Score Component Breakdown", font=dict(size=12, color="#475569"), x=0),
-        xaxis=dict(range=[0,4.6], showgrid=False, zeroline=False, showticklabels=False),
-        yaxis=dict(showgrid=False, color="#94a3b8"),
-    )
-    st.plotly_chart(fig_sb, use_container_width=True, config={"displayModeBar": False})
-
-# Lead state donut
-state_counts = df["Lead_State"].value_counts()
-fig_state = go.Figure(go.Pie(
-    labels=state_counts.index, values=state_counts.values, hole=0.58,
-    marker_colors=["#3b82f6", "#475569", "#22c55e"],
-    textinfo="percent+label", textfont=dict(color="#e8edf5", size=11),
-    hovertemplate="%{label}: %{value:,} (%{percent})<extra></extra>",
-))
-fig_state.update_layout(**PLY, height=200,
-    title=dict(text="Lead State Distribution", font=dict(size=12, color="#475569"), x=0),
-    showlegend=False)
-st.plotly_chart(fig_state, use_container_width=True, config={"displayModeBar": False})
+st.plotly_chart(figs["states"], use_container_width=True, config={"displayModeBar": False})
 
 # ══════════════════════════════════════════════════════════════════════════════
 # 03 — FUNNEL INTELLIGENCE
@@ -444,29 +583,16 @@ st.plotly_chart(fig_state, use_container_width=True, config={"displayModeBar": F
 st.markdown('<div class="sec-hdr"><span class="sec-num">03</span><span class="sec-title">Funnel Intelligence</span></div>', unsafe_allow_html=True)
 
 cf1, cf2 = st.columns([3, 2])
-stages_f = ["Total Leads","Attempted","Connected","PTP","Completed"]
-vals_f   = [k["total"], k["attempted_leads"], k["connected_leads"], k["ptp_count"], k["completed"]]
-f_colors = ["#0f2035","#122540","#0f2d3a","#14302a","#0d2535"]
-f_borders= ["#3b82f6","#6366f1","#22c55e","#c9a84c","#06b6d4"]
 
 with cf1:
-    fig_fun = go.Figure(go.Funnel(
-        y=stages_f, x=vals_f,
-        textinfo="value+percent initial",
-        textfont=dict(color="#e8edf5", size=12),
-        marker=dict(color=f_colors, line=dict(color=f_borders, width=2)),
-        connector=dict(line=dict(color="#122030", width=1)),
-    ))
-    fig_fun.update_layout(**PLY, height=340,
-        title=dict(text="Campaign Conversion Funnel", font=dict(size=12, color="#475569"), x=0))
-    st.plotly_chart(fig_fun, use_container_width=True, config={"displayModeBar": False})
+    st.plotly_chart(figs["funnel"], use_container_width=True, config={"displayModeBar": False})
 
 with cf2:
     drops = [
         ("Total → Attempted",     k["total"],           k["attempted_leads"]),
         ("Attempted → Connected", k["attempted_leads"],  k["connected_leads"]),
         ("Connected → PTP",       k["connected_leads"],  k["ptp_count"]),
-        ("PTP → Completed",       k["ptp_count"],        k["completed"]),
+        ("PTP → Completed",       k["ptp_count"],        k["completed_leads"]),
     ]
     drop_html = ""
     for lbl2, frm, to in drops:
@@ -485,23 +611,7 @@ with cf2:
       ⚠ <strong>Secondary:</strong> {w2[0]} drops <strong>{w2[1]-w2[2]:,} leads ({p2:.0f}%)</strong>.
     </div>""", unsafe_allow_html=True)
 
-# Connection by disposition (stacked bar)
-grp = df.groupby("Lead_Entity_Disposition").agg(
-    connected=("AI_Connected_Calls", lambda x: (x>0).sum()),
-    total=("AI_Connected_Calls","count")).reset_index()
-grp["not_conn"] = grp["total"] - grp["connected"]
-
-fig_cdisp = go.Figure()
-fig_cdisp.add_trace(go.Bar(name="Connected",     x=grp["Lead_Entity_Disposition"], y=grp["connected"],
-    marker_color="#22c55ebb", marker=dict(line=dict(color="#22c55e",width=1)), marker_cornerradius=3))
-fig_cdisp.add_trace(go.Bar(name="Not Connected", x=grp["Lead_Entity_Disposition"], y=grp["not_conn"],
-    marker_color="#ef4444bb", marker=dict(line=dict(color="#ef4444",width=1)), marker_cornerradius=3))
-fig_cdisp.update_layout(**PLY, barmode="stack", height=240,
-    title=dict(text="Connection Rate by Disposition", font=dict(size=12, color="#475569"), x=0),
-    xaxis=dict(showgrid=False, color="#94a3b8"),
-    yaxis=dict(showgrid=True, gridcolor="#122030", color="#94a3b8"),
-    legend=dict(font=dict(color="#94a3b8", size=11), bgcolor="rgba(0,0,0,0)"))
-st.plotly_chart(fig_cdisp, use_container_width=True, config={"displayModeBar": False})
+st.plotly_chart(figs["conn_by_disp"], use_container_width=True, config={"displayModeBar": False})
 
 # ══════════════════════════════════════════════════════════════════════════════
 # 04 — EFFICIENCY SNAPSHOT
@@ -509,9 +619,6 @@ st.plotly_chart(fig_cdisp, use_container_width=True, config={"displayModeBar": F
 st.markdown('<div class="sec-hdr"><span class="sec-num">04</span><span class="sec-title">Efficiency Snapshot</span></div>', unsafe_allow_html=True)
 
 ce1, ce2 = st.columns(2)
-cpc = k["total_spend"]/k["connected_leads"] if k["connected_leads"] else 0
-cpa = k["total_spend"]/k["attempted_leads"] if k["attempted_leads"] else 0
-cpl = k["total_spend"]/k["total"]
 
 def eff_rows(rows):
     return "".join(f'<div class="eff-row"><span class="eff-lbl">{l}</span><span class="eff-val">{v}</span></div>' for l,v in rows)
@@ -521,11 +628,11 @@ with ce1:
     <div class="eff-panel">
       <div style="font-size:11px;font-weight:600;color:#475569;text-transform:uppercase;letter-spacing:0.7px;margin-bottom:12px">Retry & Attempt Logic</div>
       {eff_rows([
-        ("Avg Attempts — Connected",     f"{k['avg_conn']:.1f} calls"),
-        ("Avg Attempts — Not Connected", f"{k['avg_no_conn']:.1f} calls"),
-        ("Attempt Efficiency",           f"{k['attempt_eff']:.1f}%"),
-        ("Total AI Attempts",            f"{df['AI_Attempted_Calls'].sum():,}"),
-        ("Total AI Connections",         f"{df['AI_Connected_Calls'].sum():,}"),
+        ("Avg Attempts — Connected",     f"{k['avg_attempts_connected']:.1f} calls"),
+        ("Avg Attempts — Not Connected", f"{k['avg_attempts_not_connected']:.1f} calls"),
+        ("Attempt Efficiency",           f"{k['attempt_efficiency']:.1f}%"),
+        ("Total AI Attempts",            f"{k['total_attempted_calls']:,}"),
+        ("Total AI Connections",         f"{k['total_connected_calls']:,}"),
       ])}
     </div>""", unsafe_allow_html=True)
 
@@ -535,45 +642,23 @@ with ce2:
       <div style="font-size:11px;font-weight:600;color:#475569;text-transform:uppercase;letter-spacing:0.7px;margin-bottom:12px">Cost Efficiency</div>
       {eff_rows([
         ("Cost per PTP",        f"₹{k['cost_per_ptp']:.2f}"),
-        ("Cost per Connection", f"₹{cpc:.2f}"),
-        ("Cost per Attempt",    f"₹{cpa:.2f}"),
-        ("Cost per Lead",       f"₹{cpl:.2f}"),
-        ("Avg Spend per Lead",  f"₹{k['smean']:.2f}"),
+        ("Cost per Connection", f"₹{k['cost_per_connection']:.2f}"),
+        ("Cost per Attempt",    f"₹{k['cost_per_attempt']:.2f}"),
+        ("Cost per Lead",       f"₹{k['cost_per_lead']:.2f}"),
+        ("Avg Spend per Lead",  f"₹{k['spend_mean']:.2f}"),
+        ("Spend p50 / p90 / p99", f"₹{k['spend_p50']:.0f} / ₹{k['spend_p90']:.0f} / ₹{k['spend_p99']:.0f}"),
       ])}
     </div>""", unsafe_allow_html=True)
 
 # Disposition bar + donut
 st.markdown("<div style='height:8px'></div>", unsafe_allow_html=True)
 cd1, cd2 = st.columns([3, 2])
-disp_vc = df["Lead_Entity_Disposition"].value_counts().reset_index()
-disp_vc.columns = ["Disposition","Count"]
-d_cols  = [DISP_C.get(d,"#475569") for d in disp_vc["Disposition"]]
 
 with cd1:
-    fig_bar = go.Figure(go.Bar(
-        x=disp_vc["Disposition"], y=disp_vc["Count"],
-        marker_color=[c+"aa" for c in d_cols],
-        marker=dict(line=dict(color=d_cols,width=1.5), cornerradius=4),
-        text=disp_vc["Count"], textposition="outside", textfont=dict(color="#94a3b8",size=11),
-    ))
-    fig_bar.update_layout(**PLY, height=260,
-        title=dict(text="Disposition Distribution", font=dict(size=12,color="#475569"),x=0),
-        xaxis=dict(showgrid=False,color="#94a3b8"),
-        yaxis=dict(showgrid=True,gridcolor="#122030",color="#94a3b8"), showlegend=False)
-    st.plotly_chart(fig_bar, use_container_width=True, config={"displayModeBar": False})
+    st.plotly_chart(figs["dispositions"], use_container_width=True, config={"displayModeBar": False})
 
 with cd2:
-    fig_dn = go.Figure(go.Pie(
-        labels=disp_vc["Disposition"], values=disp_vc["Count"], hole=0.58,
-        marker_colors=[c+"bb" for c in d_cols],
-        marker=dict(line=dict(color=d_cols,width=1.5)),
-        textinfo="percent", textfont=dict(color="#e8edf5",size=11),
-        hovertemplate="%{label}: %{value:,}<extra></extra>",
-    ))
-    fig_dn.update_layout(**PLY, height=260,
-        title=dict(text="Disposition Mix", font=dict(size=12,color="#475569"),x=0),
-        showlegend=True, legend=dict(font=dict(color="#94a3b8",size=10),bgcolor="rgba(0,0,0,0)"))
-    st.plotly_chart(fig_dn, use_container_width=True, config={"displayModeBar": False})
+    st.plotly_chart(figs["disposition_mix"], use_container_width=True, config={"displayModeBar": False})
 
 # ══════════════════════════════════════════════════════════════════════════════
 # 05 — DEEP ANALYTICS
@@ -583,99 +668,27 @@ st.markdown('<div class="sec-hdr"><span class="sec-num">05</span><span class="se
 da1, da2 = st.columns(2)
 
 with da1:
-    # Scatter: attempts vs spend, coloured by disposition
-    samp = df.sample(min(400, len(df)), random_state=42)
-    fig_sc = go.Figure()
-    for disp, grp_df in samp.groupby("Lead_Entity_Disposition"):
-        fig_sc.add_trace(go.Scatter(
-            x=grp_df["AI_Attempted_Calls"], y=grp_df["Total_Spend_INR"],
-            mode="markers", name=disp.replace("_"," "),
-            marker=dict(color=DISP_C.get(disp,"#475569"), size=5, opacity=0.7,
-                        line=dict(width=0)),
-            hovertemplate=f"<b>{disp}</b><br>Attempts: %{{x}}<br>Spend: ₹%{{y:.2f}}<extra></extra>",
-        ))
-    fig_sc.update_layout(**PLY, height=300,
-        title=dict(text="Spend vs AI Attempts (sampled leads)", font=dict(size=12,color="#475569"),x=0),
-        xaxis=dict(title="AI Attempts", showgrid=True, gridcolor="#122030", color="#94a3b8"),
-        yaxis=dict(title="Spend (₹)",   showgrid=True, gridcolor="#122030", color="#94a3b8"),
-        legend=dict(font=dict(color="#94a3b8",size=10), bgcolor="rgba(0,0,0,0)"),
-    )
-    st.plotly_chart(fig_sc, use_container_width=True, config={"displayModeBar": False})
+    st.plotly_chart(figs["scatter"], use_container_width=True, config={"displayModeBar": False})
 
 with da2:
-    # Attempt distribution histogram
-    att_vc = df["AI_Attempted_Calls"].value_counts().sort_index()
-    fig_att = go.Figure(go.Bar(
-        x=att_vc.index, y=att_vc.values,
-        marker_color=[f"hsl({220-i/len(att_vc)*60:.0f},65%,58%)" for i in range(len(att_vc))],
-        marker=dict(cornerradius=3),
-    ))
-    fig_att.update_layout(**PLY, height=300,
-        title=dict(text="Attempt Count Distribution", font=dict(size=12,color="#475569"),x=0),
-        xaxis=dict(title="Attempts", showgrid=False, color="#94a3b8"),
-        yaxis=dict(title="Leads",    showgrid=True,  gridcolor="#122030", color="#94a3b8"),
-        showlegend=False,
-    )
-    st.plotly_chart(fig_att, use_container_width=True, config={"displayModeBar": False})
+    st.plotly_chart(figs["attempts"], use_container_width=True, config={"displayModeBar": False})
 
 da3, da4 = st.columns(2)
 
 with da3:
-    # Spend distribution histogram
-    fig_sp = px.histogram(df, x="Total_Spend_INR", nbins=16,
-        color_discrete_sequence=["#c9a84c"])
-    fig_sp.update_traces(marker_line_color="#8a6f2e", marker_line_width=1, opacity=0.8,
-                         marker=dict(cornerradius=3))
-    fig_sp.update_layout(**PLY, height=280,
-        title=dict(text="Spend Distribution per Lead", font=dict(size=12,color="#475569"),x=0),
-        xaxis=dict(title="Spend (₹)", showgrid=False, color="#94a3b8"),
-        yaxis=dict(title="Leads",     showgrid=True,  gridcolor="#122030", color="#94a3b8"),
-        showlegend=False,
-    )
-    st.plotly_chart(fig_sp, use_container_width=True, config={"displayModeBar": False})
+    st.plotly_chart(figs["spend"], use_container_width=True, config={"displayModeBar": False})
 
 with da4:
-    # Sunburst: state × disposition
-    sun_df = df.groupby(["Lead_State","Lead_Entity_Disposition"]).size().reset_index(name="count")
-    fig_sun = px.sunburst(sun_df, path=["Lead_State","Lead_Entity_Disposition"], values="count",
-        color="Lead_State",
-        color_discrete_map={"active":"#3b82f6","inactive":"#475569","completed":"#22c55e"})
-    fig_sun.update_traces(textfont=dict(color="#e8edf5",size=11), insidetextorientation="radial",
-                          marker=dict(line=dict(color="#0f1f35",width=1.5)))
-    fig_sun.update_layout(**PLY, height=280,
-        title=dict(text="Lead State × Disposition Breakdown", font=dict(size=12,color="#475569"),x=0))
-    st.plotly_chart(fig_sun, use_container_width=True, config={"displayModeBar": False})
+    st.plotly_chart(figs["sunburst"], use_container_width=True, config={"displayModeBar": False})
 
 # ══════════════════════════════════════════════════════════════════════════════
 # 06 — RISK RADAR
 # ══════════════════════════════════════════════════════════════════════════════
 st.markdown('<div class="sec-hdr"><span class="sec-num">06</span><span class="sec-title">Risk Radar</span></div>', unsafe_allow_html=True)
 
-risks = []
-if k["ptp_pct"] < 15:
-    risks.append(("HIGH","Critical PTP Rate",
-        f"PTP rate {k['ptp_pct']:.1f}% is below the 15% baseline. Only {k['ptp_count']:,} of {k['total']:,} leads converted."))
-if k["ne_pct"] > 15:
-    risks.append(("HIGH","High Not-Evaluated Pool",
-        f"{k['ne_pct']:.1f}% of leads ({k['ne_count']:,}) remain Not Evaluated — recoverable revenue sitting idle."))
-if k["overatt_pct"] > 5:
-    risks.append(("MEDIUM","Over-Attempted Zero-Connection Leads",
-        f"{k['overatt']:,} leads ({k['overatt_pct']:.1f}%) have >12 attempts with zero connections — burning spend."))
-if k["outliers"] > 0:
-    thr = k["smean"] + 2*k["sstd"]
-    risks.append(("MEDIUM","Cost Outlier Leads",
-        f"{k['outliers']:,} leads exceed ₹{thr:.0f} (mean+2σ). May be distorting Cost-per-PTP."))
-if k["connection_rate"] < 30:
-    risks.append(("HIGH","Low Connection Rate",
-        f"Only {k['connection_rate']:.1f}% connecting. Signals list quality issues or poor call timing."))
-if k["active_pct"] > 70:
-    risks.append(("MEDIUM","Excessive Active Backlog",
-        f"{k['active_pct']:.1f}% of leads still active — capacity or velocity issue."))
-if not risks:
-    risks.append(("LOW","No Critical Risks Detected","All key metrics within acceptable thresholds."))
-
 cr1, cr2 = st.columns(2)
-for i, (sev, title, body) in enumerate(risks[:4]):
+for i, r in enumerate(a["risks"]):
+    sev, title, body = r["severity"], r["title"], r["body"]
     cls = "rb-high" if sev=="HIGH" else ("rb-med" if sev=="MEDIUM" else "rb-low")
     with (cr1 if i%2==0 else cr2):
         st.markdown(f"""
@@ -692,23 +705,8 @@ for i, (sev, title, body) in enumerate(risks[:4]):
 # ══════════════════════════════════════════════════════════════════════════════
 st.markdown('<div class="sec-hdr"><span class="sec-num">07</span><span class="sec-title">Top 3 Optimisation Levers</span></div>', unsafe_allow_html=True)
 
-levers = []
-if k["connection_rate"] < 50:
-    gap = 50-k["connection_rate"]
-    levers.append(("Dial-Time Optimisation",
-        f"Shifting AI outreach to peak windows (10am–12pm, 4–6pm IST) could recover {int(gap/100*k['total']):,}+ connections — est. +{gap:.0f}pp connection rate."))
-if k["ne_count"] > 20:
-    pot = int(k["ne_count"]*k["ptp_pct"]/100)
-    levers.append(("Re-Engage Not-Evaluated Leads",
-        f"{k['ne_count']:,} unscored leads. Applying current PTP rate projects {pot:,} incremental PTPs via a 3-attempt retry sequence."))
-if k["overatt"] > 0:
-    levers.append(("Prune Dead-End Leads & Reallocate Spend",
-        f"Capping retries at 12 on {k['overatt']:,} zero-connection leads reclaims ~₹{k['overatt']*k['smean']:,.0f} in AI dial spend."))
-if len(levers) < 3:
-    levers.append(("Score-Based Lead Prioritisation",
-        "Propensity scoring on the top 30% of leads typically reduces Cost per PTP by 20–35% while maintaining coverage."))
-
-for i, (title, body) in enumerate(levers[:3], 1):
+for i, lv in enumerate(a["levers"], 1):
+    title, body = lv["title"], lv["body"]
     st.markdown(f"""
     <div class="lever-card">
       <div class="lever-num">{i}</div>
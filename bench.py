@@ -0,0 +1,289 @@
+"""Benchmarks for the analytics pipeline and the Flask routes across campaign sizes.
+
+Each (stage, rows) case runs in a fresh process, so its peak RSS is its own.
+A case times ``--repeats`` runs (fewer for larger campaigns), then runs once more
+under tracemalloc for the peak of Python and numpy allocations.  Results go to
+a JSON file; ``--compare`` checks them against a stored baseline and exits 1 if
+any case got slower, or allocates or holds more memory, by more than
+``--threshold``.
+
+    python bench.py --out baseline.json
+    python bench.py --sizes 1e3,1e5 --stages kpis,charts --compare baseline.json
+    python bench.py --results new.json --compare baseline.json   # compare two stored runs
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import io
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+SIZES           = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+ROUTE_MAX_ROWS  = 1_000_000
+THRESHOLD       = 0.10
+# Differences below these are noise whatever the ratio
+MIN_SECONDS     = 0.002
+MIN_BYTES       = 1 << 20
+
+
+# ── Stages ────────────────────────────────────────────────────────────────────
+# Each stage is setup(rows) -> state and run(state, i) for the i-th run; only run is measured.
+def _frame(n):
+    from recoveriq.engine import generate_demo_data
+    return generate_demo_data(n)
+
+
+def _csv(n) -> bytes:
+    from recoveriq import synth
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    os.close(fd)
+    try:
+        synth.write(path, n, seed=7)
+        with open(path, "rb") as fh:
+            return fh.read()
+    finally:
+        os.remove(path)
+
+
+def _client():
+    """The Flask app, on the throwaway dataset store run_case sets up."""
+    import server
+    return server
+
+
+def _upload(server, csv: bytes):
+    resp = server.app.test_client().post("/api/upload", data={"file": (io.BytesIO(csv), "bench.csv")})
+    assert resp.status_code == 200, resp.get_data(as_text=True)[:200]
+    return resp
+
+
+def _setup_upload(n):
+    server = _client()
+    return server, _csv(n)
+
+
+def _run_upload(state, i):
+    server, csv = state
+    server.results.clear()
+    # A fresh lead per run gives a new content hash, so nothing is answered from the dataset store
+    _upload(server, csv + f"B{uuid.uuid4().hex},PTP,active,1,1,1.0\n".encode())
+
+
+def _setup_query(n):
+    server = _client()
+    dataset_id = _upload(server, _csv(n)).get_json()["dataset_id"]
+    return server, dataset_id
+
+
+def _run_query(state, i):
+    server, dataset_id = state
+    server.results.clear()
+    resp = server.app.test_client().get(f"/api/datasets/{dataset_id}/query?attempts_min=4&spend_min={5 + i % 20}")
+    assert resp.status_code == 200, resp.get_data(as_text=True)[:200]
+
+
+def _stages() -> dict:
+    from recoveriq import engine
+    return {
+        "generate": (lambda n: n, lambda n, i: engine.generate_demo_data(n)),
+        "kpis":     (_frame, lambda df, i: engine.compute_kpis(df)),
+        "charts":   (_frame, lambda df, i: engine.compute_charts(df)),
+        "response": (_frame, lambda df, i: engine.build_response(df)),
+        "upload":   (_setup_upload, _run_upload),
+        "query":    (_setup_query, _run_query),
+    }
+
+
+STAGES = ("generate", "kpis", "charts", "response", "upload", "query")
+ROUTES = {"upload", "query"}
+
+
+# ── Measurement ───────────────────────────────────────────────────────────────
+def _reset_peak_rss() -> bool:
+    """Reset the kernel's resident-set high-water mark (Linux only); False if that is not possible."""
+    try:
+        with open("/proc/self/clear_refs", "w") as fh:
+            fh.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss() -> int:
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def _rss() -> int:
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return 0
+
+
+def run_case(stage: str, rows: int, repeats: int) -> dict:
+    """Time ``stage`` at ``rows`` leads; meant to run in a process of its own."""
+    setup, run = _stages()[stage]
+    data_dir = os.environ["RECOVERIQ_DATASET_DIR"] = tempfile.mkdtemp(prefix="riq-bench-")
+    try:
+        return _measure(stage, rows, repeats, run, setup(rows))
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def _measure(stage: str, rows: int, repeats: int, run, state) -> dict:
+    gc.collect()
+    before = _rss()
+    reset  = _reset_peak_rss()
+    times  = []
+    for i in range(repeats):
+        t0 = time.perf_counter()
+        run(state, i)
+        times.append(time.perf_counter() - t0)
+    peak_rss = _peak_rss()
+    gc.collect()
+    tracemalloc.start()
+    run(state, repeats)
+    alloc_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return dict(stage=stage, rows=rows, repeats=repeats,
+                seconds=statistics.median(times), seconds_min=min(times),
+                rows_per_s=round(rows / min(times)),
+                alloc_peak_bytes=alloc_peak,
+                peak_rss_bytes=peak_rss,
+                # Without a resettable high-water mark the peak includes setup
+                rss_growth_bytes=max(peak_rss - before, 0) if reset else None)
+
+
+def default_repeats(rows: int) -> int:
+    return max(1, min(5, 1_000_000 // rows))
+
+
+def _meta() -> dict:
+    import numpy
+    import pandas
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return dict(created=time.time(), commit=commit, python=platform.python_version(),
+                pandas=pandas.__version__, numpy=numpy.__version__,
+                platform=platform.platform(), cpus=os.cpu_count())
+
+
+def run(stages, sizes, repeats=None, route_max_rows=ROUTE_MAX_ROWS, progress=None) -> dict:
+    cases = [(s, n) for n in sizes for s in stages if s not in ROUTES or n <= route_max_rows]
+    results = []
+    ctx = multiprocessing.get_context("spawn")
+    for stage, rows in cases:
+        with ProcessPoolExecutor(1, mp_context=ctx) as pool:
+            result = pool.submit(run_case, stage, rows, repeats or default_repeats(rows)).result()
+        results.append(result)
+        if progress:
+            progress(result)
+    return dict(meta=_meta(), results=results)
+
+
+# ── Comparison ────────────────────────────────────────────────────────────────
+METRICS = (("seconds_min", MIN_SECONDS), ("alloc_peak_bytes", MIN_BYTES), ("rss_growth_bytes", MIN_BYTES))
+
+
+def compare(baseline: dict, current: dict, threshold: float = THRESHOLD) -> list:
+    """One row per case both runs have: the ratio of each metric, and the metrics that regressed.
+
+    A metric regresses when it grew by more than ``threshold`` of the baseline
+    and by more than the noise floor (``MIN_SECONDS`` / ``MIN_BYTES``).
+    """
+    base = {(r["stage"], r["rows"]): r for r in baseline["results"]}
+    out  = []
+    for r in current["results"]:
+        b = base.get((r["stage"], r["rows"]))
+        if b is None:
+            continue
+        row = dict(stage=r["stage"], rows=r["rows"], regressed=[])
+        for metric, floor in METRICS:
+            old, new = b.get(metric), r.get(metric)
+            if not old or new is None:
+                continue
+            row[metric] = round(new / old, 3)
+            if new > old * (1 + threshold) and new - old > floor:
+                row["regressed"].append(metric)
+        out.append(row)
+    return out
+
+
+def _fmt_bytes(n) -> str:
+    return "-" if n is None else f"{n / 2 ** 20:,.1f}"
+
+
+def main(argv=None) -> None:
+    p = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    p.add_argument("--stages", default=",".join(STAGES), help=f"comma separated, of {', '.join(STAGES)}")
+    p.add_argument("--sizes", default=",".join(str(n) for n in SIZES), help="comma separated row counts, e.g. 1e3,1e5")
+    p.add_argument("--repeats", type=int, help="timed runs per case (default: 5, fewer above 200k rows)")
+    p.add_argument("--route-max-rows", type=float, default=ROUTE_MAX_ROWS,
+                   help="largest campaign the upload and query routes are run with")
+    p.add_argument("--out", default="bench-results.json", help="where to write the results")
+    p.add_argument("--results", help="compare this stored run instead of running the benchmarks")
+    p.add_argument("--compare", metavar="BASELINE", help="flag regressions against this stored run")
+    p.add_argument("--threshold", type=float, default=THRESHOLD, help="allowed relative growth (default 0.10)")
+    args = p.parse_args(argv)
+
+    stages = [s for s in args.stages.split(",") if s]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        p.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    if args.results:
+        with open(args.results) as fh:
+            current = json.load(fh)
+    else:
+        print(f"{'stage':<10}{'rows':>12}{'runs':>6}{'median s':>11}{'rows/s':>14}{'alloc MiB':>11}"
+              f"{'RSS MiB':>10}{'+RSS MiB':>10}")
+        report = lambda r: print(
+            f"{r['stage']:<10}{r['rows']:>12,}{r['repeats']:>6}{r['seconds']:>11.4f}{r['rows_per_s']:>14,}"
+            f"{_fmt_bytes(r['alloc_peak_bytes']):>11}{_fmt_bytes(r['peak_rss_bytes']):>10}"
+            f"{_fmt_bytes(r['rss_growth_bytes']):>10}", flush=True)
+        sizes   = [int(float(s)) for s in args.sizes.split(",") if s]
+        current = run(stages, sizes, args.repeats, int(args.route_max_rows), progress=report)
+        with open(args.out, "w") as fh:
+            json.dump(current, fh, indent=2)
+        print(f"results written to {args.out}")
+
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+        rows = compare(baseline, current, args.threshold)
+        print(f"\nagainst {args.compare} (ratios, new / baseline; > {1 + args.threshold:g} with a real difference is flagged)")
+        print(f"{'stage':<10}{'rows':>12}{'time':>8}{'alloc':>8}{'+RSS':>8}  regressed")
+        for r in rows:
+            ratios = "".join(f"{r.get(m, '-'):>8}" for m, _ in METRICS)
+            print(f"{r['stage']:<10}{r['rows']:>12,}{ratios}  {', '.join(r['regressed'])}")
+        if any(r["regressed"] for r in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Local load test for the Flask API: concurrent demo and upload requests, latency percentiles.
+
+Start the server (``python server.py`` or any WSGI server), then e.g.
+
+    python loadtest.py --concurrency 16 --duration 30 --mix demo=4,upload=1 --upload-rows 100000
+
+Uploads are generated with ``recoveriq.synth`` unless ``--upload-file`` is given.
+The result cache answers repeated uploads of the same bytes, so by default each
+upload gets a copy of its last lead under a fresh Lead_ID appended and is
+analysed afresh; pass
+``--cached-uploads`` to measure cache hits instead.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from recoveriq import synth
+
+
+def _multipart(name: str, payload: bytes) -> tuple:
+    boundary = uuid.uuid4().hex
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{name}\"\r\n"
+            f"Content-Type: text/csv\r\n\r\n").encode() + payload + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+class LoadTest:
+    """Runs ``concurrency`` workers against ``url`` and records (kind, status, seconds) per request."""
+
+    def __init__(self, url: str, csv: bytes, mix: dict, unique_uploads: bool = True, timeout: float = 300):
+        self.url, self.csv, self.timeout = url.rstrip("/"), csv, timeout
+        self.unique_uploads = unique_uploads
+        lines  = csv.rstrip(b"\n").split(b"\n")
+        header = [c.strip(b'"\r') for c in lines[0].split(b",")]
+        self._last = lines[-1].rstrip(b"\r").split(b",")
+        self._id   = header.index(b"Lead_ID") if b"Lead_ID" in header else 0
+        if not csv.endswith(b"\n"):
+            self.csv += b"\n"
+        self.kinds, weights = zip(*mix.items())
+        self.p = np.asarray(weights, dtype=float) / sum(weights)
+        self.samples = []
+        self._lock = threading.Lock()
+
+    def _request(self, kind: str) -> int:
+        headers = {"Accept-Encoding": "gzip"}
+        if kind == "demo":
+            req = urllib.request.Request(f"{self.url}/api/demo", headers=headers)
+        else:
+            payload = self.csv
+            if self.unique_uploads:
+                row = list(self._last)
+                row[self._id] = f"U{uuid.uuid4().hex}".encode()
+                payload += b",".join(row) + b"\n"
+            body, ctype = _multipart("loadtest.csv", payload)
+            req = urllib.request.Request(f"{self.url}/api/upload", data=body,
+                                         headers=dict(headers, **{"Content-Type": ctype}))
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                resp.read()
+                return resp.status
+        except urllib.error.HTTPError as exc:
+            return exc.code
+        except OSError:
+            return 0
+
+    def _worker(self, seed: int, deadline: float, budget) -> None:
+        rng = np.random.default_rng(seed)
+        while time.perf_counter() < deadline and next(budget, None) is not None:
+            kind = self.kinds[rng.choice(len(self.kinds), p=self.p)]
+            t0 = time.perf_counter()
+            status = self._request(kind)
+            with self._lock:
+                self.samples.append((kind, status, time.perf_counter() - t0))
+
+    def run(self, concurrency: int, duration: float, requests: int | None = None) -> dict:
+        budget = iter(range(requests)) if requests else iter(int, 1)
+        deadline = time.perf_counter() + duration
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            for i in range(concurrency):
+                pool.submit(self._worker, i, deadline, budget)
+        return self.report(time.perf_counter() - t0)
+
+    def report(self, elapsed: float) -> dict:
+        out = dict(elapsed_s=round(elapsed, 2), requests=len(self.samples),
+                   throughput_rps=round(len(self.samples) / elapsed, 2), kinds={})
+        for kind in ("all",) + tuple(self.kinds):
+            rows = [s for s in self.samples if kind == "all" or s[0] == kind]
+            if not rows:
+                continue
+            lat = np.array([s[2] for s in rows]) * 1000
+            out["kinds"][kind] = dict(
+                requests=len(rows), errors=sum(1 for s in rows if s[1] != 200),
+                rps=round(len(rows) / elapsed, 2),
+                **{f"p{q}_ms": round(float(np.percentile(lat, q)), 1) for q in (50, 90, 99)},
+                max_ms=round(float(lat.max()), 1),
+            )
+        return out
+
+
+def main(argv=None) -> None:
+    p = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    p.add_argument("--url", default="http://127.0.0.1:5000")
+    p.add_argument("--concurrency", type=int, default=8)
+    p.add_argument("--duration", type=float, default=30, help="seconds")
+    p.add_argument("--requests", type=int, help="stop after this many requests")
+    p.add_argument("--mix", type=synth.parse_mix, default={"demo": 3, "upload": 1}, help="demo=W,upload=W")
+    p.add_argument("--upload-file", help="CSV to upload (default: generated)")
+    p.add_argument("--upload-rows", type=int, default=50_000)
+    p.add_argument("--cached-uploads", action="store_true", help="upload identical bytes every time")
+    p.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = p.parse_args(argv)
+
+    if args.upload_file:
+        with open(args.upload_file, "rb") as fh:
+            csv = fh.read()
+    else:
+        fd, path = tempfile.mkstemp(suffix=".csv")
+        os.close(fd)
+        try:
+            synth.write(path, args.upload_rows, seed=7)
+            with open(path, "rb") as fh:
+                csv = fh.read()
+        finally:
+            os.remove(path)
+
+    test = LoadTest(args.url, csv, args.mix, unique_uploads=not args.cached_uploads)
+    report = test.run(args.concurrency, args.duration, args.requests)
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+        return
+    print(f"{report['requests']:,} requests in {report['elapsed_s']}s "
+          f"({report['throughput_rps']} req/s, concurrency {args.concurrency})")
+    print(f"{'kind':<8}{'reqs':>8}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for kind, r in report["kinds"].items():
+        print(f"{kind:<8}{r['requests']:>8}{r['errors']:>8}{r['rps']:>9}{r['p50_ms']:>9}"
+              f"{r['p90_ms']:>9}{r['p99_ms']:>9}{r['max_ms']:>9}")
+
+
+if __name__ == "__main__":
+    main()
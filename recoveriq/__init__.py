@@ -0,0 +1,42 @@
+"""RecoverIQ analytics engine, shared by the Flask API (server.py) and the Streamlit app (app.py).
+
+Submodules load on first use, so ``import recoveriq`` costs nothing and each front
+end pulls in only what it touches; nothing here imports Flask, Streamlit or Plotly.
+"""
+import importlib
+
+_EXPORTS = {
+    "KpiAggregate":       "aggregate",
+    "SegmentCube":        "cube",
+    "generate_demo_data": "engine",
+    "compute_kpis":       "engine",
+    "compute_score":      "engine",
+    "build_funnel":       "engine",
+    "compute_charts":     "engine",
+    "compute_risks":      "engine",
+    "compute_levers":     "engine",
+    "build_response":     "engine",
+    "UploadError":        "ingest",
+    "read_upload":        "ingest",
+    "stream_response":    "ingest",
+    "read_records":       "ingest",
+    "read_record_file":   "ingest",
+    "LiveCampaign":       "live",
+    "compact":            "schema",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    try:
+        module = _EXPORTS[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
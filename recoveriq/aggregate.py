@@ -0,0 +1,361 @@
+"""Mergeable partial aggregates behind the campaign KPIs.
+
+A ``KpiAggregate`` holds only counts and sums: a ``SegmentCube`` (lead counts
+and call / spend sums per disposition x state x attempt bucket x connected flag,
+from which every lead tally and call sum is read), the attempt-count
+distribution, and a ``SpendSketch`` of the spend distribution.  Aggregates of
+disjoint row sets merge associatively with ``+``, and the empty aggregate is the
+identity, so shards, chunks, days or whole files can be folded in any grouping;
+``-`` retracts rows that were folded in earlier.  The finished KPIs are derived
+at the end.  The attempt distribution is kept exactly, as a value -> count map
+(attempt counts take few distinct values).  The spend sketch is exact up to
+``MAX_SPEND_KEYS`` distinct paise values and a fixed set of log-spaced buckets
+beyond that, so its size is bounded however many leads it summarises; the
+spend total, mean and standard deviation stay exact either way.  p50/p90/p99
+and the Q3 + 1.5·IQR cost-outlier fence come out the same however the leads
+were split.
+"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from .cube import ATTEMPT_BUCKETS, SegmentCube
+from .schema import spend_values
+
+# Spreads up to this many paise are tallied with a bincount; wider ones with a sort.
+_DENSE_SPREAD = 1 << 22
+# Distinct spend values kept exactly; past this the sketch switches to log buckets,
+# each within SPEND_ACCURACY (relative) of every value it holds.
+MAX_SPEND_KEYS = 4096
+SPEND_ACCURACY = 0.005
+_GAMMA         = (1 + SPEND_ACCURACY) / (1 - SPEND_ACCURACY)
+QUANTILES     = (0.5, 0.9, 0.99)
+IQR_FENCE     = 1.5
+_ATTEMPTED    = ATTEMPT_BUCKETS[1:]
+
+
+def _r(v, d=1):
+    if v is None or (isinstance(v, float) and (np.isnan(v) or np.isinf(v))):
+        return 0.0
+    return round(float(v), d)
+
+
+def attempt_counts(col: pd.Series) -> tuple:
+    """Distinct attempt counts and their frequencies, ascending; a bincount for whole-number columns."""
+    att = col.to_numpy(dtype=float)
+    att = att[~np.isnan(att)]
+    if len(att) and att.min() >= 0 and np.array_equal(att, np.floor(att)):
+        counts = np.bincount(att.astype(np.int64))
+        labels = np.flatnonzero(counts)
+        return labels, counts[labels]
+    return np.unique(att, return_counts=True)
+
+
+def _paise_counts(sp: np.ndarray) -> tuple:
+    """Distinct spend values in paise (ascending) and how many leads carry each."""
+    paise = np.rint(sp[~np.isnan(sp)] * 100).astype(np.int64)
+    if not len(paise):
+        return np.empty(0, np.int64), np.empty(0, np.int64)
+    lo = paise.min()
+    if paise.max() - lo <= _DENSE_SPREAD:
+        counts = np.bincount(paise - lo)
+        keys   = np.flatnonzero(counts)
+        return keys + lo, counts[keys]
+    return np.unique(paise, return_counts=True)
+
+
+def _merge_counts(a: tuple, b: tuple, sign: int = 1) -> tuple:
+    """(keys, counts) pairs combined key-wise; ``sign=-1`` takes ``b`` away, dropping emptied keys."""
+    keys, inv = np.unique(np.concatenate([a[0], b[0]]), return_inverse=True)
+    weights = np.concatenate([a[1], sign * b[1]])
+    counts = np.rint(np.bincount(inv, weights=weights, minlength=len(keys))).astype(np.int64)
+    keep = counts != 0
+    return keys[keep], counts[keep]
+
+
+def _square_sum(keys: np.ndarray, counts: np.ndarray) -> int:
+    """Exact sum of ``keys**2`` weighted by ``counts``, in int64 when that cannot overflow."""
+    if not len(keys):
+        return 0
+    top = int(np.abs(keys).max())
+    if top * top * int(counts.sum()) < 1 << 63:
+        return int(np.dot(keys * keys, counts))
+    return int(np.dot(keys.astype(object) ** 2, counts.astype(object)))
+
+
+def _buckets(paise: np.ndarray) -> np.ndarray:
+    """Log bucket of each paise value: 0 for zero, else ±(1 + floor(log_gamma |p|))."""
+    out = np.zeros(len(paise), dtype=np.int64)
+    nz  = paise != 0
+    mag = np.abs(paise[nz]).astype(float)
+    out[nz] = np.sign(paise[nz]) * (1 + np.floor(np.log(mag) / np.log(_GAMMA))).astype(np.int64)
+    return out
+
+
+def _bucket_bounds(idx: np.ndarray) -> tuple:
+    """(low, representative, high) paise of log buckets; a bucket holds |p| in [gamma^(k-1), gamma^k)."""
+    k   = np.abs(idx).astype(float)
+    sgn = np.sign(idx)
+    top = _GAMMA ** k
+    low, rep, high = top / _GAMMA, 2 * top / (_GAMMA + 1), top
+    low, rep, high = (np.where(idx == 0, 0.0, v) for v in (low, rep, high))
+    # Negative buckets mirror positive ones, so their low and high swap
+    return np.where(sgn < 0, -high, low), sgn * rep, np.where(sgn < 0, -low, high)
+
+
+class SpendSketch:
+    """Spend distribution as a key -> lead count map; ``a + b`` and ``a - b`` as for ``KpiAggregate``.
+
+    Keys are paise while at most ``MAX_SPEND_KEYS`` distinct values are seen, and
+    log bucket numbers (see ``_buckets``) once more are: a sketch switches to
+    buckets when it, or one it is merged with, outgrows the exact map, and stays
+    so.  The exact sum and sum of squares of the paise are kept alongside, so the
+    total, mean and standard deviation are exact in both modes.
+    """
+
+    __slots__ = ("keys", "counts", "coarse", "total", "squares")
+
+    def __init__(self, keys=None, counts=None, coarse: bool = False, total: int = 0, squares: int = 0):
+        self.keys    = np.empty(0, np.int64) if keys is None else keys
+        self.counts  = np.empty(0, np.int64) if counts is None else counts
+        self.coarse  = coarse
+        self.total   = total
+        self.squares = squares
+
+    @classmethod
+    def from_values(cls, sp: np.ndarray) -> "SpendSketch":
+        """Sketch of spend in rupees (already on the paise grid); NaNs are skipped."""
+        keys, counts = _paise_counts(sp)
+        sketch = cls(keys, counts, total=int(keys @ counts), squares=_square_sum(keys, counts))
+        return sketch._bounded()
+
+    def _bounded(self) -> "SpendSketch":
+        return self if self.coarse or len(self.keys) <= MAX_SPEND_KEYS else self._coarsened()
+
+    def _coarsened(self) -> "SpendSketch":
+        if self.coarse:
+            return self
+        keys, counts = _merge_counts((_buckets(self.keys), self.counts), (np.empty(0, np.int64),) * 2)
+        return SpendSketch(keys, counts, True, self.total, self.squares)
+
+    def merge(self, other: "SpendSketch", sign: int = 1) -> "SpendSketch":
+        a, b = self, other
+        if a.coarse or b.coarse:
+            a, b = a._coarsened(), b._coarsened()
+        keys, counts = _merge_counts((a.keys, a.counts), (b.keys, b.counts), sign)
+        return SpendSketch(keys, counts, a.coarse, a.total + sign * b.total,
+                           a.squares + sign * b.squares)._bounded()
+
+    @property
+    def n(self) -> int:
+        return int(self.counts.sum())
+
+    def values(self) -> np.ndarray:
+        """Rupee value of each key: the spend itself, or a bucket's representative."""
+        return (_bucket_bounds(self.keys)[1] if self.coarse else self.keys) / 100
+
+    def range(self) -> tuple:
+        """(lowest, highest) spend in rupees, widened to the bucket edges once coarse; (0, 0) if empty."""
+        if not len(self.keys):
+            return 0.0, 0.0
+        if not self.coarse:
+            return self.keys[0] / 100, self.keys[-1] / 100
+        low, _, high = _bucket_bounds(self.keys[[0, -1]])
+        return low[0] / 100, high[1] / 100
+
+
+def _quantiles(keys: np.ndarray, counts: np.ndarray, qs) -> np.ndarray:
+    """``np.quantile`` (linear interpolation) of the values ``keys`` repeated ``counts`` times."""
+    qs = np.asarray(qs, dtype=float)
+    if not len(keys):
+        return np.zeros(len(qs))
+    cum = np.cumsum(counts)
+    pos = qs * (cum[-1] - 1)
+    lo, hi = np.floor(pos).astype(np.int64), np.ceil(pos).astype(np.int64)
+    at = lambda rank: keys[np.searchsorted(cum, rank, side="right")]
+    return at(lo) + (at(hi) - at(lo)) * (pos - lo)
+
+
+class KpiAggregate:
+    """Counts and sums for a set of leads; ``a + b`` is the aggregate of both sets, ``a - b``
+    the aggregate of ``a``'s leads without ``b``'s (which must have been folded into ``a``)."""
+
+    def __init__(self):
+        self.cube     = SegmentCube()
+        self.attempts = (np.empty(0), np.empty(0, np.int64))
+        self.spend    = SpendSketch()
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "KpiAggregate":
+        agg = cls()
+        agg.cube       = SegmentCube.from_frame(df)
+        labels, counts = attempt_counts(df["AI_Attempted_Calls"])
+        agg.attempts   = (labels.astype(float), counts.astype(np.int64))
+        agg.spend      = SpendSketch.from_values(spend_values(df["Total_Spend_INR"]))
+        return agg
+
+    def merge(self, other: "KpiAggregate", sign: int = 1) -> "KpiAggregate":
+        out = KpiAggregate()
+        out.cube     = self.cube.merge(other.cube, sign)
+        out.attempts = _merge_counts(self.attempts, other.attempts, sign)
+        out.spend    = self.spend.merge(other.spend, sign)
+        return out
+
+    def retract(self, other: "KpiAggregate") -> "KpiAggregate":
+        return self.merge(other, sign=-1)
+
+    __add__ = merge
+    __sub__ = retract
+
+    # ── Lead tallies (read off the cube) ──────────────────────────────────────
+    def _count(self, **filters) -> int:
+        return int(self.cube.total("leads", **filters))
+
+    def _sum(self, measure: str, **filters) -> float:
+        return float(self.cube.total(measure, **filters))
+
+    @property
+    def total(self) -> int:
+        return self._count()
+
+    @property
+    def connected_leads(self) -> int:
+        return self._count(connected="yes")
+
+    @property
+    def attempted_leads(self) -> int:
+        return self._count(attempts=_ATTEMPTED)
+
+    @property
+    def overattempted(self) -> int:
+        """More than 12 attempts and a connected-calls value of zero."""
+        return self._count(attempts="13+", connected="no")
+
+    @property
+    def att_n(self) -> int:
+        return self._count(attempts=ATTEMPT_BUCKETS)
+
+    @property
+    def att_conn_n(self) -> int:
+        return self._count(attempts=ATTEMPT_BUCKETS, connected="yes")
+
+    @property
+    def att_sum(self) -> float:
+        return self._sum("att_sum")
+
+    @property
+    def att_conn_sum(self) -> float:
+        return self._sum("att_sum", connected="yes")
+
+    @property
+    def conn_sum(self) -> float:
+        return self._sum("conn_sum")
+
+    @property
+    def dispositions(self) -> dict:
+        return self.cube.rollup("disposition")
+
+    @property
+    def states(self) -> dict:
+        return self.cube.rollup("state")
+
+    @property
+    def disp_connected(self) -> dict:
+        """Leads with a connection, per disposition."""
+        return self.cube.rollup("disposition", connected="yes")
+
+    @property
+    def disp_calls(self) -> dict:
+        """Leads with a connected-calls value, per disposition."""
+        return self.cube.rollup("disposition", connected=["yes", "no"])
+
+    # ── Spend ─────────────────────────────────────────────────────────────────
+    @property
+    def spend_n(self) -> int:
+        return self.spend.n
+
+    @property
+    def spend_sum(self) -> float:
+        """Exact: summed in whole paise."""
+        return self.spend.total / 100
+
+    def spend_stats(self) -> tuple:
+        """Rounded spend mean and sample std, as reported in the KPIs (exact paise sums either way)."""
+        n = self.spend_n
+        mean = self.spend_sum / n if n else 0.0
+        # n * sum(p^2) - sum(p)^2 in whole paise: exact, so retracting leads never drifts it
+        spread = n * self.spend.squares - self.spend.total ** 2
+        std = np.sqrt(spread / (n * (n - 1))) / 100 if n > 1 else None
+        return _r(mean if n else None, 2), _r(std, 2)
+
+    def spend_above(self, threshold: float) -> int:
+        return int(self.spend.counts[self.spend.values() > threshold].sum())
+
+    def spend_quantiles(self, qs=QUANTILES) -> np.ndarray:
+        return _quantiles(self.spend.values(), self.spend.counts, qs)
+
+    def spend_fence(self) -> float:
+        """Upper Tukey fence, Q3 + 1.5·IQR: spend above it marks a cost outlier."""
+        q1, q3 = self.spend_quantiles((0.25, 0.75))
+        return _r(q3 + IQR_FENCE * (q3 - q1), 2)
+
+    def spend_histogram(self, bins: int) -> tuple:
+        """Same counts and edges as ``np.histogram`` over the underlying spend values (over the
+        bucket representatives, on the bucket-widened range, once the sketch is coarse)."""
+        values = self.spend.values()
+        if not len(values):
+            return np.histogram(values, bins=bins)
+        hist, edges = np.histogram(values, bins=bins, range=self.spend.range(), weights=self.spend.counts)
+        return hist.astype(np.int64), edges
+
+    # ── Chart tallies ─────────────────────────────────────────────────────────
+    def attempt_distribution(self) -> tuple:
+        """Distinct attempt counts (ints when they are all whole and non-negative) and their frequencies."""
+        labels, counts = self.attempts
+        if len(labels) and labels[0] >= 0 and np.array_equal(labels, np.floor(labels)):
+            labels = labels.astype(np.int64)
+        return labels, counts
+
+    def attempt_quantiles(self, qs=QUANTILES) -> np.ndarray:
+        return _quantiles(*self.attempts, qs)
+
+    # ── KPIs ──────────────────────────────────────────────────────────────────
+    def kpis(self) -> dict:
+        total      = self.total
+        ptp_count  = self.dispositions.get("PTP", 0)
+        ne_count   = self.dispositions.get("Not_Evaluated", 0)
+        active     = self.states.get("active", 0)
+        conn_leads = self.connected_leads
+        att_leads  = self.attempted_leads
+        spend      = _r(self.spend_sum, 2)
+        smean, sstd = self.spend_stats()
+        att_nc_n   = self.att_n - self.att_conn_n
+        att_nc_sum = self.att_sum - self.att_conn_sum
+        fence      = self.spend_fence()
+        quantiles  = {}
+        for name, values in (("spend", self.spend_quantiles()), ("attempts", self.attempt_quantiles())):
+            for q, v in zip(QUANTILES, values):
+                quantiles[f"{name}_p{round(q * 100)}"] = _r(v, 2)
+        return dict(
+            total=total, ptp_count=ptp_count, ptp_pct=_r(ptp_count / total * 100),
+            connected_leads=conn_leads, connection_rate=_r(conn_leads / total * 100),
+            attempted_leads=att_leads, active_count=active,
+            active_pct=_r(active / total * 100),
+            total_spend=spend, cost_per_ptp=_r(spend / ptp_count if ptp_count else 0, 2),
+            avg_attempts=_r(self.att_sum / self.att_n if self.att_n else None),
+            avg_attempts_connected=_r(self.att_conn_sum / self.att_conn_n if self.att_conn_n else 0),
+            avg_attempts_not_connected=_r(att_nc_sum / att_nc_n if att_nc_n else 0),
+            attempt_efficiency=_r(conn_leads / att_leads * 100 if att_leads else 0),
+            completed_leads=self.states.get("completed", 0),
+            not_eval_count=ne_count, not_eval_pct=_r(ne_count / total * 100),
+            overattempted=self.overattempted, overattempted_pct=_r(self.overattempted / total * 100),
+            cost_outliers=self.spend_above(fence), cost_outlier_fence=fence,
+            spend_mean=smean, spend_std=sstd, **quantiles,
+            cost_per_connection=_r(spend / conn_leads if conn_leads else 0, 2),
+            cost_per_lead=_r(spend / total, 2),
+            cost_per_attempt=_r(spend / att_leads if att_leads else 0, 2),
+            total_attempted_calls=int(self.att_sum),
+            total_connected_calls=int(self.conn_sum),
+            dispositions=self.dispositions, states=self.states,
+        )
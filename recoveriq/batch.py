@@ -0,0 +1,93 @@
+"""Portfolio analysis of many campaign CSVs at once.
+
+Each file is read by the chunked streaming reader in its own worker process, so
+throughput scales with cores and memory stays bounded per worker.  Workers send
+back their ``KpiAggregate`` rather than rows; the portfolio view is the fold of
+those aggregates, so every portfolio KPI (the spend quantiles and cost-outlier count
+included) is exactly what one file holding all the campaigns would give.
+"""
+from __future__ import annotations
+
+import json
+import multiprocessing
+import operator
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
+
+from .compressed import open_upload
+from .engine import build_funnel, compute_levers, compute_risks, compute_score
+from .ingest import mapped, stream_aggregate
+
+# Workers are started by a fork server (spawn where there is none): forking the
+# multithreaded web server could copy a lock some other thread holds.
+_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+_pool, _pool_workers = None, None
+_pool_lock = threading.Lock()
+
+
+def _executor(workers: int | None = None) -> ProcessPoolExecutor:
+    """The shared worker pool, replaced when a caller asks for a different size."""
+    global _pool, _pool_workers
+    workers = workers or os.cpu_count()
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                # Batches already submitted to the old pool still finish
+                _pool.shutdown(wait=False)
+            _pool, _pool_workers = ProcessPoolExecutor(max_workers=workers, mp_context=_CONTEXT), workers
+        return _pool
+
+
+def analyse_file(path: str, name: str | None = None) -> dict:
+    """Worker entry point: one campaign's aggregate plus its own KPIs, score, risks and levers."""
+    with open(path, "rb") as fh, mapped(fh) as data:
+        agg, _ = stream_aggregate(open_upload(data), charts=False)
+    k = agg.kpis()
+    return dict(
+        name=name or os.path.basename(path), aggregate=agg,
+        kpis=k, score=compute_score(k),
+        risks=compute_risks(k), levers=compute_levers(k),
+    )
+
+
+def portfolio(results: list) -> dict:
+    """Merge per-campaign results from analyse_file into one portfolio view."""
+    k = reduce(operator.add, (r["aggregate"] for r in results)).kpis()
+    return dict(
+        campaigns=len(results), kpis=k, score=compute_score(k),
+        funnel=build_funnel(k),
+        risks=compute_risks(k), levers=compute_levers(k),
+    )
+
+
+def analyse_batch(files: list, workers: int | None = None) -> dict:
+    """Analyse ``files`` (paths, or (path, name) pairs) in parallel.
+
+    Returns per-campaign summaries in input order, the merged portfolio, and an
+    ``errors`` list for files that could not be analysed.
+    """
+    pool = _executor(workers)
+    jobs = []
+    for item in files:
+        path, name = item if isinstance(item, tuple) else (item, None)
+        jobs.append((name or os.path.basename(path), pool.submit(analyse_file, path, name)))
+    campaigns, errors = [], []
+    for name, fut in jobs:
+        try:
+            campaigns.append(fut.result())
+        except Exception as exc:
+            errors.append({"name": name, "error": str(exc)})
+    return dict(
+        campaigns=[{k: v for k, v in c.items() if k != "aggregate"} for c in campaigns],
+        portfolio=portfolio(campaigns) if campaigns else None,
+        errors=errors,
+    )
+
+
+if __name__ == "__main__":
+    json.dump(analyse_batch(sys.argv[1:]), sys.stdout, indent=2, default=str)
+    print()
@@ -0,0 +1,145 @@
+"""Compressed uploads: gzip, zip and zstd, recognised by their magic bytes.
+
+``open_upload`` hands back a plain upload as it is and a compressed one as a
+``Decompressed`` stream, which inflates on demand as the CSV readers pull
+bytes, so no inflated copy of the file exists anywhere.  The readers rewind
+their input (to re-read past the header, and for the streaming reader's
+second pass); rewinding restarts decompression from the top of the archive.
+zstd needs the optional ``zstandard`` package.
+"""
+from __future__ import annotations
+
+import gzip
+import io
+import mmap
+import zipfile
+
+from .ingest import UploadError
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MAGIC = {b"\x1f\x8b": "gzip", b"PK\x03\x04": "zip", b"\x28\xb5\x2f\xfd": "zstd"}
+# File name suffixes the upload forms accept, compressed or not.
+SUFFIXES = ("csv", "gz", "zip", "zst")
+
+
+def detect(f) -> str | None:
+    """The compression of a seekable stream from its first bytes, or None for plain data."""
+    start = f.tell()
+    head  = f.read(4)
+    f.seek(start)
+    for magic, codec in MAGIC.items():
+        if head.startswith(magic):
+            return codec
+    return None
+
+
+def _zip_member(zf: zipfile.ZipFile) -> zipfile.ZipInfo:
+    files = [i for i in zf.infolist() if not i.is_dir() and not i.filename.startswith("__MACOSX/")]
+    csvs  = [i for i in files if i.filename.lower().endswith(".csv")] or files
+    if len(csvs) != 1:
+        raise UploadError(f"Expected one CSV in the zip archive, found {len(csvs)}")
+    return csvs[0]
+
+
+class _MapFile(io.RawIOBase):
+    """A memory map as a file object; ``zipfile`` asks for ``seekable``, which ``mmap`` lacks."""
+
+    def __init__(self, mm: mmap.mmap):
+        self.mm = mm
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        data = self.mm.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+    def tell(self) -> int:
+        return self.mm.tell()
+
+    def seek(self, pos: int, whence: int = io.SEEK_SET) -> int:
+        self.mm.seek(pos, whence)
+        return self.mm.tell()
+
+
+class Decompressed(io.RawIOBase):
+    """Read-only view of the inflated bytes of a seekable compressed stream.
+
+    ``seek`` goes forward by inflating and discarding, and backward by starting
+    over; seeking from the end is not possible without inflating everything, so
+    callers use ``fraction`` (share of the compressed input consumed) for progress.
+    """
+
+    def __init__(self, raw, codec: str):
+        if isinstance(raw, mmap.mmap):
+            raw = _MapFile(raw)
+        self.raw, self.codec = raw, codec
+        self.start = raw.tell()
+        raw.seek(0, 2)
+        self.compressed_size = max(raw.tell() - self.start, 1)
+        raw.seek(self.start)
+        if codec == "zstd" and zstandard is None:
+            raise UploadError("zstd uploads need the zstandard package")
+        if codec == "zip":
+            try:
+                self._zip = zipfile.ZipFile(raw)
+            except zipfile.BadZipFile as exc:
+                raise UploadError(f"Unreadable zip archive: {exc}") from None
+            self._member = _zip_member(self._zip)
+        self._open()
+
+    def _open(self) -> None:
+        self.raw.seek(self.start)
+        if self.codec == "gzip":
+            self._stream = gzip.GzipFile(fileobj=self.raw, mode="rb")
+        elif self.codec == "zip":
+            self._stream = self._zip.open(self._member)
+        else:
+            self._stream = zstandard.ZstdDecompressor().stream_reader(self.raw, read_across_frames=True)
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        try:
+            n = self._stream.readinto(b)
+        except (OSError, EOFError, zipfile.BadZipFile) as exc:
+            raise UploadError(f"Corrupt {self.codec} upload: {exc}") from None
+        self._pos += n
+        return n
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, pos: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            pos += self._pos
+        elif whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("Cannot seek from the end of a compressed stream")
+        if pos < self._pos:
+            self._open()
+        while self._pos < pos:
+            if not self.read(min(pos - self._pos, 1 << 20)):
+                break
+        return self._pos
+
+    def fraction(self) -> float:
+        return min((self.raw.tell() - self.start) / self.compressed_size, 1.0)
+
+
+def open_upload(f):
+    """``f`` itself for a plain upload, else a ``Decompressed`` view of it."""
+    codec = detect(f)
+    return f if codec is None else Decompressed(f, codec)
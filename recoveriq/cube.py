@@ -0,0 +1,184 @@
+"""Segment cube: lead counts and sums for every combination of a campaign's categories.
+
+The dimensions are fixed: disposition, state, an attempt-count bucket and a
+connected flag.  Other categorical columns of an upload are not dimensions:
+the readers parse only the analysed columns and the dataset store keeps only
+those, so a campaign reopened from the store, or updated live, would have lost
+them.  Segmenting by such columns would need them carried through ingest, the
+store and live updates first.
+
+Each cell holds the number of leads, their spend (in paise, and how many leads
+have one) and their attempted / connected call sums.  The cube is a few hundred
+to a few thousand dense cells however many leads it summarises, so tallies,
+rollups and filtered totals are numpy reductions over it rather than scans of
+the rows.  Cubes merge and retract like ``KpiAggregate``, which keeps one as
+the source of all of its counts.
+
+Every dimension has a trailing ``None`` label for leads whose value is missing;
+rollups leave those cells out.
+"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from .schema import spend_values
+
+DIMENSIONS      = ("disposition", "state", "attempts", "connected")
+ATTEMPT_BUCKETS = ["0", "1-3", "4-6", "7-9", "10-12", "13+"]
+MEASURES        = ("leads", "spend_paise", "spend_n", "att_sum", "conn_sum")
+
+# Upper bounds of all but the last attempt bucket; "13+" is exactly the over-attempt line (> 12).
+_BUCKET_TOPS = np.array([0, 3, 6, 9, 12], dtype=float)
+
+
+def _category_codes(col: pd.Series) -> tuple:
+    """Codes with missing values moved to the trailing ``None`` label, and the labels."""
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        codes, names = col.cat.codes.to_numpy(), col.cat.categories
+    else:
+        codes, names = pd.factorize(col)
+    labels = [str(v) for v in names] + [None]
+    return np.where(codes < 0, len(labels) - 1, codes).astype(np.int64), labels
+
+
+class SegmentCube:
+    """Dense per-cell measures over labelled dimensions; ``a + b`` and ``a - b`` as for ``KpiAggregate``.
+
+    Dimensions are kept in the order of ``dims``.  Merging is general over them (a
+    dimension only one side has is rolled up first), though ``from_frame`` always
+    builds ``DIMENSIONS``.  The empty cube (no dimensions at all) is the identity.
+    """
+
+    def __init__(self, dims: dict | None = None, measures: dict | None = None):
+        self.dims     = dims or {}
+        self.measures = measures or {}
+
+    @property
+    def empty(self) -> bool:
+        return not self.dims
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "SegmentCube":
+        att  = df["AI_Attempted_Calls"].to_numpy(dtype=float)
+        con  = df["AI_Connected_Calls"].to_numpy(dtype=float)
+        sp   = spend_values(df["Total_Spend_INR"])
+        nan  = np.isnan(att)
+        bucket = np.where(nan, len(ATTEMPT_BUCKETS), np.searchsorted(_BUCKET_TOPS, np.where(nan, 0, att)))
+        connected = np.where(np.isnan(con), 2, np.where(con > 0, 0, 1))
+
+        dims, codes = {}, []
+        for name, (c, labels) in (
+            ("disposition", _category_codes(df["Lead_Entity_Disposition"])),
+            ("state",       _category_codes(df["Lead_State"])),
+            ("attempts",    (bucket, ATTEMPT_BUCKETS + [None])),
+            ("connected",   (connected, ["yes", "no", None])),
+        ):
+            dims[name] = labels
+            codes.append(c)
+        shape = tuple(len(v) for v in dims.values())
+        cells = int(np.prod(shape))
+        flat  = np.ravel_multi_index(codes, shape)
+        sp_ok = ~np.isnan(sp)
+        weights = dict(
+            spend_paise=np.where(sp_ok, np.rint(np.where(sp_ok, sp, 0) * 100), 0),
+            spend_n=sp_ok,
+            att_sum=np.where(nan, 0, att),
+            conn_sum=np.where(np.isnan(con), 0, con),
+        )
+        measures = {"leads": np.bincount(flat, minlength=cells).reshape(shape)}
+        for name, w in weights.items():
+            measures[name] = np.bincount(flat, weights=w, minlength=cells).reshape(shape)
+        return cls(dims, measures)
+
+    # ── Merging ───────────────────────────────────────────────────────────────
+    def _reduced(self, names) -> "SegmentCube":
+        """This cube rolled up onto the dimensions in ``names`` (kept in this cube's order)."""
+        drop = tuple(i for i, n in enumerate(self.dims) if n not in names)
+        if not drop:
+            return self
+        dims = {n: v for n, v in self.dims.items() if n in names}
+        return SegmentCube(dims, {m: a.sum(axis=drop) for m, a in self.measures.items()})
+
+    def _expanded(self, dims: dict) -> dict:
+        """Measures laid out on ``dims`` (same names and order, each a superset of this cube's labels)."""
+        index = [[labels.index(v) for v in self.dims[n]] for n, labels in dims.items()]
+        shape = tuple(len(v) for v in dims.values())
+        out   = {}
+        for m, a in self.measures.items():
+            out[m] = np.zeros(shape, dtype=a.dtype)
+            out[m][np.ix_(*index)] = a
+        return out
+
+    def merge(self, other: "SegmentCube", sign: int = 1) -> "SegmentCube":
+        if other.empty:
+            return self
+        if self.empty:
+            return SegmentCube(other.dims, {m: sign * a for m, a in other.measures.items()})
+        shared = [n for n in self.dims if n in other.dims]
+        a, b = self._reduced(shared), other._reduced(shared)
+        dims = {}
+        for n in shared:
+            labels = [v for v in a.dims[n] if v is not None]
+            seen   = set(labels)
+            labels += [v for v in b.dims[n] if v is not None and v not in seen]
+            dims[n] = labels + [None]
+        left, right = a._expanded(dims), b._expanded(dims)
+        return SegmentCube(dims, {m: left[m] + sign * right[m] for m in left})
+
+    def retract(self, other: "SegmentCube") -> "SegmentCube":
+        return self.merge(other, sign=-1)
+
+    __add__ = merge
+    __sub__ = retract
+
+    # ── Queries ───────────────────────────────────────────────────────────────
+    def _keep(self, filters: dict) -> np.ndarray:
+        """Boolean mask, broadcastable over the cells, of the labels in ``filters`` (one label or a list)."""
+        unknown = set(filters) - set(self.dims)
+        if unknown:
+            raise KeyError(f"Unknown dimensions: {', '.join(sorted(unknown))}")
+        keep = np.ones((1,) * len(self.dims), dtype=bool)
+        for axis, (name, labels) in enumerate(self.dims.items()):
+            want = filters.get(name)
+            if want is None:
+                continue
+            want = {str(want)} if isinstance(want, (str, int, float)) else {str(v) for v in want}
+            shape = [-1 if i == axis else 1 for i in range(len(self.dims))]
+            keep = keep & np.array([v in want for v in labels]).reshape(shape)
+        return keep
+
+    def where(self, **filters) -> "SegmentCube":
+        """The cube restricted to the given labels, e.g. ``where(state="active", attempts=["10-12", "13+"])``."""
+        if self.empty or not filters:
+            return self
+        keep = self._keep(filters)
+        return SegmentCube(self.dims, {m: np.where(keep, a, 0) for m, a in self.measures.items()})
+
+    def total(self, measure: str = "leads", **filters) -> float:
+        if self.empty:
+            return 0
+        return self.where(**filters).measures[measure].sum()
+
+    def rollup(self, *names, measure: str = "leads", **filters) -> dict:
+        """``measure`` summed per label of ``names`` (tuples of labels for several), largest first.
+
+        Cells with a missing label, and cells holding no leads, are left out.
+        """
+        if self.empty:
+            return {}
+        cube  = self.where(**filters)
+        axes  = [list(self.dims).index(n) for n in names]
+        other = tuple(i for i in range(len(self.dims)) if i not in axes)
+        # sum() keeps the remaining axes in cube order; put them in the order asked for
+        perm  = np.argsort(np.argsort(axes))
+        leads = cube.measures["leads"].sum(axis=other).transpose(perm)
+        vals  = cube.measures[measure].sum(axis=other).transpose(perm)
+        labels = [self.dims[n] for n in names]
+        out = []
+        for idx in zip(*np.nonzero(leads)):
+            key = tuple(labels[i][j] for i, j in enumerate(idx))
+            if None not in key:
+                out.append((key if len(names) > 1 else key[0], vals[idx]))
+        out.sort(key=lambda kv: -kv[1])
+        return {k: (int(v) if measure in ("leads", "spend_n") else float(v)) for k, v in out}
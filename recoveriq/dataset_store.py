@@ -0,0 +1,303 @@
+"""On-disk store of uploaded campaigns, so they can be reopened without a re-upload.
+
+Each campaign is an Arrow IPC file of its analysed columns, with a small JSON
+meta file beside it (name, rows, columns, when it was stored).  Stored
+campaigns back re-analysis after a result-cache eviction, filtered queries and
+live record updates; the store is bounded by a disk budget.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# pyarrow is only needed once a dataset is actually written or read.
+pa = ipc = None
+
+# A dataset id is the first 16 hex digits of its upload's content hash.  Anything
+# else could name one of a campaign's other files, so it is not a dataset at all.
+DATASET_ID    = re.compile(r"[0-9a-f]{16}")
+DICT_COLUMNS  = ("Lead_Entity_Disposition", "Lead_State")
+COUNT_COLUMNS = ("AI_Attempted_Calls", "AI_Connected_Calls")
+
+
+def _tmp_suffix() -> str:
+    # Per thread as well as per process: concurrent uploads of the same bytes write the same dataset
+    return f".{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def valid_id(dataset_id) -> bool:
+    return isinstance(dataset_id, str) and DATASET_ID.fullmatch(dataset_id) is not None
+
+
+def _arrow():
+    global pa, ipc
+    if pa is None:
+        import pyarrow
+        import pyarrow.ipc
+        pa, ipc = pyarrow, pyarrow.ipc
+    return pa, ipc
+
+
+def _count_type(dtype):
+    """Counts narrow_counts left unsigned stay so; fractional, negative or gappy ones go as float64."""
+    pa, _ = _arrow()
+    if dtype.kind != "u":
+        return pa.float64()
+    return pa.uint32() if dtype.itemsize <= 4 else pa.uint64()
+
+
+def _schema(df: pd.DataFrame) -> "pa.Schema":
+    pa, _ = _arrow()
+    types = {
+        "Lead_ID":                 pa.string(),
+        "Lead_Entity_Disposition": pa.dictionary(pa.int32(), pa.string()),
+        "Lead_State":              pa.dictionary(pa.int32(), pa.string()),
+        # float64 whatever the frame holds: one chunk may fit float32 and the next not
+        "Total_Spend_INR":         pa.float64(),
+    }
+    for c in COUNT_COLUMNS:
+        if c in df:
+            types[c] = _count_type(df[c].dtype)
+    order = ("Lead_ID",) + DICT_COLUMNS + COUNT_COLUMNS + ("Total_Spend_INR",)
+    return pa.schema([(c, types[c]) for c in order if c in df])
+
+
+class _Writer:
+    """Appends frame chunks to one Arrow IPC file; dictionaries only ever grow, so later
+    chunks are written as dictionary deltas and the file stays memory-mappable."""
+
+    def __init__(self, store: "DatasetStore", dataset_id: str, name: str | None):
+        self.store, self.dataset_id, self.name = store, dataset_id, name
+        self.tmp    = store.path(dataset_id) + _tmp_suffix()
+        self.rows   = 0
+        self.aborted = False
+        self._w     = None
+        self._cats  = {c: [] for c in DICT_COLUMNS}
+        self._seen  = {c: {} for c in DICT_COLUMNS}
+
+    def write(self, df: pd.DataFrame) -> None:
+        pa, ipc = _arrow()
+        if self.aborted:
+            return
+        if self._w is None:
+            self.schema = _schema(df)
+            opts = ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+            self._w = ipc.new_file(self.tmp, self.schema, options=opts)
+        arrays = []
+        for field in self.schema:
+            col = df[field.name]
+            if field.name in self._cats:
+                arrays.append(self._encode(field.name, col))
+            else:
+                arr = pa.array(col, type=field.type, from_pandas=True)
+                # Arrow-backed columns (Lead_ID from the Arrow CSV reader) can come back in chunks
+                arrays.append(arr.combine_chunks() if isinstance(arr, pa.ChunkedArray) else arr)
+        self._w.write_batch(pa.record_batch(arrays, schema=self.schema))
+        self.rows += len(df)
+
+    def _encode(self, name: str, col: pd.Series):
+        pa, _ = _arrow()
+        cats, seen = self._cats[name], self._seen[name]
+        if not isinstance(col.dtype, pd.CategoricalDtype):
+            col = col.astype("category")
+        names = [str(v) for v in col.cat.categories]
+        for v in names:
+            if v not in seen:
+                seen[v] = len(cats)
+                cats.append(v)
+        # Chunk-local category codes -> positions in the file-wide dictionary (-1 stays missing)
+        lookup = np.array([seen[v] for v in names] + [-1], dtype=np.int32)
+        codes  = lookup[col.cat.codes.to_numpy()]
+        return pa.DictionaryArray.from_arrays(
+            pa.array(codes, type=pa.int32(), mask=codes < 0), pa.array(cats, type=pa.string()))
+
+    def abort(self) -> None:
+        """Drop what was written; later writes are ignored and nothing is stored."""
+        self.aborted = True
+        self._discard()
+
+    def _discard(self) -> None:
+        if self._w is not None:
+            self._w.close()
+            self._w = None
+        if os.path.exists(self.tmp):
+            os.remove(self.tmp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None or self._w is None:
+            self._discard()
+            return False
+        self._w.close()
+        os.replace(self.tmp, self.store.path(self.dataset_id))
+        self.store._write_meta(self.dataset_id, dict(
+            dataset_id=self.dataset_id, name=self.name, rows=self.rows,
+            columns=self.schema.names, created=time.time(),
+        ))
+        self.store.trim(keep={self.dataset_id})
+        return False
+
+
+class DatasetStore:
+    """Uploaded campaigns kept as Arrow IPC files under ``root``, one per dataset id.
+
+    Dispositions and states are dictionary-encoded (categoricals once loaded) and
+    files are read through a memory map, so reopening a stored campaign costs a
+    page-in rather than a CSV parse.  Record updates posted after the upload are
+    kept beside it as numbered delta files, in the order they arrived; ``load``
+    returns the rows as uploaded and ``deltas`` the updates to replay over them.
+
+    With ``max_bytes`` set the store is trimmed to it after every write, least
+    recently loaded or written campaign first (the one just written is kept).
+    """
+
+    def __init__(self, root: str, max_bytes: int | None = None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, dataset_id: str) -> str:
+        if not valid_id(dataset_id):
+            raise ValueError(f"Not a dataset id: {dataset_id!r}")
+        return os.path.join(self.root, f"{dataset_id}.arrow")
+
+    def delta_path(self, dataset_id: str, seq: int) -> str:
+        return self.path(dataset_id)[:-len(".arrow")] + f".delta{seq:05d}.arrow"
+
+    def exists(self, dataset_id: str) -> bool:
+        return valid_id(dataset_id) and os.path.exists(self.path(dataset_id))
+
+    def writer(self, dataset_id: str, name: str | None = None) -> _Writer:
+        return _Writer(self, dataset_id, name)
+
+    def save(self, dataset_id: str, df: pd.DataFrame, name: str | None = None) -> dict:
+        with self.writer(dataset_id, name) as w:
+            w.write(df)
+        return self.meta(dataset_id)
+
+    def append(self, dataset_id: str, df: pd.DataFrame, rows: int | None = None) -> dict:
+        """Store one batch of record updates; ``rows`` is the campaign's lead count after it."""
+        pa, ipc = _arrow()
+        meta   = self.meta(dataset_id)
+        seq    = meta.get("deltas", 0) + 1
+        schema = _schema(df)
+        table  = pa.Table.from_pandas(df[schema.names], schema=schema, preserve_index=False)
+        tmp    = self.delta_path(dataset_id, seq) + _tmp_suffix()
+        with ipc.new_file(tmp, table.schema.remove_metadata()) as w:
+            w.write_table(table)
+        os.replace(tmp, self.delta_path(dataset_id, seq))
+        meta.update(deltas=seq, updated=time.time())
+        if rows is not None:
+            meta["rows"] = rows
+        self._write_meta(dataset_id, meta)
+        self.touch(dataset_id)
+        self.trim(keep={dataset_id})
+        return meta
+
+    def table(self, dataset_id: str, columns=None, path: str | None = None) -> "pa.Table":
+        pa, ipc = _arrow()
+        with pa.memory_map(path or self.path(dataset_id)) as src:
+            table = ipc.open_file(src).read_all()
+        return table.select(columns) if columns else table
+
+    def batches(self, dataset_id: str, rows: int):
+        """The stored rows as frames of at most ``rows`` leads, read off the memory map one at a time."""
+        self.touch(dataset_id)
+        for batch in self.table(dataset_id).to_batches(max_chunksize=rows):
+            yield batch.to_pandas()
+
+    def load(self, dataset_id: str, columns=None) -> pd.DataFrame:
+        self.touch(dataset_id)
+        return self.table(dataset_id, columns).to_pandas()
+
+    def deltas(self, dataset_id: str):
+        """The stored record updates as frames, oldest first."""
+        for seq in range(1, (self.meta(dataset_id) or {}).get("deltas", 0) + 1):
+            yield self.table(dataset_id, path=self.delta_path(dataset_id, seq)).to_pandas()
+
+    def meta(self, dataset_id: str) -> dict | None:
+        if not valid_id(dataset_id):
+            return None
+        try:
+            with open(os.path.join(self.root, f"{dataset_id}.json")) as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            return None
+
+    def list(self) -> list:
+        out = [self.meta(name[:-6]) for name in os.listdir(self.root)
+               if name.endswith(".arrow") and name.count(".") == 1]
+        return sorted((m for m in out if m), key=lambda m: -m["created"])
+
+    # ── Retention ─────────────────────────────────────────────────────────────
+    def touch(self, dataset_id: str) -> None:
+        """Mark a campaign as just used; eviction goes by the data file's mtime."""
+        try:
+            os.utime(self.path(dataset_id))
+        except FileNotFoundError:
+            pass
+
+    def delete(self, dataset_id: str) -> bool:
+        """Remove a campaign with its updates; False if there was none."""
+        if not valid_id(dataset_id):
+            return False
+        found = False
+        for name in os.listdir(self.root):
+            if name.startswith(f"{dataset_id}.") and not name.endswith(".tmp"):
+                try:
+                    os.remove(os.path.join(self.root, name))
+                    found = True
+                except FileNotFoundError:
+                    pass
+        return found
+
+    def disk_usage(self) -> dict:
+        """dataset id -> (bytes on disk, last used)."""
+        usage = {}
+        for name in os.listdir(self.root):
+            if name.endswith(".tmp"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.root, name))
+            except FileNotFoundError:
+                continue
+            dataset_id = name.split(".", 1)[0]
+            size, used = usage.get(dataset_id, (0, 0.0))
+            usage[dataset_id] = (size + st.st_size,
+                                 st.st_mtime if name == f"{dataset_id}.arrow" else used)
+        return usage
+
+    def trim(self, keep=()) -> list:
+        """Evict least recently used campaigns until the store fits ``max_bytes``; returns their ids."""
+        if not self.max_bytes:
+            return []
+        with self._lock:
+            usage   = self.disk_usage()
+            total   = sum(size for size, _ in usage.values())
+            evicted = []
+            for dataset_id, (size, _) in sorted(usage.items(), key=lambda kv: kv[1][1]):
+                if total <= self.max_bytes:
+                    break
+                if dataset_id in keep:
+                    continue
+                self.delete(dataset_id)
+                total -= size
+                evicted.append(dataset_id)
+            self.evictions += len(evicted)
+            return evicted
+
+    def _write_meta(self, dataset_id: str, meta: dict) -> None:
+        path = os.path.join(self.root, f"{dataset_id}.json")
+        with open(path + _tmp_suffix(), "w") as fh:
+            json.dump(meta, fh)
+        os.replace(path + _tmp_suffix(), path)
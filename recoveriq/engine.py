@@ -0,0 +1,323 @@
+"""The analytics engine: demo data, KPIs, score, funnel, charts, risks and levers.
+
+Everything here works on a lead frame in the ``schema`` layout (or on the KPI dict
+derived from one) and returns plain JSON-able values; the front ends only render.
+"""
+import numpy as np
+import pandas as pd
+
+from .aggregate import KpiAggregate, _r
+from .metrics import count_rows, timed
+from .schema import compact, spend_values
+from .synth import generate_leads
+
+
+# ── Demo data ─────────────────────────────────────────────────────────────────
+def generate_demo_data(n: int = 500) -> pd.DataFrame:
+    """The first ``n`` leads of the default synthetic mix (see ``synth``), seed 42."""
+    return compact(generate_leads(np.random.default_rng(42), n))
+
+
+# ── Constants ─────────────────────────────────────────────────────────────────
+# Campaigns up to SCATTER_POINTS leads plot every lead; larger ones a density grid.
+SCATTER_POINTS = 1000
+SPEND_BINS     = 14
+DENSITY_X_BINS = 40
+DENSITY_Y_BINS = 30
+DENSITY_OUTLIERS = 200
+# Bump whenever the build_response payload changes shape; it salts the result-cache key.
+PAYLOAD_VERSION = 5
+
+
+# ── KPIs ──────────────────────────────────────────────────────────────────────
+def compute_kpis(df: pd.DataFrame) -> dict:
+    return KpiAggregate.from_frame(df).kpis()
+
+
+def compute_score(k: dict) -> dict:
+    ptp_s  = min(k["ptp_pct"] / 25 * 10, 10)
+    con_s  = min(k["connection_rate"] / 60 * 10, 10)
+    act_s  = max(0.0, 10 - max(0.0, (k["active_pct"] - 50) / 50 * 10))
+    cst_s  = min(150 / k["cost_per_ptp"] * 10, 10) if k["cost_per_ptp"] > 0 else 0.0
+    value  = _r(ptp_s * .40 + con_s * .30 + act_s * .15 + cst_s * .15)
+    grade, color = (
+        ("Strong", "#22c55e") if value >= 7 else
+        ("Needs Optimization", "#f59e0b") if value >= 4 else
+        ("At Risk", "#ef4444")
+    )
+    return dict(
+        value=value, grade=grade, color=color,
+        components={
+            "PTP Rate (40%)":        _r(ptp_s * .40, 2),
+            "Connection Rate (30%)": _r(con_s * .30, 2),
+            "Active Mgmt (15%)":     _r(act_s * .15, 2),
+            "Cost Efficiency (15%)": _r(cst_s * .15, 2),
+        },
+        max_scores=[4.0, 3.0, 1.5, 1.5],
+    )
+
+
+def build_funnel(k: dict) -> list:
+    return [
+        {"stage": "Total Leads", "value": k["total"],           "color": "#3b82f6"},
+        {"stage": "Attempted",   "value": k["attempted_leads"],  "color": "#6366f1"},
+        {"stage": "Connected",   "value": k["connected_leads"],  "color": "#22c55e"},
+        {"stage": "PTP",         "value": k["ptp_count"],        "color": "#c9a84c"},
+        {"stage": "Completed",   "value": k["completed_leads"],  "color": "#0ea5e9"},
+    ]
+
+
+def scatter_points(samp: pd.DataFrame) -> dict:
+    """Every lead with a disposition as parallel arrays; ``d`` indexes into ``dispositions``.
+
+    Leads with no disposition have no series to go in, and are left out as the density grid leaves them.
+    """
+    codes, names = pd.factorize(samp["Lead_Entity_Disposition"])
+    if (codes < 0).any():
+        samp, codes = samp[codes >= 0], codes[codes >= 0]
+    x = np.nan_to_num(samp["AI_Attempted_Calls"].to_numpy(dtype=float), nan=0, posinf=0, neginf=0)
+    y = np.nan_to_num(spend_values(samp["Total_Spend_INR"]), nan=0, posinf=0, neginf=0)
+    return {
+        "mode":         "points",
+        "x":            x.astype(np.int64).tolist(),
+        "y":            np.round(y, 2).tolist(),
+        "d":            codes.tolist(),
+        "dispositions": [str(n) for n in names],
+        "connected":    (samp["AI_Connected_Calls"].to_numpy(dtype=float) > 0).astype(np.int8).tolist(),
+    }
+
+
+def density_edges(att_labels: np.ndarray, sp_lo: float, sp_hi: float) -> tuple:
+    """Grid edges: one column per whole attempt count while they fit, spend cut evenly."""
+    att_lo, att_hi = (float(att_labels[0]), float(att_labels[-1])) if len(att_labels) else (0.0, 0.0)
+    nx = int(min(max(att_hi - att_lo + 1, 1), DENSITY_X_BINS))
+    if not sp_hi > sp_lo:
+        sp_hi = sp_lo + 1
+    return (np.linspace(att_lo - 0.5, att_hi + 0.5, nx + 1),
+            np.linspace(sp_lo, sp_hi, DENSITY_Y_BINS + 1))
+
+
+class ScatterDensity:
+    """Exact per-disposition (attempts, spend) counts on fixed edges, plus the costliest outliers.
+
+    Frames are folded in row order with ``add``; every lead above ``threshold``
+    (the Q3 + 1.5·IQR cost-outlier fence) is a candidate point, and the
+    ``DENSITY_OUTLIERS`` highest spends are kept, earlier rows winning ties, so
+    the payload is the same however the rows were chunked.  ``update`` moves
+    leads already folded in to new values, as ``KpiAggregate`` subtraction does.
+    """
+
+    def __init__(self, x_edges: np.ndarray, y_edges: np.ndarray, threshold: float):
+        self.xe, self.ye, self.threshold = x_edges, y_edges, threshold
+        self.grids  = {}
+        self.points = []
+        self.offset = 0
+
+    @staticmethod
+    def _bin(v: np.ndarray, edges: np.ndarray) -> np.ndarray:
+        return np.clip(np.searchsorted(edges, v, side="right") - 1, 0, len(edges) - 2)
+
+    def same_bins(self, other: "ScatterDensity") -> bool:
+        return (self.threshold == other.threshold and np.array_equal(self.xe, other.xe)
+                and np.array_equal(self.ye, other.ye))
+
+    @staticmethod
+    def _leads(df: pd.DataFrame) -> tuple:
+        """(codes, names, x, y, ok) of a frame; ``ok`` marks the leads that can be plotted."""
+        col = df["Lead_Entity_Disposition"]
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            codes, names = col.cat.codes.to_numpy(), col.cat.categories
+        else:
+            codes, names = pd.factorize(col)
+        x  = df["AI_Attempted_Calls"].to_numpy(dtype=float)
+        y  = spend_values(df["Total_Spend_INR"])
+        return codes, names, x, y, (codes >= 0) & ~np.isnan(x) & ~np.isnan(y)
+
+    def _count(self, codes, names, x, y, ok, sign: int) -> None:
+        nx, ny = len(self.xe) - 1, len(self.ye) - 1
+        cell = (codes[ok].astype(np.int64) * nx + self._bin(x[ok], self.xe)) * ny + self._bin(y[ok], self.ye)
+        grids = np.bincount(cell, minlength=len(names) * nx * ny).reshape(len(names), nx, ny)
+        for i, name in enumerate(names):
+            if grids[i].any():
+                name = str(name)
+                grid = self.grids.get(name, 0) + sign * grids[i]
+                # A disposition whose last lead moved away has no grid, as if never seen
+                if grid.any():
+                    self.grids[name] = grid
+                else:
+                    del self.grids[name]
+
+    def add(self, df: pd.DataFrame) -> None:
+        codes, names, x, y, ok = self._leads(df)
+        self._count(codes, names, x, y, ok, 1)
+        idx = np.flatnonzero(ok & (y > self.threshold))
+        if len(idx):
+            idx = idx[np.lexsort((idx, -y[idx]))][:DENSITY_OUTLIERS]
+            self.points.append((x[idx], y[idx], np.asarray(names, dtype=object)[codes[idx]].astype(str),
+                                idx + self.offset))
+        self.offset += len(df)
+
+    def update(self, old: pd.DataFrame, new: pd.DataFrame, pos: np.ndarray) -> bool:
+        """Move the leads at rows ``pos`` from their ``old`` values to ``new`` ones.
+
+        ``old`` has a row for each of the first ``len(old)`` positions; the rest
+        are leads not folded in before.  Returns False when a kept outlier moved
+        and a lead outside ``pos`` might now take its place, which only a fresh
+        pass over the rows can tell; the grid is then to be rebuilt.
+        """
+        self._count(*self._leads(old), -1)
+        codes, names, x, y, ok = self._leads(new)
+        self._count(codes, names, x, y, ok, 1)
+
+        kx, ky, kd, kp = self._outliers()
+        kept = ~np.isin(kp, pos)
+        idx  = np.flatnonzero(ok & (y > self.threshold))
+        x = np.concatenate([kx[kept], x[idx]])
+        y = np.concatenate([ky[kept], y[idx]])
+        d = np.concatenate([kd[kept], np.asarray(names, dtype=object)[codes[idx]].astype(str)])
+        p = np.concatenate([kp[kept], pos[idx]])
+        if len(kp) >= DENSITY_OUTLIERS and not kept.all():
+            # The kept outliers left are the costliest of the other leads only down to the last of them
+            if not kept.any():
+                return False
+            last_y, last_p = ky[kept][-1], kp[kept][-1]
+            if ((y > last_y) | ((y == last_y) & (p <= last_p))).sum() < DENSITY_OUTLIERS:
+                return False
+        top = np.lexsort((p, -y))[:DENSITY_OUTLIERS]
+        self.points = [(x[top], y[top], d[top], p[top])]
+        return True
+
+    def _outliers(self) -> tuple:
+        """(attempts, spend, disposition, row) of the kept outliers, costliest first."""
+        if not self.points:
+            return np.empty(0), np.empty(0), np.empty(0, dtype=str), np.empty(0, dtype=np.int64)
+        x, y, d, pos = (np.concatenate(p) for p in zip(*self.points))
+        top = np.lexsort((pos, -y))[:DENSITY_OUTLIERS]
+        return x[top], y[top], d[top], pos[top]
+
+    def payload(self) -> dict:
+        names = sorted(self.grids)
+        xc = (self.xe[:-1] + self.xe[1:]) / 2
+        yc = (self.ye[:-1] + self.ye[1:]) / 2
+        cells = {"x": [], "y": [], "n": [], "d": []}
+        for i, name in enumerate(names):
+            xi, yi = np.nonzero(self.grids[name])
+            cells["x"] += np.round(xc[xi], 2).tolist()
+            cells["y"] += np.round(yc[yi], 2).tolist()
+            cells["n"] += self.grids[name][xi, yi].tolist()
+            cells["d"] += [i] * len(xi)
+        x, y, d, _ = self._outliers()
+        index = {name: i for i, name in enumerate(names)}
+        outliers = {
+            "x": x.astype(np.int64).tolist(),
+            "y": np.round(y, 2).tolist(),
+            "d": [index[v] for v in d],
+        }
+        return {
+            "mode":         "density",
+            "dispositions": names,
+            "x_edges":      np.round(self.xe, 2).tolist(),
+            "y_edges":      np.round(self.ye, 2).tolist(),
+            "cells":        cells,
+            "outliers":     outliers,
+        }
+
+
+def scatter_density(agg: KpiAggregate) -> ScatterDensity:
+    """An empty density grid sized for the leads ``agg`` summarises; fold their rows in with ``add``."""
+    lo, hi = agg.spend.range()
+    return ScatterDensity(*density_edges(agg.attempt_distribution()[0], lo, hi), threshold=agg.spend_fence())
+
+
+def compute_scatter(df: pd.DataFrame, agg: KpiAggregate) -> dict:
+    """Every lead for small campaigns; above SCATTER_POINTS a fixed-size density grid."""
+    if len(df) <= SCATTER_POINTS:
+        return scatter_points(df.sample(len(df), random_state=42))
+    density = scatter_density(agg)
+    density.add(df)
+    return density.payload()
+
+
+def charts_from(agg: KpiAggregate, scatter: dict) -> dict:
+    """Chart payload from an aggregate; only the scatter needs the rows themselves."""
+    counts, edges = agg.spend_histogram(SPEND_BINS)
+    att_labels, att_values = agg.attempt_distribution()
+    spend_hist = {
+        "labels": [f"₹{e:.0f}" for e in edges[:-1]],
+        "values": counts.tolist(),
+    }
+    attempt_dist = {
+        "labels": att_labels.tolist(),
+        "values": att_values.tolist(),
+    }
+    labels = sorted(agg.dispositions)
+    connected = [agg.disp_connected.get(d, 0) for d in labels]
+    conn_by_disp = {
+        "labels":    labels,
+        "connected": connected,
+        "not_connected": [agg.disp_calls.get(d, 0) - c for d, c in zip(labels, connected)],
+    }
+    return dict(scatter=scatter, spend_hist=spend_hist,
+                attempt_dist=attempt_dist, conn_by_disp=conn_by_disp)
+
+
+def compute_charts(df: pd.DataFrame, agg: KpiAggregate = None) -> dict:
+    agg = agg or KpiAggregate.from_frame(df)
+    return charts_from(agg, compute_scatter(df, agg))
+
+
+def compute_risks(k: dict) -> list:
+    """Up to four risk flags, each ``{"severity": "HIGH"|"MEDIUM"|"LOW", "title", "body"}``."""
+    risks = []
+    if k["ptp_pct"] < 15:
+        risks.append({"severity": "HIGH", "title": "Critical PTP Rate", "body": f"PTP rate {k['ptp_pct']}% is below the 15% baseline. Only {k['ptp_count']:,} of {k['total']:,} leads converted. Review script quality and targeting logic."})
+    if k["not_eval_pct"] > 15:
+        risks.append({"severity": "HIGH", "title": "High Not-Evaluated Pool", "body": f"{k['not_eval_pct']}% of leads ({k['not_eval_count']:,}) remain Not Evaluated — recoverable revenue sitting idle."})
+    if k["overattempted_pct"] > 5:
+        risks.append({"severity": "MEDIUM", "title": "Over-Attempted Zero-Connection Leads", "body": f"{k['overattempted']:,} leads ({k['overattempted_pct']}%) have >12 attempts with zero connections — burning spend."})
+    if k["cost_outliers"] > 0:
+        thr = k["cost_outlier_fence"]
+        risks.append({"severity": "MEDIUM", "title": "Cost Outlier Leads", "body": f"{k['cost_outliers']:,} leads exceed ₹{thr:.0f} (Q3 + 1.5×IQR; median ₹{k['spend_p50']:.0f}). May be distorting Cost-per-PTP metric."})
+    if k["connection_rate"] < 30:
+        risks.append({"severity": "HIGH", "title": "Low Connection Rate", "body": f"Only {k['connection_rate']}% connecting. Below 30% signals list quality issues or poor call timing."})
+    if k["active_pct"] > 70:
+        risks.append({"severity": "MEDIUM", "title": "Excessive Active Backlog", "body": f"{k['active_pct']}% of leads still 'active' — signals capacity constraints."})
+    if not risks:
+        risks.append({"severity": "LOW", "title": "No Critical Risks Detected", "body": "All key metrics within acceptable thresholds."})
+    return risks[:4]
+
+
+def compute_levers(k: dict) -> list:
+    levers = []
+    if k["connection_rate"] < 50:
+        gap = 50 - k["connection_rate"]
+        extra = int(gap / 100 * k["total"])
+        levers.append({"title": "Dial-Time Optimisation", "body": f"Shifting AI outreach to peak windows (10am–12pm, 4–6pm IST) could recover {extra:,}+ connections — est. +{gap:.0f}pp connection rate."})
+    if k["not_eval_count"] > 20:
+        pot = int(k["not_eval_count"] * k["ptp_pct"] / 100)
+        levers.append({"title": "Re-Engage Not-Evaluated Leads", "body": f"{k['not_eval_count']:,} unscored leads. Applying current PTP rate projects {pot:,} incremental PTPs via a 3-attempt retry sequence."})
+    if k["overattempted"] > 0:
+        reclaim = _r(k["overattempted"] * k["spend_mean"], 0)
+        levers.append({"title": "Prune Dead-End Leads", "body": f"Capping retries at 12 on {k['overattempted']:,} zero-connection leads reclaims ~₹{reclaim:,.0f} in AI dial spend."})
+    if len(levers) < 3:
+        levers.append({"title": "Score-Based Lead Prioritisation", "body": "Propensity scoring on the top 30% of leads typically reduces Cost per PTP by 20–35% while maintaining coverage."})
+    return levers[:3]
+
+
+def assemble(k: dict, charts: dict) -> dict:
+    with timed("risks"):
+        return dict(
+            kpis=k, score=compute_score(k), funnel=build_funnel(k),
+            charts=charts,
+            risks=compute_risks(k), levers=compute_levers(k),
+        )
+
+
+def build_response(df: pd.DataFrame) -> dict:
+    with timed("kpis"):
+        agg = KpiAggregate.from_frame(df)
+        k   = agg.kpis()
+    count_rows("kpis", len(df))
+    with timed("charts"):
+        charts = compute_charts(df, agg)
+    return assemble(k, charts)
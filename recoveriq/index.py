@@ -0,0 +1,109 @@
+"""Per-column indexes for filtered queries over a campaign's rows.
+
+Dispositions and states get one packed bitmap per value (an eighth of a byte
+per lead), and attempts, connected calls and spend get a sorted copy of the
+column with the row order that sorts it, so a range predicate is two binary
+searches.  A query ANDs one bitmap per predicate and materialises only the
+matching rows, which ``build_response`` then analyses like any other frame.
+"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from .schema import spend_values
+
+CATEGORICAL = {"disposition": "Lead_Entity_Disposition", "state": "Lead_State"}
+NUMERIC     = {"attempts": "AI_Attempted_Calls", "connected": "AI_Connected_Calls",
+               "spend": "Total_Spend_INR"}
+# Range operators accepted as ``<column>_<op>``, e.g. ``attempts_gt=8``.
+RANGE_OPS = ("min", "max", "gt", "lt")
+
+
+class QueryError(ValueError):
+    """The filters cannot be applied (unknown column, bad number); reported as a 400."""
+
+
+def parse_filters(args) -> dict:
+    """Filters from query-string style ``args`` (a MultiDict or a dict of lists).
+
+    ``disposition`` / ``state`` take one or more values (repeated or comma
+    separated); ``attempts`` / ``connected`` / ``spend`` take ``_min`` / ``_max``
+    (inclusive) and ``_gt`` / ``_lt`` (exclusive) bounds.  Returns a canonical
+    dict: sorted value lists and ``{op: float}`` ranges.
+    """
+    getlist = args.getlist if hasattr(args, "getlist") else args.get
+    out = {}
+    for key in args:
+        values = [v for raw in getlist(key) for v in str(raw).split(",") if v != ""]
+        if key in CATEGORICAL:
+            if not values:
+                # An empty list would match no lead at all
+                raise QueryError(f"Filter {key} needs a value")
+            out[key] = sorted(set(values))
+            continue
+        name, _, op = key.rpartition("_")
+        if name not in NUMERIC or op not in RANGE_OPS:
+            raise QueryError(f"Unknown filter: {key}")
+        try:
+            bound = float(values[-1])
+        except (IndexError, ValueError):
+            raise QueryError(f"Filter {key} needs a number") from None
+        if not np.isfinite(bound):
+            raise QueryError(f"Filter {key} needs a finite number")
+        out.setdefault(name, {})[op] = bound
+    return out
+
+
+class LeadIndex:
+    """Bitmaps and sorted columns over one frame; ``select(filters)`` gives the matching row positions."""
+
+    def __init__(self, df: pd.DataFrame):
+        self.n = len(df)
+        pos_dtype = np.int32 if self.n < 2 ** 31 else np.int64
+        self.bitmaps = {}
+        for key, col in CATEGORICAL.items():
+            c = df[col]
+            if not isinstance(c.dtype, pd.CategoricalDtype):
+                c = c.astype("category")
+            codes = c.cat.codes.to_numpy()
+            self.bitmaps[key] = {str(name): np.packbits(codes == i)
+                                 for i, name in enumerate(c.cat.categories)}
+        self.sorted = {}
+        for key, col in NUMERIC.items():
+            values = spend_values(df[col]) if key == "spend" else df[col].to_numpy(dtype=float)
+            order  = np.argsort(values, kind="stable").astype(pos_dtype)
+            # NaN sorts last; bounds only ever search the non-missing prefix
+            self.sorted[key] = (order, values[order], int(np.count_nonzero(~np.isnan(values))))
+
+    def _range(self, key: str, bounds: dict) -> np.ndarray:
+        order, values, valid = self.sorted[key]
+        lo, hi = 0, valid
+        if "min" in bounds:
+            lo = max(lo, np.searchsorted(values[:valid], bounds["min"], side="left"))
+        if "gt" in bounds:
+            lo = max(lo, np.searchsorted(values[:valid], bounds["gt"], side="right"))
+        if "max" in bounds:
+            hi = min(hi, np.searchsorted(values[:valid], bounds["max"], side="right"))
+        if "lt" in bounds:
+            hi = min(hi, np.searchsorted(values[:valid], bounds["lt"], side="left"))
+        mask = np.zeros(self.n, dtype=bool)
+        mask[order[lo:hi]] = True
+        return np.packbits(mask)
+
+    def select(self, filters: dict) -> np.ndarray:
+        """Ascending positions of the rows matching every filter (see ``parse_filters``)."""
+        bits = None
+        for key, want in filters.items():
+            if key in CATEGORICAL:
+                maps = self.bitmaps[key]
+                part = np.zeros((self.n + 7) // 8, dtype=np.uint8)
+                for v in want:
+                    if v in maps:
+                        part |= maps[v]
+            else:
+                part = self._range(key, want)
+            bits = part if bits is None else bits & part
+        if bits is None:
+            return np.arange(self.n)
+        return np.flatnonzero(np.unpackbits(bits, count=self.n))
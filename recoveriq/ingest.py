@@ -0,0 +1,294 @@
+"""Reading campaign CSVs: header validation, whole-file reads and the chunked streaming reader.
+
+Both readers check the header before parsing any rows and then parse only the
+columns the analysis uses, with their types given rather than inferred; the
+other columns of a wide dialer export are skipped by the tokenizer.  Whole
+files go through pyarrow's multithreaded CSV reader when it is installed.
+An upload on disk is read through ``mapped``, a read-only memory map, so the
+parsers read the page cache in place instead of copying the file into the process.
+"""
+import contextlib
+import io
+import mmap
+
+import numpy as np
+import pandas as pd
+
+from .aggregate import KpiAggregate
+from .engine import SCATTER_POINTS, assemble, charts_from, scatter_density, scatter_points
+from .metrics import count_rows, timed
+from .schema import compact
+
+REQUIRED = {"Lead_Entity_Disposition", "Lead_State",
+            "AI_Attempted_Calls", "AI_Connected_Calls", "Total_Spend_INR"}
+SPEND_ALIAS = "Total_Spend (INR)"
+CHUNK_ROWS  = 250_000
+# Every column the analysis reads; the rest of an export is never parsed
+COLUMNS     = REQUIRED | {"Lead_ID"}
+CATEGORIES  = ("Lead_Entity_Disposition", "Lead_State")
+NUMBERS     = ("AI_Attempted_Calls", "AI_Connected_Calls", "Total_Spend_INR")
+
+# pyarrow is optional, and only imported once a whole file is read.
+pa = pacsv = None
+
+
+class UploadError(ValueError):
+    """The upload is readable but unusable (missing columns, no rows); reported as a 400."""
+
+
+def _header_renames(columns) -> dict:
+    cols = set(columns)
+    renames = {SPEND_ALIAS: "Total_Spend_INR"} if SPEND_ALIAS in cols and "Total_Spend_INR" not in cols else {}
+    missing = REQUIRED - {renames.get(c, c) for c in cols}
+    if missing:
+        raise UploadError(f"Missing columns: {', '.join(sorted(missing))}")
+    return renames
+
+
+def _header(f) -> pd.Index:
+    """The column names of ``f``, which is left where it was."""
+    start = f.tell()
+    try:
+        columns = pd.read_csv(f, nrows=0).columns
+    except pd.errors.EmptyDataError:
+        raise UploadError("Empty upload") from None
+    f.seek(start)
+    return columns
+
+
+def _projection(f) -> tuple:
+    """(columns to parse, their pandas dtypes, renames) from the header of ``f``, which is left where it was."""
+    columns = _header(f)
+    renames = _header_renames(columns)
+    usecols = [c for c in columns if renames.get(c, c) in COLUMNS]
+    # Counts and spend as float so blanks come through as NaN; compact() narrows them
+    dtypes  = {c: "float64" if renames.get(c, c) in NUMBERS else "str"
+               for c in usecols}
+    return usecols, dtypes, renames
+
+
+@contextlib.contextmanager
+def mapped(f):
+    """A read-only memory map of ``f``, positioned where ``f`` is, if it is a file on disk; else ``f`` itself.
+
+    ``f`` may be a Werkzeug ``FileStorage``; the map is closed on exit.
+    """
+    stream = getattr(f, "stream", f)
+    try:
+        fd = stream.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        fd = None
+    if fd is None or isinstance(f, mmap.mmap):
+        yield f
+        return
+    stream.flush()
+    try:
+        mm = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        # Empty files and pipes cannot be mapped
+        yield f
+        return
+    try:
+        mm.seek(stream.tell())
+        yield mm
+    finally:
+        mm.close()
+
+
+def _require_numbers(df: pd.DataFrame) -> None:
+    """Raise UploadError for the first count or spend column holding a value that is not a number."""
+    for c in NUMBERS:
+        if c in df and not pd.api.types.is_numeric_dtype(df[c]):
+            if (pd.to_numeric(df[c], errors="coerce").isna() & df[c].notna()).any():
+                raise UploadError(f"Column {c} must be numeric")
+
+
+def _find_non_numbers(f, start: int, usecols: list, renames: dict, chunk_rows: int) -> None:
+    """Re-read the count and spend columns of ``f`` as text, raising UploadError for one that holds text."""
+    cols = [c for c in usecols if renames.get(c, c) in NUMBERS]
+    f.seek(start)
+    for chunk in pd.read_csv(f, usecols=cols, dtype=str, chunksize=chunk_rows):
+        _require_numbers(chunk.rename(columns=renames) if renames else chunk)
+
+
+def _arrow():
+    """(pyarrow, pyarrow.csv), imported on first use; (None, None) without pyarrow."""
+    global pa, pacsv
+    if pa is None:
+        try:
+            import pyarrow
+            import pyarrow.csv
+        except ImportError:
+            return None, None
+        pa, pacsv = pyarrow, pyarrow.csv
+    return pa, pacsv
+
+
+def _read_arrow(f, usecols: list, dtypes: dict) -> pd.DataFrame:
+    pa, pacsv = _arrow()
+    types = {c: pa.float64() if t == "float64" else pa.string() for c, t in dtypes.items()}
+    for c in CATEGORIES:
+        if c in types:
+            # Dictionary-encoded while parsing; arrives as a categorical in first-seen order
+            types[c] = pa.dictionary(pa.int32(), pa.string())
+    source = f
+    if isinstance(f, mmap.mmap):
+        # Zero-copy: Arrow's reader threads parse straight from the mapped pages
+        source = pa.BufferReader(pa.py_buffer(f))
+        source.seek(f.tell())
+    table = pacsv.read_csv(source, convert_options=pacsv.ConvertOptions(
+        include_columns=usecols, column_types=types, strings_can_be_null=True))
+    del source
+    return table.to_pandas()
+
+
+def read_upload(f) -> pd.DataFrame:
+    """A whole CSV as a compacted frame of the analysed columns."""
+    with timed("validate"):
+        usecols, dtypes, renames = _projection(f)
+    start = f.tell()
+    with timed("parse"):
+        df = None
+        pa, _ = _arrow()
+        if pa is not None:
+            try:
+                df = _read_arrow(f, usecols, dtypes)
+            except (pa.ArrowInvalid, ValueError):
+                f.seek(start)
+        if df is None:
+            try:
+                df = pd.read_csv(f, usecols=usecols, dtype=dtypes)
+            except ValueError:
+                # A value that does not fit its type: parse as before and report the column
+                f.seek(start)
+                df = pd.read_csv(f, usecols=usecols)
+                _require_numbers(df.rename(columns=renames) if renames else df)
+    count_rows("parse", len(df))
+    if df.empty:
+        raise UploadError("No rows in upload")
+    with timed("validate"):
+        return compact(df.rename(columns=renames) if renames else df)
+
+
+def read_records(df: pd.DataFrame) -> pd.DataFrame:
+    """A batch of lead updates: ``Lead_ID`` is required, any other column may be left out."""
+    if SPEND_ALIAS in df and "Total_Spend_INR" not in df:
+        df = df.rename(columns={SPEND_ALIAS: "Total_Spend_INR"})
+    if "Lead_ID" not in df:
+        raise UploadError("Missing columns: Lead_ID")
+    if df.empty:
+        raise UploadError("No records in update")
+    _require_numbers(df)
+    return compact(df)
+
+
+def read_record_file(f) -> pd.DataFrame:
+    """read_records of a CSV of lead updates, parsing only the analysed columns it has.
+
+    ``Lead_ID`` and the labels are read as text, as an upload reads them, so a
+    zero-padded id still matches its lead; counts and spend are left to
+    read_records to check.
+    """
+    columns = _header(f)
+    usecols = [c for c in columns if c in COLUMNS or c == SPEND_ALIAS]
+    with timed("parse"):
+        df = pd.read_csv(f, usecols=usecols,
+                         dtype={c: "str" for c in usecols if c not in NUMBERS and c != SPEND_ALIAS})
+    count_rows("parse", len(df))
+    return read_records(df)
+
+
+def stream_response(f, chunk_rows: int = CHUNK_ROWS, progress=None, on_chunk=None) -> dict:
+    """build_response for a seekable CSV stream, holding one chunk in memory at a time."""
+    agg, charts = stream_aggregate(f, chunk_rows, progress, on_chunk)
+    with timed("kpis"):
+        k = agg.kpis()
+    return assemble(k, charts)
+
+
+def stream_aggregate(f, chunk_rows: int = CHUNK_ROWS, progress=None, on_chunk=None,
+                     charts: bool = True) -> tuple:
+    """Chunked read of a seekable CSV stream into (KpiAggregate, charts).
+
+    The header is validated before any row is parsed.  The first pass folds each
+    chunk into the aggregate, which carries every chart tally but the scatter;
+    the second pass builds the scatter: the density grid on edges known from the
+    first pass, or for small files every row in the order
+    ``df.sample(random_state=42)`` gives.
+    ``progress(stage, fraction)`` is called after every chunk with the share of
+    the file read so far; ``on_chunk(chunk)`` sees each first-pass chunk (used to
+    persist the rows while they stream past).  Only the analysed columns are
+    parsed.  With ``charts=False`` the second pass is skipped and (aggregate,
+    None) returned, for callers that only need the KPIs.
+    """
+    start = f.tell()
+    if hasattr(f, "fraction"):
+        # A compressed upload has no known inflated size; progress is through the compressed bytes
+        read_share = f.fraction
+    else:
+        f.seek(0, 2)
+        size = max(f.tell() - start, 1)
+        f.seek(start)
+        read_share = lambda: min((f.tell() - start) / size, 1.0)
+    with timed("validate"):
+        usecols, dtypes, renames = _projection(f)
+
+    span = 0.5 if charts else 1.0
+
+    def chunks(stage, base):
+        f.seek(start)
+        reader = iter(pd.read_csv(f, chunksize=chunk_rows, usecols=usecols, dtype=dtypes))
+        while True:
+            with timed("parse"):
+                try:
+                    chunk = next(reader, None)
+                except ValueError:
+                    # Most likely text in a count or spend column: name it if so
+                    _find_non_numbers(f, start, usecols, renames, chunk_rows)
+                    raise
+            if chunk is None:
+                return
+            with timed("validate"):
+                chunk = compact(chunk.rename(columns=renames) if renames else chunk)
+            yield chunk
+            if progress:
+                progress(stage, base + span * read_share())
+
+    return aggregate_chunks(chunks, on_chunk, charts)
+
+
+def aggregate_chunks(chunks, on_chunk=None, charts: bool = True) -> tuple:
+    """(KpiAggregate, charts) folded over compacted frames, one chunk in memory at a time.
+
+    ``chunks(stage, base)`` returns an iterator over the rows in chunks, and is
+    called once per pass (see ``stream_aggregate``); every call must give the
+    same rows in the same order.
+    """
+    agg = KpiAggregate()
+    for chunk in chunks("aggregating", 0.0):
+        count_rows("parse", len(chunk))
+        if on_chunk:
+            on_chunk(chunk)
+        with timed("kpis"):
+            agg = agg + KpiAggregate.from_frame(chunk)
+        count_rows("kpis", len(chunk))
+    if not agg.total:
+        raise UploadError("No rows in upload")
+    if not charts:
+        return agg, None
+
+    # The second pass re-reads the rows; for a CSV its parse time is counted under "parse"
+    n = agg.total
+    if n <= SCATTER_POINTS:
+        pos   = np.random.RandomState(42).permutation(n)
+        rows  = pd.concat(list(chunks("charting", 0.5)))
+        with timed("charts"):
+            scatter = scatter_points(rows.iloc[pos])
+    else:
+        density = scatter_density(agg)
+        for chunk in chunks("charting", 0.5):
+            with timed("charts"):
+                density.add(chunk)
+        scatter = density.payload()
+    with timed("charts"):
+        return agg, charts_from(agg, scatter)
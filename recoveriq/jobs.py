@@ -0,0 +1,94 @@
+"""Background jobs for uploads too large to analyse within one request.
+
+``/api/jobs`` hands an upload to a ``JobManager`` and answers at once with a
+job id; the browser polls the job for its stage and progress, then fetches the
+result body or the error it ended with.  Jobs live in memory and are dropped a
+while after they finish.
+"""
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueueFull(RuntimeError):
+    """More jobs are waiting than the manager queues; reported as a 503."""
+
+
+class Job:
+    """One background computation: its progress while running, its body or exception once finished."""
+
+    def __init__(self):
+        self.id       = uuid.uuid4().hex
+        self.status   = "queued"
+        self.stage    = "queued"
+        self.progress = 0.0
+        self.body     = None
+        self.error    = None
+        self.created  = time.time()
+        self.finished = None
+
+    def report(self, stage: str, progress: float) -> None:
+        self.stage, self.progress = stage, round(min(max(progress, 0.0), 1.0), 3)
+
+    def to_dict(self) -> dict:
+        out = dict(job_id=self.id, status=self.status, stage=self.stage, progress=self.progress)
+        if self.error is not None:
+            out["error"] = str(self.error)
+        return out
+
+
+class JobManager:
+    """Runs ``fn(job.report, *args)`` on a thread pool and keeps finished jobs for ``ttl`` seconds.
+
+    ``fn`` returns the encoded result body; anything it raises is kept on the job
+    for the caller to map to a response.  At most ``max_queued`` jobs wait for a
+    worker; ``submit`` raises ``QueueFull`` beyond that.
+    """
+
+    def __init__(self, workers: int = 2, ttl: float = 900, max_jobs: int = 256, max_queued: int = 16):
+        self.ttl      = ttl
+        self.max_jobs = max_jobs
+        self.max_queued = max_queued
+        self._pool    = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="riq-job")
+        self._jobs    = {}
+        self._lock    = threading.Lock()
+
+    def submit(self, fn, *args) -> Job:
+        job = Job()
+        with self._lock:
+            self._prune()
+            if sum(j.status == "queued" for j in self._jobs.values()) >= self.max_queued:
+                raise QueueFull(f"{self.max_queued} jobs are already waiting")
+            self._jobs[job.id] = job
+        self._pool.submit(self._run, job, fn, args)
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: Job, fn, args) -> None:
+        job.status = "running"
+        job.report("starting", 0.0)
+        try:
+            job.body = fn(job.report, *args)
+            job.status = "done"
+            job.report("done", 1.0)
+        except Exception as exc:
+            job.error  = exc
+            job.status = "error"
+            job.stage  = "failed"
+        job.finished = time.time()
+
+    def _prune(self) -> None:
+        now  = time.time()
+        done = [j for j in self._jobs.values() if j.finished is not None]
+        for j in done:
+            if now - j.finished > self.ttl:
+                del self._jobs[j.id]
+        excess = len(self._jobs) - self.max_jobs + 1
+        for j in sorted(done, key=lambda j: j.finished)[:max(excess, 0)]:
+            self._jobs.pop(j.id, None)
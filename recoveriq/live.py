@@ -0,0 +1,295 @@
+"""Stored campaigns held open in memory and updated lead by lead.
+
+A ``LiveCampaign`` keeps a campaign's rows, a ``Lead_ID`` index over them and
+their ``KpiAggregate``.  ``upsert`` applies a batch of records keyed by
+``Lead_ID``: a known lead's old row is retracted from the aggregate and its new
+row folded in, an unknown lead is appended, so the KPIs, funnel and every chart
+but the scatter are brought up to date in time proportional to the batch.
+Appends go into spare capacity at the end of the rows and of the index, which
+grow by half again when full, so inserting costs amortised time per lead.
+The scatter's density grid is kept too, and its changed leads moved cell to
+cell the same way.
+
+What still scales with the whole campaign: the density grid, rebuilt from the
+rows in one vectorised pass when an update moves its edges or outlier fence
+or changes one of the outliers it shows; the row index for filtered queries,
+rebuilt on the first query after a change; and widening a column, when a
+record brings a new category or a count too large (or too fractional) for the
+column's dtype.
+
+Each upsert bumps ``version`` and wakes anyone in ``wait``, and ``payload_diff``
+reduces two payloads to the parts that changed, which is what live subscribers
+are sent.
+"""
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from .aggregate import KpiAggregate
+from .engine import SCATTER_POINTS, assemble, build_response, charts_from, compute_scatter, scatter_density
+from .index import LeadIndex
+from .ingest import REQUIRED, UploadError
+from .metrics import count_rows, timed
+from .schema import compact, narrow_counts
+
+KEY = "Lead_ID"
+
+
+def _fit(col: pd.Series, values: pd.Series) -> pd.Series:
+    """``col``, widened only if ``values`` would not fit in it (new categories, larger or fractional counts)."""
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        known = set(col.cat.categories)
+        extra = [v for v in pd.unique(values.dropna().astype(object)) if v not in known]
+        return col.cat.add_categories(extra) if extra else col
+    if col.dtype.kind == "u" and values.dtype.kind == "f":
+        values = narrow_counts(values)
+    if col.dtype.kind in "uif" and values.dtype.kind in "uif":
+        dtype = np.result_type(col.dtype, values.dtype)
+        return col if dtype == col.dtype else col.astype(dtype)
+    return col
+
+
+def payload_diff(old: dict, new: dict) -> dict:
+    """The parts of ``new`` that differ from ``old``: single KPI fields and whole charts, other sections whole."""
+    out = {}
+    for key, value in new.items():
+        if key in ("kpis", "charts"):
+            before  = old.get(key, {})
+            changed = {k: v for k, v in value.items() if before.get(k) != v}
+            if changed:
+                out[key] = changed
+        elif old.get(key) != value:
+            out[key] = value
+    return out
+
+
+class LiveCampaign:
+    """One campaign's rows and aggregate, kept current by ``upsert``.
+
+    Fields a record leaves empty keep the lead's stored value; a lead seen for the
+    first time needs every required column.  Rows sharing a ``Lead_ID`` in the
+    stored campaign are keyed on the last of them.  ``frame`` is the analysed
+    columns of the rows; the ids themselves live only in the index.  ``created``
+    is when the stored campaign it was opened from was written, which tells
+    apart a campaign deleted and uploaded again, whose ``version`` restarts at 0.
+    """
+
+    def __init__(self, frame: pd.DataFrame, created: float | None = None):
+        frame = frame.reset_index(drop=True)
+        self.created = created
+        self.agg   = KpiAggregate.from_frame(frame)
+        self.lock  = threading.RLock()
+        self.changed = threading.Condition(self.lock)
+        self.version = 0
+        self._payload = None
+        self._index   = None
+        self._density = None
+        # Rows [0, _n) of _rows are the campaign; the rest is capacity for appends
+        self._rows = frame.drop(columns=KEY, errors="ignore")
+        self._n    = len(frame)
+        self._ids  = None
+        if KEY in frame:
+            ids  = frame[KEY]
+            keep = ids.notna().to_numpy() & ~ids.duplicated(keep="last").to_numpy()
+            self._ids  = pd.Index(ids[keep])
+            self._pos  = np.flatnonzero(keep)
+            self._tail = {}   # ids appended since _ids was last rebuilt -> row
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        return self._rows.iloc[:self._n]
+
+    def _lookup(self, keys: pd.Series) -> np.ndarray:
+        """Row of each key, -1 for a lead not in the campaign."""
+        idx = self._ids.get_indexer(keys)
+        hit = idx >= 0
+        pos = np.full(len(keys), -1, dtype=np.int64)
+        pos[hit] = self._pos[idx[hit]]
+        if self._tail:
+            miss = np.flatnonzero(~hit)
+            pos[miss] = [self._tail.get(k, -1) for k in keys.to_numpy()[miss]]
+        return pos
+
+    def _append(self, ids: pd.Series, rows: pd.DataFrame) -> None:
+        n, k = self._n, len(rows)
+        if n + k > len(self._rows):
+            # Out of capacity: copy into a buffer half as large again as needed.
+            # The padding rows are copies of the first new row, so every dtype is kept.
+            pad = (n + k) // 2 + 1
+            self._rows = pd.concat([self.frame, rows, rows.take(np.zeros(pad, dtype=np.intp))],
+                                   ignore_index=True)
+        else:
+            for j, c in enumerate(rows.columns):
+                self._rows.iloc[n:n + k, j] = rows[c].to_numpy()
+        self._n = n + k
+        self._tail.update(zip(ids.to_numpy(), range(n, n + k)))
+        if len(self._tail) > max(1024, len(self._ids) // 2):
+            self._ids  = self._ids.append(pd.Index(list(self._tail), dtype=self._ids.dtype))
+            self._pos  = np.concatenate([self._pos, np.fromiter(self._tail.values(), np.int64, len(self._tail))])
+            self._tail = {}
+
+    def upsert(self, delta: pd.DataFrame, persist=None) -> dict:
+        """Apply a compacted batch of records; returns how many leads were inserted and updated.
+
+        ``persist(delta, rows)``, if given, is called with the validated batch and
+        the lead count it will leave, before anything is changed; if it raises,
+        the campaign is left as it was.
+        """
+        if self._ids is None:
+            raise UploadError(f"Campaign has no {KEY} column to match records on")
+        if KEY not in delta or delta[KEY].isna().any():
+            raise UploadError(f"Every record needs a {KEY}")
+        delta = delta[[c for c in delta.columns if c == KEY or c in self._rows]]
+        delta = delta.drop_duplicates(KEY, keep="last").reset_index(drop=True)
+        with self.lock:
+            found = self._lookup(delta[KEY])
+            hit   = found >= 0
+            missing = REQUIRED - set(delta.columns)
+            if missing and not hit.all():
+                raise UploadError(f"New leads need columns: {', '.join(sorted(missing))}")
+            if persist is not None:
+                persist(delta, self._n + int((~hit).sum()))
+
+            # Nothing may keep a view of the rows while they are written in place
+            self._index = None
+            buf = self._rows
+            for c in delta.columns.drop(KEY):
+                col = _fit(buf[c], delta[c][~hit | delta[c].notna().to_numpy()])
+                if col.dtype != buf[c].dtype:
+                    buf[c] = col
+
+            pos = found[hit]
+            old = buf.iloc[pos].reset_index(drop=True)
+            new = old.copy()
+            upd = delta[hit].reset_index(drop=True)
+            for c in upd.columns.drop(KEY):
+                given = upd[c].notna().to_numpy()
+                if given.any():
+                    new.loc[given, c] = upd.loc[given, c].astype(new[c].dtype)
+                    buf.iloc[pos, buf.columns.get_loc(c)] = new[c].to_numpy()
+
+            added = delta[~hit]
+            rows  = added.reindex(columns=buf.columns).astype(buf.dtypes.to_dict())
+            first = self._n
+            if len(rows):
+                self._append(added[KEY], rows)
+            changed = pd.concat([new, rows], ignore_index=True)
+            with timed("kpis"):
+                self.agg = self.agg - KpiAggregate.from_frame(old) + KpiAggregate.from_frame(changed)
+            count_rows("kpis", len(delta))
+            if self._density is not None:
+                with timed("charts"):
+                    moved = np.concatenate([pos, np.arange(first, self._n)])
+                    if not (scatter_density(self.agg).same_bins(self._density)
+                            and self._density.update(old, changed, moved)):
+                        self._density = None
+            self._payload = None
+            self.version += 1
+            self.changed.notify_all()
+            return dict(inserted=len(rows), updated=int(hit.sum()))
+
+    def payload(self) -> dict:
+        """build_response of the current rows, from the aggregate and the scatter."""
+        with self.lock:
+            if self._payload is None:
+                with timed("kpis"):
+                    k = self.agg.kpis()
+                with timed("charts"):
+                    charts = charts_from(self.agg, self._scatter())
+                self._payload = assemble(k, charts)
+            return self._payload
+
+    def _scatter(self) -> dict:
+        """compute_scatter of the rows; above SCATTER_POINTS leads the density grid is kept for upsert to move."""
+        if self._n <= SCATTER_POINTS:
+            return compute_scatter(self.frame, self.agg)
+        if self._density is None:
+            self._density = scatter_density(self.agg)
+            self._density.add(self.frame)
+        return self._density.payload()
+
+    def query(self, filters: dict) -> tuple:
+        """(version, build_response of the leads matching ``filters``, or None if none do).
+
+        The row index is built on the first query after a change; the subset is
+        analysed outside the lock.
+        """
+        if not filters:
+            return self.snapshot()
+        with self.lock:
+            if self._index is None:
+                with timed("index"):
+                    self._index = LeadIndex(self.frame)
+            with timed("select"):
+                version, pos = self.version, self._index.select(filters)
+            subset = self.frame.take(pos)
+        return version, (build_response(subset) if len(pos) else None)
+
+    def snapshot(self) -> tuple:
+        """(version, payload), read together."""
+        with self.lock:
+            return self.version, self.payload()
+
+    def wait(self, version: int, timeout: float) -> int:
+        """Block until the campaign moves past ``version`` or ``timeout`` passes; returns the current version."""
+        with self.changed:
+            self.changed.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+
+class LiveCampaigns:
+    """Stored campaigns opened on demand, at most ``max_open`` at a time (least recently used closed first).
+
+    A campaign is opened from its stored rows with its stored updates replayed,
+    and every update applied through ``upsert`` is written to the store too.
+    """
+
+    def __init__(self, store, max_open: int = 8):
+        self.store    = store
+        self.max_open = max_open
+        self._open    = OrderedDict()
+        self._lock    = threading.Lock()
+
+    def get(self, dataset_id: str) -> LiveCampaign | None:
+        meta = self.store.meta(dataset_id)
+        if meta is None or not self.store.exists(dataset_id):
+            # Deleted or evicted from the store: closed here too
+            self.close(dataset_id)
+            return None
+        with self._lock:
+            live = self._open.get(dataset_id)
+            # One opened from a campaign since deleted or evicted, and uploaded again, is stale
+            if live is not None and live.created == meta["created"]:
+                self._open.move_to_end(dataset_id)
+                return live
+        live = LiveCampaign(compact(self.store.load(dataset_id)), meta["created"])
+        for delta in self.store.deltas(dataset_id):
+            live.upsert(compact(delta))
+        with self._lock:
+            held = self._open.get(dataset_id)
+            if held is not None and held.created == live.created:
+                live = held
+            self._open[dataset_id] = live
+            self._open.move_to_end(dataset_id)
+            while len(self._open) > self.max_open:
+                self._open.popitem(last=False)
+        return live
+
+    def close(self, dataset_id: str) -> None:
+        with self._lock:
+            self._open.pop(dataset_id, None)
+
+    def upsert(self, dataset_id: str, delta: pd.DataFrame) -> dict | None:
+        """Apply and persist a batch of records; None if there is no such campaign."""
+        live = self.get(dataset_id)
+        if live is None:
+            return None
+        # Written to the store before it is applied, so memory never holds an update the store lacks
+        return live.upsert(delta, persist=lambda checked, rows: self.store.append(dataset_id, checked, rows=rows))
@@ -0,0 +1,195 @@
+"""Per-stage timings for the analysis pipeline and a Prometheus text exposition of them.
+
+Pipeline code wraps its stages in ``timed(stage)`` and reports rows with
+``count_rows(stage, n)``.  Both only do work inside ``tracing()``, which
+collects one request's (or job's) stage times into a ``Trace``; outside it
+they return at once, so instrumented code run without metrics, in tests or
+in the Streamlit app, pays one context-variable lookup per stage.  A
+``Registry`` accumulates finished traces into histograms and counters and
+renders them for a ``/metrics`` scrape.
+
+Stages: ``parse`` (CSV to rows), ``validate`` (header checks and dtype
+compaction), ``kpis`` (aggregation), ``charts``, ``risks`` (score, funnel,
+risks and levers), ``serialize`` (JSON encoding) and ``compress``; filtered
+queries add ``index`` (building the lead index) and ``select``.
+"""
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import threading
+import time
+
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BYTES_BUCKETS   = tuple(float(1 << s) for s in range(10, 33, 2))   # 1 KiB .. 4 GiB
+
+_current = contextvars.ContextVar("recoveriq_trace", default=None)
+
+
+class Trace:
+    """Seconds and rows per stage for one unit of work, in the order the stages first ran."""
+
+    def __init__(self):
+        self.start  = time.perf_counter()
+        self.stages = {}
+        self.rows   = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def server_timing(self) -> str:
+        """``Server-Timing`` header value: each stage and the total so far, in milliseconds."""
+        parts = [f"{stage};dur={secs * 1000:.2f}" for stage, secs in self.stages.items()]
+        return ", ".join(parts + [f"total;dur={self.elapsed() * 1000:.2f}"])
+
+
+class _Timer:
+    __slots__ = ("trace", "stage", "t0")
+
+    def __init__(self, trace: Trace, stage: str):
+        self.trace, self.stage = trace, stage
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.add(self.stage, time.perf_counter() - self.t0)
+        return False
+
+
+_NOOP = contextlib.nullcontext()
+
+
+def timed(stage: str):
+    """Context manager adding its wall time to ``stage`` of the current trace, if any."""
+    trace = _current.get()
+    return _NOOP if trace is None else _Timer(trace, stage)
+
+
+def count_rows(stage: str, n: int) -> None:
+    trace = _current.get()
+    if trace is not None:
+        trace.rows[stage] = trace.rows.get(stage, 0) + int(n)
+
+
+@contextlib.contextmanager
+def tracing():
+    """Collect the stages run inside the block into a fresh ``Trace`` (yielded)."""
+    trace = Trace()
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+def start() -> tuple:
+    """``tracing()`` split for request hooks: returns (trace, token) for ``stop``."""
+    trace = Trace()
+    return trace, _current.set(trace)
+
+
+def stop(token) -> None:
+    _current.reset(token)
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts  = [0] * len(buckets)
+        self.sum     = 0.0
+        self.count   = 0
+
+    def observe(self, value: float) -> None:
+        for i, le in enumerate(self.buckets):
+            if value <= le:
+                self.counts[i] += 1
+                break
+        self.sum   += value
+        self.count += 1
+
+
+def _series(name: str, labels: tuple) -> str:
+    if not labels:
+        return name
+    return name + "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+class Registry:
+    """Histograms and counters keyed by name and labels, rendered in the Prometheus text format.
+
+    ``record`` folds a finished trace in; label values are endpoint and stage
+    names, so the number of series stays fixed.
+    """
+
+    HELP = {
+        "recoveriq_requests_total":        ("counter", "Requests and jobs handled, by endpoint and status."),
+        "recoveriq_request_seconds":       ("histogram", "Wall time per request or job."),
+        "recoveriq_stage_seconds":         ("histogram", "Wall time per pipeline stage."),
+        "recoveriq_stage_rows_total":      ("counter", "Rows processed per pipeline stage."),
+        "recoveriq_response_bytes":        ("histogram", "Response payload size, after encoding."),
+        "recoveriq_request_peak_bytes":    ("histogram", "Peak traced Python memory above the start of the request."),
+        "recoveriq_process_peak_rss_bytes": ("gauge", "Peak resident set size of the process."),
+    }
+
+    def __init__(self):
+        self._lock     = threading.Lock()
+        self._hist     = {}
+        self._counters = {}
+        self._gauges   = {}
+
+    def observe(self, name: str, value: float, buckets: tuple = SECONDS_BUCKETS, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self._hist.get(key)
+            if hist is None:
+                hist = self._hist[key] = _Histogram(buckets)
+            hist.observe(value)
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels) -> None:
+        with self._lock:
+            self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def record(self, trace: Trace, endpoint: str, status: int, nbytes: int | None = None,
+               peak_bytes: int | None = None) -> None:
+        self.inc("recoveriq_requests_total", endpoint=endpoint, status=status)
+        self.observe("recoveriq_request_seconds", trace.elapsed(), endpoint=endpoint)
+        for stage, secs in trace.stages.items():
+            self.observe("recoveriq_stage_seconds", secs, endpoint=endpoint, stage=stage)
+        for stage, n in trace.rows.items():
+            self.inc("recoveriq_stage_rows_total", n, endpoint=endpoint, stage=stage)
+        if nbytes is not None:
+            self.observe("recoveriq_response_bytes", nbytes, BYTES_BUCKETS, endpoint=endpoint)
+        if peak_bytes is not None:
+            self.observe("recoveriq_request_peak_bytes", peak_bytes, BYTES_BUCKETS, endpoint=endpoint)
+
+    def render(self) -> str:
+        with self._lock:
+            series = {}
+            for (name, labels), hist in self._hist.items():
+                lines = series.setdefault(name, [])
+                cum = 0
+                for le, n in zip(hist.buckets, hist.counts):
+                    cum += n
+                    lines.append(f"{_series(name + '_bucket', labels + (('le', repr(float(le))),))} {cum}")
+                lines.append(f"{_series(name + '_bucket', labels + (('le', '+Inf'),))} {hist.count}")
+                lines.append(f"{_series(name + '_sum', labels)} {hist.sum}")
+                lines.append(f"{_series(name + '_count', labels)} {hist.count}")
+            for (name, labels), value in list(self._counters.items()) + list(self._gauges.items()):
+                series.setdefault(name, []).append(f"{_series(name, labels)} {value}")
+        out = []
+        for name in sorted(series):
+            kind, text = self.HELP.get(name, ("untyped", name))
+            out += [f"# HELP {name} {text}", f"# TYPE {name} {kind}"] + series[name]
+        return "\n".join(out) + "\n"
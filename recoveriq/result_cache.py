@@ -0,0 +1,149 @@
+"""Cached response bodies, so the same campaign or query is analysed once.
+
+An upload is keyed by the SHA-256 of its bytes (``content_key``), salted by the
+caller with the payload version; a query by its campaign and filters.  Bodies
+are kept already encoded, in memory and, once evicted from there, optionally on
+disk; ``stats`` reports hits, misses and evictions for ``/api/cache/stats``.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+
+def content_key(f, block: int = 1 << 20) -> str:
+    """SHA-256 of a seekable stream's remaining bytes; the stream is rewound afterwards."""
+    start = f.tell()
+    h = hashlib.sha256()
+    for buf in iter(lambda: f.read(block), b""):
+        h.update(buf)
+    f.seek(start)
+    return h.hexdigest()
+
+
+class ResultCache:
+    """Two-tier LRU of encoded response bodies keyed by content hash.
+
+    The memory tier holds up to ``max_bytes`` of bodies; entries it evicts fall
+    through to ``disk_dir`` (if set), which is itself trimmed to ``max_disk_bytes``
+    oldest-access first. A disk hit is promoted back into memory.
+    """
+
+    def __init__(self, max_bytes: int = 64 << 20, disk_dir: str | None = None,
+                 max_disk_bytes: int = 512 << 20):
+        self.max_bytes      = max_bytes
+        self.disk_dir       = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._mem   = OrderedDict()
+        self._bytes = 0
+        self._lock  = threading.Lock()
+        self.hits = self.disk_hits = self.misses = self.evictions = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    # ── Lookup / insert ───────────────────────────────────────────────────────
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            body = self._mem.get(key)
+            if body is not None:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return body
+            body = self._disk_get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._mem_put(key, body)
+            return body
+
+    def put(self, key: str, body: bytes) -> None:
+        with self._lock:
+            self._mem_put(key, body)
+
+    def discard(self, key: str) -> None:
+        """Drop ``key`` from both tiers, for an entry that no longer stands; a later ``get`` is a miss."""
+        with self._lock:
+            if key in self._mem:
+                self._bytes -= len(self._mem.pop(key))
+            if self.disk_dir:
+                try:
+                    os.remove(self._path(key))
+                except FileNotFoundError:
+                    pass
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+            self._bytes = 0
+            for path, _, _ in self._disk_entries():
+                os.remove(path)
+
+    def stats(self) -> dict:
+        with self._lock:
+            disk = self._disk_entries()
+            lookups = self.hits + self.misses
+            return dict(
+                hits=self.hits, disk_hits=self.disk_hits, misses=self.misses,
+                hit_rate=round(self.hits / lookups, 4) if lookups else 0.0,
+                evictions=self.evictions,
+                entries=len(self._mem), bytes=self._bytes, max_bytes=self.max_bytes,
+                disk_entries=len(disk), disk_bytes=sum(size for _, size, _ in disk),
+                max_disk_bytes=self.max_disk_bytes if self.disk_dir else 0,
+            )
+
+    # ── Memory tier ───────────────────────────────────────────────────────────
+    def _mem_put(self, key: str, body: bytes) -> None:
+        if key in self._mem:
+            self._bytes -= len(self._mem.pop(key))
+        self._mem[key] = body
+        self._bytes += len(body)
+        while self._bytes > self.max_bytes and self._mem:
+            old_key, old_body = self._mem.popitem(last=False)
+            self._bytes -= len(old_body)
+            self.evictions += 1
+            self._disk_put(old_key, old_body)
+
+    # ── Disk tier ─────────────────────────────────────────────────────────────
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _disk_entries(self) -> list:
+        if not self.disk_dir:
+            return []
+        out = []
+        for name in os.listdir(self.disk_dir):
+            if name.endswith(".json"):
+                st = os.stat(os.path.join(self.disk_dir, name))
+                out.append((os.path.join(self.disk_dir, name), st.st_size, st.st_mtime))
+        return out
+
+    def _disk_get(self, key: str) -> bytes | None:
+        if not self.disk_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as fh:
+                body = fh.read()
+        except FileNotFoundError:
+            return None
+        os.utime(path)
+        return body
+
+    def _disk_put(self, key: str, body: bytes) -> None:
+        if not self.disk_dir or len(body) > self.max_disk_bytes:
+            return
+        tmp = self._path(key) + ".tmp"
+        with open(tmp, "wb") as fh:
+            fh.write(body)
+        os.replace(tmp, self._path(key))
+        entries = sorted(self._disk_entries(), key=lambda e: e[2])
+        used = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if used <= self.max_disk_bytes:
+                break
+            os.remove(path)
+            used -= size
@@ -0,0 +1,82 @@
+"""Compact in-memory schema for lead frames.
+
+Applied once at ingestion: dispositions and states become categoricals (one byte
+per lead, and equality tests become code comparisons), call counts become the
+narrowest unsigned integer that holds them, spend is rounded to paise and held
+as float32 rupees when every value is small enough for that to be exact (else
+float64), and ``Lead_ID`` moves into a contiguous Arrow string buffer when
+pyarrow is installed.  Readers that need spend exactly should go through
+``spend_values``.
+"""
+from importlib.util import find_spec
+
+import numpy as np
+import pandas as pd
+
+DISPOSITIONS = ["PTP", "RTP", "Not_Evaluated", "Callback", "Connected_No_Outcome", "Unreachable"]
+STATES       = ["active", "inactive", "completed"]
+# float32 steps are under half a paisa below 2**17 rupees (131,072), so rounding
+# a float32 spend to 2 decimals gives back the exact paise only below that.
+FLOAT32_SPEND_MAX = 2.0 ** 17
+COUNT_COLUMNS = ("AI_Attempted_Calls", "AI_Connected_Calls")
+
+# Probed rather than imported: pandas loads pyarrow itself when the dtype is first used.
+ID_DTYPE = "string[pyarrow]" if find_spec("pyarrow") else object
+
+
+def categorical(col: pd.Series, known: list) -> pd.Series:
+    """Categorical over ``known`` plus any other values seen, in first-seen order.
+
+    A column that is already categorical keeps its other categories in their
+    order, with ``known`` moved to the front if a parser ordered them otherwise.
+    """
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        names = list(col.cat.categories)
+        if names[:len(known)] == known:
+            return col
+        seen = set(known)
+        return col.cat.set_categories(known + [v for v in names if v not in seen])
+    seen  = set(known)
+    extra = [v for v in pd.unique(col.dropna()) if v not in seen]
+    return col.astype(pd.CategoricalDtype(known + extra))
+
+
+def narrow_counts(col: pd.Series) -> pd.Series:
+    """Smallest unsigned dtype for a non-negative whole-number column; float32 if it has gaps."""
+    x = col.to_numpy(dtype=float)
+    if np.isnan(x).any() or (len(x) and (x.min() < 0 or not np.array_equal(x, np.floor(x)))):
+        return col.astype(np.float32)
+    top = x.max() if len(x) else 0
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if top <= np.iinfo(dtype).max:
+            return col.astype(dtype)
+    return col.astype(np.uint64)
+
+
+def narrow_spend(col: pd.Series) -> pd.Series:
+    """Spend rounded to paise: float32 if every value is below ``FLOAT32_SPEND_MAX``, else float64."""
+    x = col.astype(float).round(2)
+    top = np.nanmax(np.abs(x.to_numpy())) if x.notna().any() else 0
+    return x.astype(np.float32) if top < FLOAT32_SPEND_MAX else x
+
+
+def compact(df: pd.DataFrame) -> pd.DataFrame:
+    out = df.copy(deep=False)
+    if "Lead_Entity_Disposition" in out:
+        out["Lead_Entity_Disposition"] = categorical(out["Lead_Entity_Disposition"], DISPOSITIONS)
+    if "Lead_State" in out:
+        out["Lead_State"] = categorical(out["Lead_State"], STATES)
+    for c in COUNT_COLUMNS:
+        if c in out:
+            out[c] = narrow_counts(out[c])
+    if "Total_Spend_INR" in out:
+        out["Total_Spend_INR"] = narrow_spend(out["Total_Spend_INR"])
+    if "Lead_ID" in out:
+        out["Lead_ID"] = out["Lead_ID"].astype(ID_DTYPE)
+    return out
+
+
+def spend_values(col: pd.Series) -> np.ndarray:
+    """Spend as float64 rupees; float32 columns are snapped back onto the paise grid."""
+    x = col.to_numpy(dtype=float)
+    return np.round(x, 2) if col.dtype == np.float32 else x
@@ -0,0 +1,159 @@
+"""Synthetic campaigns of any size, generated in chunks and streamed to CSV or Parquet.
+
+Every column is drawn with vectorised numpy calls, chunk by chunk from one
+seeded generator, so ten million leads take seconds and never more than one
+chunk of memory; the same seed and chunk size always give the same file.
+``generate_demo_data`` is the first 500 leads of the default mix.
+
+    python -m recoveriq.synth leads.csv --rows 10000000 --days 30
+    python -m recoveriq.synth leads.parquet --rows 2000000 --spend-dist lognormal \\
+        --dispositions PTP=0.3,RTP=0.1,Not_Evaluated=0.2,Callback=0.15,Connected_No_Outcome=0.1,Unreachable=0.15
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from .schema import DISPOSITIONS, STATES
+
+DISPOSITION_MIX = dict(zip(DISPOSITIONS, [0.22, 0.12, 0.18, 0.15, 0.13, 0.20]))
+STATE_MIX       = dict(zip(STATES, [0.55, 0.25, 0.20]))
+# Dispositions that imply the lead was reached at least once
+REACHED    = ("PTP", "Callback", "Connected_No_Outcome")
+FIRST_ID   = 10000
+CHUNK_ROWS = 500_000
+
+
+def _mix(mix: dict) -> tuple:
+    names = list(mix)
+    p = np.asarray([mix[k] for k in names], dtype=float)
+    if (p < 0).any() or not p.sum():
+        raise ValueError("Mix weights must be non-negative and not all zero")
+    return names, p / p.sum()
+
+
+def generate_leads(rng: np.random.Generator, n: int, first_id: int = FIRST_ID,
+                   dispositions: dict = DISPOSITION_MIX, states: dict = STATE_MIX,
+                   max_attempts: int = 15, spend: tuple = (5, 45), spend_dist: str = "uniform",
+                   days: float = 0, start: pd.Timestamp | None = None) -> pd.DataFrame:
+    """``n`` leads with ids from ``first_id``.
+
+    Attempts are uniform on 1..``max_attempts``; reached dispositions connect
+    1..attempts times and the rest 0-2 times.  Spend is uniform on ``spend``
+    (low, high), or lognormal with that 5th-95th percentile range for a heavy
+    tail.  With ``days`` > 0 a ``Last_Call_At`` timestamp is spread uniformly over
+    the ``days`` before ``start``.
+    """
+    disp_names, disp_p = _mix(dispositions)
+    state_names, state_p = _mix(states)
+    disp_codes  = rng.choice(len(disp_names), size=n, p=disp_p)
+    state_codes = rng.choice(len(state_names), size=n, p=state_p)
+    attempted = rng.integers(1, max_attempts + 1, size=n)
+    reached   = np.isin(disp_codes, [i for i, d in enumerate(disp_names) if d in REACHED])
+    connected = np.where(reached, rng.integers(1, attempted + 1), rng.integers(0, 3, size=n))
+    connected = np.minimum(connected, attempted)
+    lo, hi = spend
+    if spend_dist == "uniform":
+        values = rng.uniform(lo, hi, size=n)
+    elif spend_dist == "lognormal":
+        mu, sigma = (np.log(lo) + np.log(hi)) / 2, (np.log(hi) - np.log(lo)) / (2 * 1.645)
+        values = rng.lognormal(mu, sigma, size=n)
+    else:
+        raise ValueError(f"Unknown spend distribution: {spend_dist}")
+    df = pd.DataFrame({
+        "Lead_ID":                  np.char.add("L", np.arange(first_id, first_id + n).astype(str)),
+        "Lead_Entity_Disposition":  pd.Categorical.from_codes(disp_codes, disp_names),
+        "Lead_State":               pd.Categorical.from_codes(state_codes, state_names),
+        "AI_Attempted_Calls":       attempted,
+        "AI_Connected_Calls":       connected,
+        "Total_Spend_INR":          values.round(2),
+    })
+    if days > 0:
+        end = start if start is not None else pd.Timestamp("2025-01-01")
+        offset = rng.uniform(0, days * 86400, size=n)
+        df["Last_Call_At"] = end - pd.to_timedelta(offset.round(), unit="s")
+    return df
+
+
+def generate_chunks(n: int, chunk_rows: int = CHUNK_ROWS, seed: int = 42, **dist):
+    """``n`` leads as frames of up to ``chunk_rows``; ``dist`` as for ``generate_leads``."""
+    rng = np.random.default_rng(seed)
+    for first in range(0, n, chunk_rows):
+        yield generate_leads(rng, min(chunk_rows, n - first), FIRST_ID + first, **dist)
+
+
+def write(path: str, n: int, chunk_rows: int = CHUNK_ROWS, seed: int = 42, progress=None, **dist) -> int:
+    """Stream ``n`` generated leads to ``path`` (.csv or .parquet); returns the bytes written."""
+    chunks = generate_chunks(n, chunk_rows, seed, **dist)
+    if path.endswith(".parquet"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        writer = None
+        try:
+            for i, df in enumerate(chunks):
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                writer = writer or pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+                if progress:
+                    progress(min((i + 1) * chunk_rows, n))
+        finally:
+            if writer is not None:
+                writer.close()
+    else:
+        try:
+            import pyarrow as pa
+            import pyarrow.csv as pacsv
+        except ImportError:
+            pa = None
+        with open(path, "wb") as fh:
+            for i, df in enumerate(chunks):
+                if pa is None:
+                    fh.write(df.to_csv(header=i == 0, index=False).encode())
+                else:
+                    # Arrow's CSV writer is several times faster than to_csv; no generated value needs quoting
+                    if "Last_Call_At" in df:
+                        df["Last_Call_At"] = df["Last_Call_At"].astype("datetime64[s]")
+                    opts = pacsv.WriteOptions(include_header=i == 0, quoting_style="none")
+                    pacsv.write_csv(pa.Table.from_pandas(df, preserve_index=False), fh, opts)
+                if progress:
+                    progress(min((i + 1) * chunk_rows, n))
+    return os.path.getsize(path)
+
+
+def parse_mix(text: str) -> dict:
+    try:
+        return {k: float(v) for k, v in (part.split("=", 1) for part in text.split(","))}
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected NAME=WEIGHT,...: {text}") from None
+
+
+def main(argv=None) -> None:
+    p = argparse.ArgumentParser(prog="python -m recoveriq.synth", description=__doc__.split("\n")[0])
+    p.add_argument("path", help="output file, .csv or .parquet")
+    p.add_argument("--rows", type=int, default=1_000_000)
+    p.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--dispositions", type=parse_mix, default=DISPOSITION_MIX, help="NAME=WEIGHT,...")
+    p.add_argument("--states", type=parse_mix, default=STATE_MIX, help="NAME=WEIGHT,...")
+    p.add_argument("--max-attempts", type=int, default=15)
+    p.add_argument("--spend", type=float, nargs=2, default=(5, 45), metavar=("LOW", "HIGH"))
+    p.add_argument("--spend-dist", choices=("uniform", "lognormal"), default="uniform")
+    p.add_argument("--days", type=float, default=0, help="spread Last_Call_At over this many days")
+    args = p.parse_args(argv)
+
+    t0 = time.perf_counter()
+    report = lambda done: print(f"\r{done:,} / {args.rows:,} leads", end="", file=sys.stderr)
+    size = write(args.path, args.rows, args.chunk_rows, args.seed, progress=report,
+                 dispositions=args.dispositions, states=args.states, max_attempts=args.max_attempts,
+                 spend=tuple(args.spend), spend_dist=args.spend_dist, days=args.days)
+    secs = time.perf_counter() - t0
+    print(f"\n{args.path}: {size / 1e6:,.1f} MB in {secs:.1f}s ({args.rows / secs:,.0f} leads/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,242 +1,574 @@
+import functools
+import gzip
+import hashlib
+import io
 import json
-import numpy as np
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
 import pandas as pd
-from flask import Flask, jsonify, render_template, request
+from flask import Flask, Request, g, jsonify, render_template, request, stream_with_context, url_for
+from werkzeug.exceptions import RequestEntityTooLarge
 
-app = Flask(__name__)
+from recoveriq import batch, metrics
+from recoveriq.compressed import Decompressed, open_upload
+from recoveriq.dataset_store import DatasetStore
+from recoveriq.engine import PAYLOAD_VERSION, assemble, build_response, generate_demo_data
+from recoveriq.ingest import (CHUNK_ROWS, UploadError, aggregate_chunks, mapped, read_record_file, read_records,
+                              read_upload, stream_response)
+from recoveriq.jobs import JobManager, QueueFull
+from recoveriq.index import QueryError, parse_filters
+from recoveriq.live import LiveCampaigns, payload_diff
+from recoveriq.result_cache import ResultCache, content_key
+from recoveriq.schema import compact
+
+
+class UploadRequest(Request):
+    """Spools uploaded files larger than UPLOAD_SPOOL_BYTES (or of unknown size) to an unnamed temp file."""
 
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        limit = app.config["UPLOAD_SPOOL_BYTES"]
+        if total_content_length is None or total_content_length > limit:
+            return tempfile.TemporaryFile("wb+")
+        return io.BytesIO()
 
-# ── Demo data ─────────────────────────────────────────────────────────────────
-def generate_demo_data(n: int = 500) -> pd.DataFrame:
-    rng = np.random.default_rng(42)
-    dispositions = rng.choice(
-        ["PTP", "RTP", "Not_Evaluated", "Callback", "Connected_No_Outcome", "Unreachable"],
-        size=n, p=[0.22, 0.12, 0.18, 0.15, 0.13, 0.20],
-    )
-    states    = rng.choice(["active", "inactive", "completed"], size=n, p=[0.55, 0.25, 0.20])
-    attempted = rng.integers(1, 16, size=n)
-    connected = np.where(
-        np.isin(dispositions, ["PTP", "Callback", "Connected_No_Outcome"]),
-        rng.integers(1, attempted + 1), rng.integers(0, 3, size=n),
-    )
-    connected = np.minimum(connected, attempted)
-    spend     = rng.uniform(5, 45, size=n)
-    return pd.DataFrame({
-        "Lead_ID":                  [f"L{10000+i}" for i in range(n)],
-        "Lead_Entity_Disposition":  dispositions,
-        "Lead_State":               states,
-        "AI_Attempted_Calls":       attempted,
-        "AI_Connected_Calls":       connected,
-        "Total_Spend_INR":          spend.round(2),
-    })
-
-
-# ── Helpers ───────────────────────────────────────────────────────────────────
-def _r(v, d=1):
-    if v is None or (isinstance(v, float) and (np.isnan(v) or np.isinf(v))):
-        return 0.0
-    return round(float(v), d)
-
-
-# ── KPIs ──────────────────────────────────────────────────────────────────────
-def compute_kpis(df: pd.DataFrame) -> dict:
-    total       = len(df)
-    ptp_count   = int((df["Lead_Entity_Disposition"] == "PTP").sum())
-    ptp_pct     = _r(ptp_count / total * 100)
-    conn_leads  = int((df["AI_Connected_Calls"] > 0).sum())
-    conn_rate   = _r(conn_leads / total * 100)
-    att_leads   = int((df["AI_Attempted_Calls"] > 0).sum())
-    act_count   = int((df["Lead_State"] == "active").sum())
-    act_pct     = _r(act_count / total * 100)
-    spend       = _r(df["Total_Spend_INR"].sum(), 2)
-    cost_ptp    = _r(spend / ptp_count if ptp_count else 0, 2)
-    avg_att     = _r(df["AI_Attempted_Calls"].mean())
-    cm          = df["AI_Connected_Calls"] > 0
-    avg_c       = _r(df.loc[cm,  "AI_Attempted_Calls"].mean() if cm.sum()   else 0)
-    avg_nc      = _r(df.loc[~cm, "AI_Attempted_Calls"].mean() if (~cm).sum() else 0)
-    att_eff     = _r(conn_leads / att_leads * 100 if att_leads else 0)
-    comp_leads  = int((df["Lead_State"] == "completed").sum())
-    ne_count    = int((df["Lead_Entity_Disposition"] == "Not_Evaluated").sum())
-    ne_pct      = _r(ne_count / total * 100)
-    ov_count    = int(((df["AI_Attempted_Calls"] > 12) & (df["AI_Connected_Calls"] == 0)).sum())
-    ov_pct      = _r(ov_count / total * 100)
-    smean       = _r(df["Total_Spend_INR"].mean(), 2)
-    sstd        = _r(df["Total_Spend_INR"].std(), 2)
-    outliers    = int((df["Total_Spend_INR"] > smean + 2 * sstd).sum())
-    cpc         = _r(spend / conn_leads if conn_leads else 0, 2)
-    cpl         = _r(spend / total, 2)
-    cpa         = _r(spend / att_leads if att_leads else 0, 2)
-    dispositions = {str(k): int(v) for k, v in df["Lead_Entity_Disposition"].value_counts().items()}
-    states_dist  = {str(k): int(v) for k, v in df["Lead_State"].value_counts().items()}
-    return dict(
-        total=total, ptp_count=ptp_count, ptp_pct=ptp_pct,
-        connected_leads=conn_leads, connection_rate=conn_rate,
-        attempted_leads=att_leads, active_count=act_count, active_pct=act_pct,
-        total_spend=spend, cost_per_ptp=cost_ptp, avg_attempts=avg_att,
-        avg_attempts_connected=avg_c, avg_attempts_not_connected=avg_nc,
-        attempt_efficiency=att_eff, completed_leads=comp_leads,
-        not_eval_count=ne_count, not_eval_pct=ne_pct,
-        overattempted=ov_count, overattempted_pct=ov_pct,
-        cost_outliers=outliers, spend_mean=smean, spend_std=sstd,
-        cost_per_connection=cpc, cost_per_lead=cpl, cost_per_attempt=cpa,
-        total_attempted_calls=int(df["AI_Attempted_Calls"].sum()),
-        total_connected_calls=int(df["AI_Connected_Calls"].sum()),
-        dispositions=dispositions, states=states_dist,
-    )
-
-
-def compute_score(k: dict) -> dict:
-    ptp_s  = min(k["ptp_pct"] / 25 * 10, 10)
-    con_s  = min(k["connection_rate"] / 60 * 10, 10)
-    act_s  = max(0.0, 10 - max(0.0, (k["active_pct"] - 50) / 50 * 10))
-    cst_s  = min(150 / k["cost_per_ptp"] * 10, 10) if k["cost_per_ptp"] > 0 else 0.0
-    value  = _r(ptp_s * .40 + con_s * .30 + act_s * .15 + cst_s * .15)
-    grade, color = (
-        ("Strong", "#22c55e") if value >= 7 else
-        ("Needs Optimization", "#f59e0b") if value >= 4 else
-        ("At Risk", "#ef4444")
-    )
-    return dict(
-        value=value, grade=grade, color=color,
-        components={
-            "PTP Rate (40%)":        _r(ptp_s * .40, 2),
-            "Connection Rate (30%)": _r(con_s * .30, 2),
-            "Active Mgmt (15%)":     _r(act_s * .15, 2),
-            "Cost Efficiency (15%)": _r(cst_s * .15, 2),
-        },
-        max_scores=[4.0, 3.0, 1.5, 1.5],
-    )
-
-
-def build_funnel(k: dict) -> list:
-    return [
-        {"stage": "Total Leads", "value": k["total"],           "color": "#3b82f6"},
-        {"stage": "Attempted",   "value": k["attempted_leads"],  "color": "#6366f1"},
-        {"stage": "Connected",   "value": k["connected_leads"],  "color": "#22c55e"},
-        {"stage": "PTP",         "value": k["ptp_count"],        "color": "#c9a84c"},
-        {"stage": "Completed",   "value": k["completed_leads"],  "color": "#0ea5e9"},
-    ]
-
-
-def compute_charts(df: pd.DataFrame, k: dict) -> dict:
-    # Scatter: attempts vs spend (sampled)
-    samp = df.sample(min(300, len(df)), random_state=42)
-    scatter = [
-        {"x": int(r["AI_Attempted_Calls"]),
-         "y": _r(r["Total_Spend_INR"], 2),
-         "d": r["Lead_Entity_Disposition"],
-         "connected": bool(r["AI_Connected_Calls"] > 0)}
-        for _, r in samp.iterrows()
-    ]
-
-    # Spend histogram
-    counts, edges = np.histogram(df["Total_Spend_INR"], bins=14)
-    spend_hist = {
-        "labels": [f"₹{e:.0f}" for e in edges[:-1]],
-        "values": counts.tolist(),
-    }
-
-    # Attempt distribution
-    att_dist = df["AI_Attempted_Calls"].value_counts().sort_index()
-    attempt_dist = {
-        "labels": att_dist.index.tolist(),
-        "values": att_dist.values.tolist(),
-    }
-
-    # Connected vs not-connected by disposition
-    grp = df.groupby("Lead_Entity_Disposition").agg(
-        connected=("AI_Connected_Calls", lambda x: (x > 0).sum()),
-        total=("AI_Connected_Calls", "count"),
-    ).reset_index()
-    conn_by_disp = {
-        "labels":    grp["Lead_Entity_Disposition"].tolist(),
-        "connected": grp["connected"].tolist(),
-        "not_connected": (grp["total"] - grp["connected"]).tolist(),
-    }
-
-    return dict(scatter=scatter, spend_hist=spend_hist,
-                attempt_dist=attempt_dist, conn_by_disp=conn_by_disp)
-
-
-def compute_risks(k: dict) -> list:
-    risks = []
-    if k["ptp_pct"] < 15:
-        risks.append({"title": "Critical PTP Rate", "body": f"PTP rate {k['ptp_pct']}% is below the 15% baseline. Only {k['ptp_count']:,} of {k['total']:,} leads converted. Review script quality and targeting logic."})
-    if k["not_eval_pct"] > 15:
-        risks.append({"title": "High Not-Evaluated Pool", "body": f"{k['not_eval_pct']}% of leads ({k['not_eval_count']:,}) remain Not Evaluated — recoverable revenue sitting idle."})
-    if k["overattempted_pct"] > 5:
-        risks.append({"title": "Over-Attempted Zero-Connection Leads", "body": f"{k['overattempted']:,} leads ({k['overattempted_pct']}%) have >12 attempts with zero connections — burning spend."})
-    if k["cost_outliers"] > 0:
-        thr = k["spend_mean"] + 2 * k["spend_std"]
-        risks.append({"title": "Cost Outlier Leads", "body": f"{k['cost_outliers']:,} leads exceed ₹{thr:.0f} (mean+2σ). May be distorting Cost-per-PTP metric."})
-    if k["connection_rate"] < 30:
-        risks.append({"title": "Low Connection Rate", "body": f"Only {k['connection_rate']}% connecting. Below 30% signals list quality issues or poor call timing."})
-    if k["active_pct"] > 70:
-        risks.append({"title": "Excessive Active Backlog", "body": f"{k['active_pct']}% of leads still 'active' — signals capacity constraints."})
-    if not risks:
-        risks.append({"title": "No Critical Risks Detected", "body": "All key metrics within acceptable thresholds."})
-    return risks[:4]
-
-
-def compute_levers(k: dict) -> list:
-    levers = []
-    if k["connection_rate"] < 50:
-        gap = 50 - k["connection_rate"]
-        extra = int(gap / 100 * k["total"])
-        levers.append({"title": "Dial-Time Optimisation", "body": f"Shifting AI outreach to peak windows (10am–12pm, 4–6pm IST) could recover {extra:,}+ connections — est. +{gap:.0f}pp connection rate."})
-    if k["not_eval_count"] > 20:
-        pot = int(k["not_eval_count"] * k["ptp_pct"] / 100)
-        levers.append({"title": "Re-Engage Not-Evaluated Leads", "body": f"{k['not_eval_count']:,} unscored leads. Applying current PTP rate projects {pot:,} incremental PTPs via a 3-attempt retry sequence."})
-    if k["overattempted"] > 0:
-        reclaim = _r(k["overattempted"] * k["spend_mean"], 0)
-        levers.append({"title": "Prune Dead-End Leads", "body": f"Capping retries at 12 on {k['overattempted']:,} zero-connection leads reclaims ~₹{reclaim:,.0f} in AI dial spend."})
-    if len(levers) < 3:
-        levers.append({"title": "Score-Based Lead Prioritisation", "body": "Propensity scoring on the top 30% of leads typically reduces Cost per PTP by 20–35% while maintaining coverage."})
-    return levers[:3]
-
-
-def build_response(df: pd.DataFrame) -> dict:
-    k = compute_kpis(df)
-    return dict(
-        kpis=k, score=compute_score(k), funnel=build_funnel(k),
-        charts=compute_charts(df, k),
-        risks=compute_risks(k), levers=compute_levers(k),
-    )
+
+app = Flask(__name__)
+app.request_class = UploadRequest
+
+
+# ── Configuration ─────────────────────────────────────────────────────────────
+# Every setting below can be given as a RECOVERIQ_<NAME> environment variable
+# (values are parsed as JSON, e.g. RECOVERIQ_JOB_WORKERS=4); the caches, the job
+# pool, the dataset store and live campaigns are built from them at import.
+app.config.from_prefixed_env("RECOVERIQ")
+
+# Request bodies over MAX_CONTENT_LENGTH are refused with a 413 before they are
+# read.  Uploads over UPLOAD_SPOOL_BYTES go to disk as they arrive and are parsed
+# through a memory map of that file, so a large upload never sits in RAM.
+# Flask defines MAX_CONTENT_LENGTH (as None), so it is assigned rather than defaulted.
+if app.config["MAX_CONTENT_LENGTH"] is None:
+    app.config["MAX_CONTENT_LENGTH"] = 2 << 30
+app.config.setdefault("UPLOAD_SPOOL_BYTES", 1024 * 1024)
+app.config.setdefault("STREAM_INGEST_BYTES", 32 * 1024 * 1024)
+app.config.setdefault("RESULT_CACHE_BYTES", 64 * 1024 * 1024)
+app.config.setdefault("RESULT_CACHE_DIR", None)
+app.config.setdefault("RESULT_CACHE_DISK_BYTES", 512 * 1024 * 1024)
+
+app.config.setdefault("JOB_WORKERS", 2)
+# Each waiting job holds a temp copy of its upload; past this many, new ones get a 503
+app.config.setdefault("JOB_QUEUE_LIMIT", 16)
+app.config.setdefault("BATCH_WORKERS", os.cpu_count())
+app.config.setdefault("DATASET_DIR", os.path.join(app.instance_path, "datasets"))
+# Stored campaigns are evicted least recently used first beyond this many bytes.
+app.config.setdefault("DATASET_DISK_BYTES", 4 << 30)
+app.config.setdefault("LIVE_CAMPAIGNS", 8)
+# Live event streams: pushes at most every LIVE_PUSH_SECONDS (updates arriving
+# in between go out together), a keep-alive comment when idle, and each stream
+# is closed after LIVE_STREAM_SECONDS for the browser to reconnect.
+app.config.setdefault("LIVE_PUSH_SECONDS", 2.0)
+app.config.setdefault("LIVE_KEEPALIVE_SECONDS", 15.0)
+app.config.setdefault("LIVE_STREAM_SECONDS", 300.0)
+
+results = ResultCache(app.config["RESULT_CACHE_BYTES"], app.config["RESULT_CACHE_DIR"],
+                      app.config["RESULT_CACHE_DISK_BYTES"])
+jobs = JobManager(app.config["JOB_WORKERS"], max_queued=app.config["JOB_QUEUE_LIMIT"])
+store = DatasetStore(app.config["DATASET_DIR"], app.config["DATASET_DISK_BYTES"])
+live = LiveCampaigns(store, app.config["LIVE_CAMPAIGNS"])
+
+
+# ── Metrics ───────────────────────────────────────────────────────────────────
+# Each request is timed stage by stage (see recoveriq.metrics) into the registry
+# served at /metrics.  SERVER_TIMING also sends the stages back as a
+# Server-Timing header.  METRICS_TRACE_MEMORY records each request's peak Python
+# allocations with tracemalloc, which slows allocation-heavy requests, so it is
+# off by default; under concurrency the peak is the process's during the request.
+app.config.setdefault("METRICS_ENABLED", True)
+app.config.setdefault("SERVER_TIMING", False)
+app.config.setdefault("METRICS_TRACE_MEMORY", False)
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+registry = metrics.Registry()
+if app.config["METRICS_TRACE_MEMORY"]:
+    tracemalloc.start()
+
+
+@app.before_request
+def _start_trace():
+    if not app.config["METRICS_ENABLED"]:
+        return
+    g.trace, g.trace_token = metrics.start()
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+        g.trace_memory = tracemalloc.get_traced_memory()[0]
+
+
+@app.after_request
+def _record_trace(resp):
+    """Registered before _encode_response, so it runs after it and sees the encoded body."""
+    trace = g.get("trace")
+    if trace is None:
+        return resp
+    peak = None
+    if "trace_memory" in g:
+        peak = max(tracemalloc.get_traced_memory()[1] - g.trace_memory, 0)
+    registry.record(trace, request.endpoint or "unmatched", resp.status_code,
+                    None if resp.is_streamed else resp.content_length, peak)
+    if app.config["SERVER_TIMING"]:
+        resp.headers["Server-Timing"] = trace.server_timing()
+    return resp
+
+
+@app.teardown_request
+def _stop_trace(exc):
+    token = g.pop("trace_token", None)
+    if token is not None:
+        metrics.stop(token)
+
+
+def _dumps(data: dict) -> bytes:
+    with metrics.timed("serialize"):
+        return app.json.dumps(data).encode()
+
+
+@app.route("/metrics")
+def metrics_text():
+    if resource is not None:
+        # ru_maxrss is in KiB on Linux
+        registry.set("recoveriq_process_peak_rss_bytes", resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024)
+    return app.response_class(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# ── Response encoding ─────────────────────────────────────────────────────────
+# Bodies of at least COMPRESS_MIN_BYTES go out brotli- or gzip-compressed when the
+# client accepts it, and API JSON is re-encoded as MessagePack for clients that
+# prefer it.  brotli and msgpack are optional; without them it is gzip and JSON.
+app.config.setdefault("COMPRESS_MIN_BYTES", 1024)
+app.config.setdefault("COMPRESS_LEVEL", 6)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK      = "application/msgpack"
+COMPRESSIBLE = {"application/json", MSGPACK, "text/html"}
+
+
+def _content_coding():
+    for coding in ("br", "gzip") if brotli else ("gzip",):
+        if request.accept_encodings[coding]:
+            return coding
+    return None
+
+
+def _wants_msgpack() -> bool:
+    accept = request.accept_mimetypes
+    return msgpack is not None and accept.quality(MSGPACK) > accept.quality("application/json")
+
+
+@functools.lru_cache(maxsize=16)
+def _encode(body: bytes, packed: bool, coding) -> bytes:
+    """Re-encode and compress a body; memoised for the fixed, ETag-tagged ones."""
+    if packed:
+        body = msgpack.packb(json.loads(body))
+    if coding == "br":
+        return brotli.compress(body, quality=min(app.config["COMPRESS_LEVEL"], 11))
+    if coding == "gzip":
+        return gzip.compress(body, compresslevel=app.config["COMPRESS_LEVEL"], mtime=0)
+    return body
+
+
+@app.after_request
+def _encode_response(resp):
+    if (resp.is_streamed or resp.direct_passthrough or resp.status_code == 304
+            or "Content-Encoding" in resp.headers):
+        return resp
+    etag, weak = resp.get_etag()
+    packed = resp.mimetype == "application/json" and _wants_msgpack()
+    coding = None
+    if resp.mimetype == "application/json":
+        resp.vary.add("Accept")
+    raw = resp.get_data()
+    if resp.mimetype in COMPRESSIBLE:
+        resp.vary.add("Accept-Encoding")
+        if len(raw) >= app.config["COMPRESS_MIN_BYTES"]:
+            coding = _content_coding()
+    if packed or coding:
+        encode = _encode if etag else _encode.__wrapped__
+        with metrics.timed("compress"):
+            body = encode(raw, packed, coding)
+        if packed or len(body) < len(raw):
+            resp.set_data(body)
+            if packed:
+                resp.mimetype = MSGPACK
+            if coding:
+                resp.headers["Content-Encoding"] = coding
+            if etag:
+                # Each representation gets its own validator
+                resp.set_etag("-".join([etag] + ["msgpack"] * packed + [coding] * bool(coding)), weak)
+    return resp.make_conditional(request) if etag else resp
 
 
 # ── Routes ────────────────────────────────────────────────────────────────────
-REQUIRED = {"Lead_Entity_Disposition", "Lead_State",
-            "AI_Attempted_Calls", "AI_Connected_Calls", "Total_Spend_INR"}
+def _wants_stream(f) -> bool:
+    if request.args.get("stream") == "1":
+        return True
+    start = f.tell()
+    f.seek(0, 2)
+    size = f.tell() - start
+    f.seek(start)
+    return size >= app.config["STREAM_INGEST_BYTES"]
+
+
+def _tagged(body: bytes) -> tuple:
+    return body, hashlib.sha1(body).hexdigest()
+
+
+@functools.lru_cache(maxsize=1)
+def _demo_body() -> tuple:
+    """Encoded demo payload and its ETag; the demo seed is fixed, so both are built once per process."""
+    return _tagged(_dumps(build_response(generate_demo_data())))
+
+
+@functools.lru_cache(maxsize=1)
+def _index_html() -> tuple:
+    return _tagged(render_template("index.html", initial_data=_demo_body()[0].decode()).encode())
+
+
+def _conditional(body: bytes, etag: str, mimetype: str):
+    """Serve a fixed body with its ETag; _encode_response answers a matching If-None-Match with a 304."""
+    resp = app.response_class(body, mimetype=mimetype)
+    resp.set_etag(etag)
+    resp.cache_control.no_cache = True
+    return resp
 
 
 @app.route("/")
 def index():
-    data = build_response(generate_demo_data())
-    return render_template("index.html", initial_data=json.dumps(data))
+    return _conditional(*_index_html(), mimetype="text/html")
 
 
 @app.route("/api/demo")
 def demo():
-    return jsonify(build_response(generate_demo_data()))
+    return _conditional(*_demo_body(), mimetype="application/json")
+
+
+def _storing(writer):
+    """on_chunk for the streaming reader: writes each chunk, giving up on the store (not the analysis) on failure."""
+    def write(chunk):
+        if writer.aborted:
+            return
+        try:
+            writer.write(chunk)
+        except Exception:
+            app.logger.exception("Could not store dataset %s", writer.dataset_id)
+            writer.abort()
+    return write
+
+
+def _stored_response(dataset_id: str) -> dict:
+    """build_response of a stored campaign as uploaded, folded over its record batches like a streamed upload."""
+    def chunks(stage, base):
+        return (compact(batch) for batch in store.batches(dataset_id, CHUNK_ROWS))
+    agg, charts = aggregate_chunks(chunks)
+    with metrics.timed("kpis"):
+        return assemble(agg.kpis(), charts)
+
+
+def _upload_body(f, stream: bool, progress=None, name=None) -> tuple:
+    """Encoded response for an uploaded CSV; returns (body, "HIT"|"MISS").
+
+    Results are cached by content hash, and the rows are kept in the dataset store
+    under the first 16 hex digits of that hash, so a re-upload of a campaign whose
+    result was evicted is re-analysed from the store instead of re-parsed.
+    A gzip, zip or zstd upload is hashed as sent and always read by the streaming
+    reader, inflating as it parses, since its inflated size is unknown.
+    """
+    digest = content_key(f)
+    key    = f"v{PAYLOAD_VERSION}-{digest}"
+    dataset_id = digest[:16]
+    # The cached body names the stored campaign, so it only stands while that is kept;
+    # without it the lookup is a miss, as /api/cache/stats should count it
+    if not store.exists(dataset_id):
+        results.discard(key)
+    body = results.get(key)
+    if body is not None:
+        return body, "HIT"
+    f = open_upload(f)
+    stream = stream or isinstance(f, Decompressed)
+    stored = True
+    if store.exists(dataset_id):
+        data = _stored_response(dataset_id)
+    elif stream:
+        with store.writer(dataset_id, name) as w:
+            data = stream_response(f, progress=progress, on_chunk=_storing(w))
+        stored = not w.aborted
+    else:
+        df   = read_upload(f)
+        data = build_response(df)
+        # Stored only once analysed: a stored id is taken as a good campaign by every later upload
+        try:
+            store.save(dataset_id, df, name)
+        except Exception:
+            app.logger.exception("Could not store dataset %s", dataset_id)
+            stored = False
+    # An upload that could not be stored is still analysed, but has no campaign to follow or query
+    data["dataset_id"] = dataset_id if stored else None
+    body = _dumps(data)
+    results.put(key, body)
+    return body, "MISS"
+
+
+def _error(exc: Exception):
+    return jsonify({"error": str(exc)}), 400 if isinstance(exc, (UploadError, QueryError)) else 500
+
+
+@app.errorhandler(RequestEntityTooLarge)
+def _too_large(exc):
+    limit = app.config["MAX_CONTENT_LENGTH"]
+    return jsonify({"error": f"Upload is larger than the limit of {limit:,} bytes"}), 413
+
+
+def _uploaded_file():
+    if "file" not in request.files:
+        return None, (jsonify({"error": "No file provided"}), 400)
+    f = request.files["file"]
+    if not f.filename:
+        return None, (jsonify({"error": "Empty filename"}), 400)
+    return f, None
 
 
 @app.route("/api/upload", methods=["POST"])
 def upload():
-    if "file" not in request.files:
-        return jsonify({"error": "No file provided"}), 400
-    f = request.files["file"]
-    if not f.filename:
-        return jsonify({"error": "Empty filename"}), 400
+    f, err = _uploaded_file()
+    if err:
+        return err
+    try:
+        with mapped(f) as data:
+            body, cache = _upload_body(data, _wants_stream(data), name=f.filename)
+        return app.response_class(body, mimetype="application/json", headers={"X-Cache": cache})
+    except Exception as exc:
+        return _error(exc)
+
+
+def _run_upload_job(report, path: str, name: str) -> bytes:
+    try:
+        with metrics.tracing() as trace, open(path, "rb") as fh, mapped(fh) as data:
+            body = _upload_body(data, stream=True, progress=report, name=name)[0]
+        if app.config["METRICS_ENABLED"]:
+            registry.record(trace, "job", 200, len(body))
+        return body
+    finally:
+        os.remove(path)
+
+
+@app.route("/api/jobs", methods=["POST"])
+def submit_job():
+    """Queue an upload for background analysis; poll the returned status URL for progress."""
+    f, err = _uploaded_file()
+    if err:
+        return err
+    fd, path = tempfile.mkstemp(prefix="riq-upload-", suffix=".csv")
+    with os.fdopen(fd, "wb") as out:
+        shutil.copyfileobj(f.stream, out, 1 << 20)
+    try:
+        job = jobs.submit(_run_upload_job, path, f.filename)
+    except QueueFull as exc:
+        os.remove(path)
+        return jsonify({"error": f"Too many uploads in progress ({exc}); try again shortly"}), 503, {"Retry-After": "5"}
+    status_url = url_for("job_status", job_id=job.id)
+    return (jsonify(dict(job.to_dict(), status_url=status_url,
+                         result_url=url_for("job_result", job_id=job.id))),
+            202, {"Location": status_url})
+
+
+@app.route("/api/jobs/<job_id>")
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job.to_dict())
+
+
+@app.route("/api/jobs/<job_id>/result")
+def job_result(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    if job.status == "error":
+        return _error(job.error)
+    if job.status != "done":
+        return jsonify(job.to_dict()), 409
+    return app.response_class(job.body, mimetype="application/json")
+
+
+@app.route("/api/batch", methods=["POST"])
+def batch_upload():
+    """Analyse several campaign CSVs in parallel and merge them into a portfolio view."""
+    files = [f for f in request.files.getlist("file") if f.filename]
+    if not files:
+        return jsonify({"error": "No files provided"}), 400
+    paths = []
+    try:
+        for f in files:
+            fd, path = tempfile.mkstemp(prefix="riq-batch-", suffix=".csv")
+            with os.fdopen(fd, "wb") as out:
+                shutil.copyfileobj(f.stream, out, 1 << 20)
+            paths.append((path, f.filename))
+        data = batch.analyse_batch(paths, app.config["BATCH_WORKERS"])
+        return app.response_class(_dumps(data), mimetype="application/json")
+    finally:
+        for path, _ in paths:
+            os.remove(path)
+
+
+@app.route("/api/datasets")
+def list_datasets():
+    return jsonify(store.list())
+
+
+@app.route("/api/datasets/<dataset_id>")
+def dataset(dataset_id):
+    """A stored campaign with its record updates applied; it stays open for further updates."""
+    try:
+        campaign = live.get(dataset_id)
+        if campaign is None:
+            return jsonify({"error": "Unknown dataset"}), 404
+        data = campaign.payload()
+        return app.response_class(_dumps(dict(data, dataset_id=dataset_id)), mimetype="application/json")
+    except Exception as exc:
+        return _error(exc)
+
+
+@app.route("/api/datasets/<dataset_id>", methods=["DELETE"])
+def delete_dataset(dataset_id):
+    live.close(dataset_id)
+    if not store.delete(dataset_id):
+        return jsonify({"error": "Unknown dataset"}), 404
+    return "", 204
+
+
+@app.route("/api/datasets/<dataset_id>/query")
+def query_dataset(dataset_id):
+    """Dashboard payload for the leads of a stored campaign matching query-string filters.
+
+    e.g. ``?state=active&attempts_gt=8``; see ``parse_filters`` for the syntax.
+    Results are cached per stored campaign, version and filter set.
+    """
+    campaign = live.get(dataset_id)
+    if campaign is None:
+        return jsonify({"error": "Unknown dataset"}), 404
+    try:
+        filters = parse_filters(request.args)
+        tag = hashlib.sha1(json.dumps(filters, sort_keys=True).encode()).hexdigest()[:16]
+        # Keyed on when the campaign was stored as well: a re-upload restarts at version 0
+        key = f"v{PAYLOAD_VERSION}-q-{dataset_id}-{campaign.created}-{campaign.version}-{tag}"
+        body = results.get(key)
+        if body is None:
+            version, data = campaign.query(filters)
+            if data is None:
+                return jsonify({"error": "No leads match these filters", "filters": filters}), 404
+            body = _dumps(dict(data, dataset_id=dataset_id, filters=filters))
+            results.put(f"v{PAYLOAD_VERSION}-q-{dataset_id}-{campaign.created}-{version}-{tag}", body)
+        return app.response_class(body, mimetype="application/json")
+    except Exception as exc:
+        return _error(exc)
+
+
+@app.route("/api/datasets/<dataset_id>/records", methods=["POST"])
+def upsert_records(dataset_id):
+    """Insert or update leads by Lead_ID, from a CSV ``file`` or a JSON list of records.
+
+    Only the changed fields need sending for a known lead.  The KPIs are updated
+    from the changed leads alone rather than by re-analysing the campaign.
+    """
+    if not store.exists(dataset_id):
+        return jsonify({"error": "Unknown dataset"}), 404
+    if request.files:
+        f, err = _uploaded_file()
+        if err:
+            return err
+    else:
+        f = request.get_json(silent=True)
+        if not isinstance(f, list):
+            return jsonify({"error": "Expected a CSV file or a JSON list of records"}), 400
     try:
-        df = pd.read_csv(f)
-        if "Total_Spend (INR)" in df.columns and "Total_Spend_INR" not in df.columns:
-            df = df.rename(columns={"Total_Spend (INR)": "Total_Spend_INR"})
-        missing = REQUIRED - set(df.columns)
-        if missing:
-            return jsonify({"error": f"Missing columns: {', '.join(sorted(missing))}"}), 400
-        return jsonify(build_response(df))
+        if isinstance(f, list):
+            records = read_records(pd.DataFrame.from_records(f))
+        else:
+            records = read_record_file(open_upload(f))
+        counts = live.upsert(dataset_id, records)
+        data = live.get(dataset_id).payload()
+        return app.response_class(_dumps(dict(data, dataset_id=dataset_id, **counts)),
+                                  mimetype="application/json")
     except Exception as exc:
-        return jsonify({"error": str(exc)}), 500
+        return _error(exc)
+
+
+def _sse(event: str, version: int, data: dict) -> str:
+    return f"event: {event}\nid: {version}\ndata: {app.json.dumps(data)}\n\n"
+
+
+def _live_events(dataset_id: str, last_id: str | None):
+    """Event stream for one campaign: a ``snapshot`` of the full payload, then ``patch`` events.
+
+    A patch holds only what changed since the previous event (see ``payload_diff``),
+    and the payload behind it is built once per version however many clients
+    follow the campaign.  A client reconnecting with the current version as its
+    Last-Event-ID gets no snapshot.
+    """
+    cfg = app.config
+    deadline = time.monotonic() + cfg["LIVE_STREAM_SECONDS"]
+    campaign = live.get(dataset_id)
+    if campaign is None:
+        # Deleted or evicted since the route checked: the reconnect gets the 404
+        return
+    version, sent = campaign.snapshot()
+    yield f"retry: {int(cfg['LIVE_PUSH_SECONDS'] * 1000)}\n\n"
+    if last_id != str(version):
+        yield _sse("snapshot", version, dict(sent, dataset_id=dataset_id))
+    while time.monotonic() < deadline:
+        seen = campaign.wait(version, cfg["LIVE_KEEPALIVE_SECONDS"])
+        current = live.get(dataset_id)
+        if current is None:
+            return
+        if seen == version and current is campaign:
+            yield ": keep-alive\n\n"
+            continue
+        time.sleep(cfg["LIVE_PUSH_SECONDS"])
+        campaign = current
+        version, data = campaign.snapshot()
+        patch = payload_diff(sent, data)
+        sent  = data
+        if patch:
+            yield _sse("patch", version, patch)
+
+
+@app.route("/api/datasets/<dataset_id>/events")
+def dataset_events(dataset_id):
+    """Server-Sent Events following a stored campaign as records are upserted into it."""
+    if not store.exists(dataset_id):
+        return jsonify({"error": "Unknown dataset"}), 404
+    # ?since=<version> names the version the client already shows, as Last-Event-ID does on a reconnect
+    events = _live_events(dataset_id, request.headers.get("Last-Event-ID") or request.args.get("since"))
+    return app.response_class(stream_with_context(events), mimetype="text/event-stream",
+                              headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.route("/api/cache/stats")
+def cache_stats():
+    return jsonify(results.stats())
 
 
 if __name__ == "__main__":
@@ -34,15 +34,33 @@ const $ = id => document.getElementById(id);
 const fmt  = n => Number(n).toLocaleString('en-IN');
 const fmtR = n => `₹${Number(n).toLocaleString('en-IN')}`;
 
-function showLoad() { $('loadingVeil').classList.add('show'); }
+function showLoad(label = 'Analysing data…') { $('loadingLabel').textContent = label; $('loadingVeil').classList.add('show'); }
 function hideLoad() { $('loadingVeil').classList.remove('show'); }
 function showError(m) { $('errorMsg').textContent = m; $('errorStrip').classList.add('show'); }
 function hideError()  { $('errorStrip').classList.remove('show'); }
 
+/* ── Chart drawing ────────────────────────────────────────────────────────── */
+// Charts are built once and then patched: new labels and dataset values are
+// copied into the live instance and Chart.js animates the difference.  A chart
+// is only rebuilt when its shape (type, dataset count, or the given key) changes.
+function drawChart(key, canvas, config, shape = '') {
+  const chart = C[key];
+  shape = `${config.type}:${config.data.datasets.length}:${shape}`;
+  if (!chart || chart.$shape !== shape) {
+    if (chart) chart.destroy();
+    C[key] = new Chart($(canvas), config);
+    C[key].$shape = shape;
+    return;
+  }
+  chart.data.labels = config.data.labels;
+  config.data.datasets.forEach((ds, i) => Object.assign(chart.data.datasets[i], ds));
+  chart.options.plugins.tooltip = config.options.plugins.tooltip;
+  chart.update();
+}
+
 /* ── Animated counter ─────────────────────────────────────────────────────── */
-function animateNum(el, target, prefix = '', suffix = '', decimals = 0) {
+function animateNum(el, target, prefix = '', suffix = '', decimals = 0, from = 0) {
   const duration = 900, start = performance.now();
-  const from = 0;
   function step(now) {
     const p = Math.min((now - start) / duration, 1);
     const ease = 1 - Math.pow(1 - p, 3);
@@ -54,8 +72,12 @@ function animateNum(el, target, prefix = '', suffix = '', decimals = 0) {
 }
 
 /* ── Render all ───────────────────────────────────────────────────────────── */
+let current = null;
+
 function renderAll(data) {
   hideError();
+  current = data;
+  data.kpis.score = data.score?.value;
   renderKPIs(data.kpis);
   renderHealthBar(data.kpis);
   renderScore(data.score, data.kpis);
@@ -72,6 +94,8 @@ function renderAll(data) {
 }
 
 /* ── 01: KPI Cards ────────────────────────────────────────────────────────── */
+const SHOWN = [];
+
 function renderKPIs(k) {
   const cards = [
     { cls:'kpi-gold',   icon:'📋', label:'Total Leads',      val:k.total,            pre:'', suf:'',  dec:0, sub:`${fmt(k.attempted_leads)} attempted`,   bench:null },
@@ -100,11 +124,12 @@ function renderKPIs(k) {
       </div>`;
   }).join('');
 
-  // Animate counters
-  document.querySelectorAll('.kpi-val').forEach(el => {
+  // Animate counters, from the value last shown when the cards are redrawn
+  document.querySelectorAll('.kpi-val').forEach((el, i) => {
     const val = parseFloat(el.dataset.val);
     const dec = parseInt(el.dataset.dec);
-    animateNum(el, val, el.dataset.pre, el.dataset.suf, dec);
+    animateNum(el, val, el.dataset.pre, el.dataset.suf, dec, SHOWN[i] || 0);
+    SHOWN[i] = val;
   });
 }
 
@@ -162,8 +187,7 @@ function renderScore(score, k) {
   const maxV   = barData.map(b => b[4]);
   const cols   = barData.map(b => b[0]);
 
-  if (C.score) C.score.destroy();
-  C.score = new Chart($('scoreChart'), {
+  drawChart('score', 'scoreChart', {
     type: 'bar',
     data: {
       labels,
@@ -189,8 +213,7 @@ function renderScore(score, k) {
   const sLabels = Object.keys(states);
   const sVals   = Object.values(states);
   const sCols   = { active: BLUE, inactive: '#475569', completed: GREEN };
-  if (C.state) C.state.destroy();
-  C.state = new Chart($('stateChart'), {
+  drawChart('state', 'stateChart', {
     type: 'doughnut',
     data: {
       labels: sLabels,
@@ -280,6 +303,7 @@ function renderEfficiency(k) {
     ['Cost per Attempt',    `₹${cpa}`],
     ['Cost per Lead',       `₹${cpl}`],
     ['Avg Spend per Lead',  `₹${k.spend_mean}`],
+    ['Spend p50 / p90 / p99', `₹${Math.round(k.spend_p50)} / ₹${Math.round(k.spend_p90)} / ₹${Math.round(k.spend_p99)}`],
   ]);
 }
 
@@ -292,8 +316,7 @@ function renderDispositionCharts(dispositions) {
   const brCols  = entries.map(([k]) => DISP_COLOR[k]  || '#475569');
 
   // Bar chart
-  if (C.disp) C.disp.destroy();
-  C.disp = new Chart($('dispChart'), {
+  drawChart('disp', 'dispChart', {
     type: 'bar',
     data: { labels, datasets: [{ data: values, backgroundColor: bgCols, borderColor: brCols, borderWidth: 1.5, borderRadius: 4 }] },
     options: {
@@ -307,8 +330,7 @@ function renderDispositionCharts(dispositions) {
   });
 
   // Donut chart
-  if (C.donut) C.donut.destroy();
-  C.donut = new Chart($('donutChart'), {
+  drawChart('donut', 'donutChart', {
     type: 'doughnut',
     data: {
       labels,
@@ -326,8 +348,7 @@ function renderDispositionCharts(dispositions) {
 
 /* ── 03: Connection by disposition (stacked bar) ─────────────────────────── */
 function renderConnByDisp(d) {
-  if (C.connDisp) C.connDisp.destroy();
-  C.connDisp = new Chart($('connDispChart'), {
+  drawChart('connDisp', 'connDispChart', {
     type: 'bar',
     data: {
       labels: d.labels.map(l => l.replace(/_/g, ' ')),
@@ -348,34 +369,51 @@ function renderConnByDisp(d) {
 }
 
 /* ── 05: Scatter plot (attempts vs spend) ─────────────────────────────────── */
-function renderScatter(scatter) {
-  // Group by disposition for multi-dataset coloring
-  const groups = {};
-  scatter.forEach(p => {
-    if (!groups[p.d]) groups[p.d] = [];
-    groups[p.d].push({ x: p.x, y: p.y });
-  });
+function renderScatter(s) {
+  // Columnar payload. "points": every lead, x/y/d/connected parallel arrays.
+  // "density": exact lead counts per (attempts, spend) cell, drawn at cell
+  // centres sized by count, plus the costliest outlier leads as crosses.
+  const dense = s.mode === 'density';
+  const pts   = dense ? s.cells : s;
+  $('scatterSub').textContent = dense ? '(lead density)' : '(all leads)';
+  const top   = dense ? Math.max(1, ...pts.n) : 1;
+  const groups = s.dispositions.map(() => []);
+  for (let i = 0; i < pts.x.length; i++) {
+    if (!groups[pts.d[i]]) continue;   // a lead with no disposition has no series
+    groups[pts.d[i]].push(dense ? { x: pts.x[i], y: pts.y[i], n: pts.n[i] } : { x: pts.x[i], y: pts.y[i] });
+  }
 
-  const datasets = Object.entries(groups).map(([disp, pts]) => ({
+  const datasets = s.dispositions.map((disp, i) => ({
     label:           disp.replace(/_/g, ' '),
-    data:            pts,
+    data:            groups[i],
     backgroundColor: (DISP_COLOR[disp] || '#475569') + '99',
     borderColor:     DISP_COLOR[disp] || '#475569',
-    borderWidth:     1,
-    pointRadius:     4,
-    pointHoverRadius: 6,
+    borderWidth:     dense ? 0 : 1,
+    pointRadius:     dense ? ctx => 2 + 9 * Math.sqrt((ctx.raw ? ctx.raw.n : 0) / top) : 4,
+    pointHoverRadius: dense ? ctx => 4 + 9 * Math.sqrt((ctx.raw ? ctx.raw.n : 0) / top) : 6,
   }));
+  if (dense && s.outliers.x.length) {
+    datasets.push({
+      label:       'Cost outliers',
+      data:        s.outliers.x.map((x, i) => ({ x, y: s.outliers.y[i], outlier: true })),
+      pointStyle:  'crossRot',
+      borderColor: '#ef4444',
+      borderWidth: 1.5,
+      pointRadius: 4,
+    });
+  }
 
-  if (C.scatter) C.scatter.destroy();
-  C.scatter = new Chart($('scatterChart'), {
+  drawChart('scatter', 'scatterChart', {
     type: 'scatter',
     data: { datasets },
     options: {
-      responsive: true,
+      responsive: true, parsing: false, animation: dense ? false : undefined,
       plugins: {
         legend: { position: 'bottom', labels: { color: '#94a3b8', font: { size: 10 }, padding: 10 } },
         tooltip: { callbacks: {
-          label: ctx => ` ${ctx.dataset.label} — ${ctx.parsed.x} attempts, ₹${ctx.parsed.y}`
+          label: ctx => ctx.raw.n !== undefined
+            ? ` ${ctx.dataset.label} — ${fmt(ctx.raw.n)} leads at ~${ctx.parsed.x} attempts, ~₹${ctx.parsed.y}`
+            : ` ${ctx.dataset.label} — ${ctx.parsed.x} attempts, ₹${ctx.parsed.y}`
         }},
       },
       scales: {
@@ -385,13 +423,12 @@ function renderScatter(scatter) {
              grid: { color: '#1a3050' }, ticks: { color: '#94a3b8' } },
       },
     },
-  });
+  }, s.mode);
 }
 
 /* ── 05: Attempt distribution ─────────────────────────────────────────────── */
 function renderAttDist(d) {
-  if (C.attDist) C.attDist.destroy();
-  C.attDist = new Chart($('attDistChart'), {
+  drawChart('attDist', 'attDistChart', {
     type: 'bar',
     data: {
       labels: d.labels,
@@ -420,8 +457,7 @@ function renderAttDist(d) {
 
 /* ── 05: Spend histogram ──────────────────────────────────────────────────── */
 function renderSpendHist(d) {
-  if (C.spendHist) C.spendHist.destroy();
-  C.spendHist = new Chart($('spendHistChart'), {
+  drawChart('spendHist', 'spendHistChart', {
     type: 'bar',
     data: {
       labels: d.labels,
@@ -449,10 +485,9 @@ function renderSpendHist(d) {
 
 /* ── 06: Risks ────────────────────────────────────────────────────────────── */
 function renderRisks(risks) {
-  const sev = r => r.title.toLowerCase().includes('critical') || r.title.toLowerCase().includes('low') ? 'HIGH' : 'MEDIUM';
   $('riskGrid').innerHTML = risks.map(r => {
-    const s   = sev(r);
-    const cls = s === 'HIGH' ? 'rb-high' : 'rb-medium';
+    const s   = r.severity;
+    const cls = `rb-${s === 'HIGH' ? 'high' : s === 'MEDIUM' ? 'medium' : 'low'}`;
     return `
       <div class="risk-card">
         <div class="risk-head">
@@ -493,15 +528,53 @@ function handleFile(e) {
   e.target.value = '';
 }
 
+// API responses come back as MessagePack when the decoder loaded, JSON otherwise;
+// the browser negotiates gzip/brotli on its own.  Checked per request, as the
+// decoder is a deferred script that may load after this one.
+const accept = () => typeof MessagePack !== 'undefined' ? 'application/msgpack, application/json;q=0.9' : 'application/json';
+
+async function api(url, opts = {}) {
+  const res  = await fetch(url, { ...opts, headers: { Accept: accept(), ...(opts.headers || {}) } });
+  const type = res.headers.get('Content-Type') || '';
+  const data = type.startsWith('application/msgpack')
+    ? MessagePack.decode(new Uint8Array(await res.arrayBuffer()))
+    : await res.json();
+  return { res, data };
+}
+
+const STAGE_LABEL = { queued: 'Queued', starting: 'Reading file', aggregating: 'Aggregating leads', charting: 'Building charts', done: 'Rendering' };
+const sleep = ms => new Promise(r => setTimeout(r, ms));
+
+// Files under JOB_UPLOAD_BYTES are analysed in the upload request itself.  Larger
+// ones go through the job API: POST returns a job id straight away and we poll its
+// status (for the progress label) until the result is ready.
+const JOB_UPLOAD_BYTES = 8 * 1024 * 1024;
+
+async function uploadJob(fd) {
+  const submitted = await api('/api/jobs', { method: 'POST', body: fd });
+  let job = submitted.data;
+  if (!submitted.res.ok) return submitted;
+  const statusUrl = job.status_url, resultUrl = job.result_url;
+  while (job.status === 'queued' || job.status === 'running') {
+    $('loadingLabel').textContent = `${STAGE_LABEL[job.stage] || 'Analysing data'}… ${Math.round(job.progress * 100)}%`;
+    await sleep(400);
+    job = (await api(statusUrl)).data;
+  }
+  return api(resultUrl);
+}
+
 async function uploadFile(file) {
-  showLoad();
+  showLoad('Uploading…');
   const fd = new FormData();
   fd.append('file', file);
   try {
-    const res  = await fetch('/api/upload', { method: 'POST', body: fd });
-    const data = await res.json();
+    const { res, data } = file.size < JOB_UPLOAD_BYTES
+      ? await api('/api/upload', { method: 'POST', body: fd })
+      : await uploadJob(fd);
     if (!res.ok) { showError(data.error || 'Upload failed'); return; }
     renderAll(data);
+    follow(null);
+    offerLive(data.dataset_id);
     $('dataChip').textContent = file.name;
     $('dataChip').className   = 'chip chip-green';
   } catch (err) {
@@ -514,7 +587,9 @@ async function uploadFile(file) {
 async function loadDemo() {
   showLoad();
   try {
-    const data = await (await fetch('/api/demo')).json();
+    const { data } = await api('/api/demo');
+    follow(null);
+    offerLive(null);
     renderAll(data);
     $('dataChip').textContent = 'Demo Data';
     $('dataChip').className   = 'chip chip-gold';
@@ -525,6 +600,62 @@ async function loadDemo() {
   }
 }
 
+/* ── Live updates ─────────────────────────────────────────────────────────── */
+// A stored campaign is followed over Server-Sent Events: the first event is the
+// full payload, later ones only the KPI fields, charts and sections that changed,
+// and only the panels those feed are redrawn.  EventSource reconnects by itself.
+// A stream holds a server worker and keeps the campaign in server memory, so an
+// upload is only followed once the user asks for it ("Go live"); wallboards
+// opened with ?dataset= follow from the start.
+let feed = null;
+
+// `since` is the campaign version already on screen; the server then skips the snapshot.
+function follow(datasetId, since = null) {
+  if (feed) feed.close();
+  feed = null;
+  if (!datasetId || typeof EventSource === 'undefined') return;
+  const query = since === null ? '' : `?since=${since}`;
+  feed = new EventSource(`/api/datasets/${encodeURIComponent(datasetId)}/events${query}`);
+  feed.addEventListener('snapshot', e => renderAll(JSON.parse(e.data)));
+  feed.addEventListener('patch',    e => applyPatch(JSON.parse(e.data)));
+}
+
+// An upload's payload is its campaign as uploaded, i.e. version 0; later record
+// updates bump the version, and following from 0 sends them as a snapshot.
+function offerLive(datasetId) {
+  const btn = $('liveBtn');
+  btn.hidden = !datasetId || typeof EventSource === 'undefined';
+  btn.onclick = () => {
+    btn.hidden = true;
+    follow(datasetId, 0);
+    $('dataChip').textContent = 'Live';
+  };
+}
+
+function applyPatch(patch) {
+  const d = current, ch = patch.charts || {};
+  if (patch.kpis)   Object.assign(d.kpis, patch.kpis);
+  if (patch.charts) Object.assign(d.charts, patch.charts);
+  for (const key of ['score', 'funnel', 'risks', 'levers']) if (key in patch) d[key] = patch[key];
+  d.kpis.score = d.score?.value;
+
+  if (patch.kpis || patch.score) {
+    renderKPIs(d.kpis);
+    renderHealthBar(d.kpis);
+    renderScore(d.score, d.kpis);
+    renderEfficiency(d.kpis);
+    updateSidebar(d.kpis);
+  }
+  if (patch.kpis?.dispositions) renderDispositionCharts(d.kpis.dispositions);
+  if (patch.funnel)      renderFunnel(d.funnel, d.kpis);
+  if (ch.conn_by_disp)   renderConnByDisp(d.charts.conn_by_disp);
+  if (ch.scatter)        renderScatter(d.charts.scatter);
+  if (ch.attempt_dist)   renderAttDist(d.charts.attempt_dist);
+  if (ch.spend_hist)     renderSpendHist(d.charts.spend_hist);
+  if (patch.risks)       renderRisks(d.risks);
+  if (patch.levers)      renderLevers(d.levers);
+}
+
 /* ── Drag & drop ──────────────────────────────────────────────────────────── */
 function initDragDrop() {
   const z = $('uploadZone');
@@ -541,8 +672,12 @@ function initDragDrop() {
 /* ── Boot ─────────────────────────────────────────────────────────────────── */
 document.addEventListener('DOMContentLoaded', () => {
   initDragDrop();
-  // Pass score into kpis for health bar
-  const d = window.INITIAL_DATA;
-  if (d && d.kpis) d.kpis.score = d.score?.value;
-  renderAll(d);
+  renderAll(window.INITIAL_DATA);
+  // ?dataset=<id> follows a stored campaign live (wallboards)
+  const live = new URLSearchParams(location.search).get('dataset');
+  if (live) {
+    follow(live);
+    $('dataChip').textContent = 'Live';
+    $('dataChip').className   = 'chip chip-green';
+  }
 });
@@ -0,0 +1,35 @@
+import importlib
+import json
+import os
+
+import pytest
+
+from recoveriq import synth
+
+
+def normalised(payload: dict) -> dict:
+    """A payload as the client sees it: numpy scalars and tuples become plain JSON values."""
+    return json.loads(json.dumps(payload, sort_keys=True))
+
+
+@pytest.fixture(scope="session")
+def server(tmp_path_factory):
+    """The Flask app module, on a throwaway dataset store."""
+    os.environ["RECOVERIQ_DATASET_DIR"] = str(tmp_path_factory.mktemp("datasets"))
+    return importlib.import_module("server")
+
+
+@pytest.fixture(scope="session")
+def campaign_csv(tmp_path_factory) -> bytes:
+    """A 20,000-lead synthetic campaign export."""
+    path = str(tmp_path_factory.mktemp("campaign") / "campaign.csv")
+    synth.write(path, 20_000, seed=7)
+    with open(path, "rb") as fh:
+        return fh.read()
+
+
+@pytest.fixture
+def client(server):
+    """A test client with an empty result cache, so every upload is analysed afresh."""
+    server.results.clear()
+    return server.app.test_client()
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+from recoveriq import KpiAggregate, compact, generate_demo_data
+from recoveriq.aggregate import MAX_SPEND_KEYS, QUANTILES, SPEND_ACCURACY
+from recoveriq.cube import SegmentCube
+
+
+def test_chunks_merge_into_the_whole_frame():
+    df     = generate_demo_data(5_000)
+    whole  = KpiAggregate.from_frame(df)
+    parts  = [KpiAggregate.from_frame(df.iloc[lo:hi]) for lo, hi in ((0, 1), (1, 1_234), (1_234, 4_000), (4_000, 5_000))]
+    merged = parts[0]
+    for part in parts[1:]:
+        merged = merged + part
+    assert merged.kpis() == whole.kpis()
+    for name, values in whole.cube.measures.items():
+        np.testing.assert_array_equal(merged.cube.measures[name], values)
+    assert (KpiAggregate() + whole).kpis() == whole.kpis()
+
+
+def test_retracting_a_chunk_leaves_the_rest():
+    df = generate_demo_data(5_000)
+    assert (KpiAggregate.from_frame(df) - KpiAggregate.from_frame(df.iloc[:1_500])).kpis() \
+        == KpiAggregate.from_frame(df.iloc[1_500:]).kpis()
+
+
+def test_cube_rollups_match_groupbys():
+    df   = generate_demo_data(5_000)
+    cube = SegmentCube.from_frame(df)
+    active = df[df["Lead_State"] == "active"]
+    assert cube.rollup("disposition", state="active") == active["Lead_Entity_Disposition"].value_counts().to_dict()
+    over = (df["AI_Attempted_Calls"] > 12) & (df["AI_Connected_Calls"] == 0)
+    assert cube.total(attempts="13+", connected="no") == over.sum()
+    assert cube.total("att_sum", disposition=["PTP", "RTP"]) \
+        == df.loc[df["Lead_Entity_Disposition"].isin(["PTP", "RTP"]), "AI_Attempted_Calls"].sum()
+
+
+# ── Spend sketch ──────────────────────────────────────────────────────────────
+def _spend_frame(spend: np.ndarray) -> pd.DataFrame:
+    n = len(spend)
+    return compact(pd.DataFrame({
+        "Lead_ID": [f"L{i}" for i in range(n)], "Lead_Entity_Disposition": "PTP", "Lead_State": "active",
+        "AI_Attempted_Calls": 3, "AI_Connected_Calls": 1, "Total_Spend_INR": spend,
+    }))
+
+
+def test_small_spend_maps_give_exact_quantiles():
+    spend = np.round(np.random.default_rng(1).uniform(5, 45, 2_000), 2)
+    agg   = KpiAggregate.from_frame(_spend_frame(spend))
+    assert not agg.spend.coarse
+    np.testing.assert_allclose(agg.spend_quantiles(), np.quantile(spend, QUANTILES), rtol=1e-12)
+
+
+def test_large_spend_maps_stay_bounded_and_close():
+    spend = np.round(np.random.default_rng(2).lognormal(7, 1.2, 200_000), 2)
+    df    = _spend_frame(spend)
+    agg   = KpiAggregate.from_frame(df)
+    assert agg.spend.coarse and len(agg.spend.keys) <= MAX_SPEND_KEYS
+    np.testing.assert_allclose(agg.spend_quantiles(), np.quantile(spend, QUANTILES), rtol=2 * SPEND_ACCURACY)
+    k = agg.kpis()
+    assert k["total_spend"] == round(spend.sum(), 2)
+    assert (k["spend_mean"], k["spend_std"]) == (round(spend.mean(), 2), round(spend.std(ddof=1), 2))
+    # Exact chunks that outgrow the map once merged end up in the same buckets
+    merged = KpiAggregate.from_frame(df.iloc[:1_000]) + KpiAggregate.from_frame(df.iloc[1_000:])
+    assert merged.kpis() == k
+    # Retracting leaves the exact sums exact, and the sketch bounded
+    rest = merged - KpiAggregate.from_frame(df.iloc[:1_000])
+    assert rest.spend.total == KpiAggregate.from_frame(df.iloc[1_000:]).spend.total
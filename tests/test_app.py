@@ -0,0 +1,25 @@
+import os
+
+import pytest
+
+AppTest = pytest.importorskip("streamlit.testing.v1").AppTest
+
+APP = os.path.join(os.path.dirname(__file__), os.pardir, "app.py")
+
+
+def test_dashboard_renders_the_demo_and_reruns():
+    at = AppTest.from_file(APP, default_timeout=60).run()
+    assert not at.exception
+    assert at.session_state.fp == "demo-500"
+    assert not at.run().exception
+
+
+def test_rerun_builds_no_figures(monkeypatch):
+    go = pytest.importorskip("plotly.graph_objects")
+    at = AppTest.from_file(APP, default_timeout=60).run()
+    charts = len(at.get("plotly_chart"))
+    built  = []
+    figure = go.Figure
+    monkeypatch.setattr(go, "Figure", lambda *args, **kwargs: built.append(1) or figure(*args, **kwargs))
+    assert not at.run().exception
+    assert built == [] and len(at.get("plotly_chart")) == charts == 11
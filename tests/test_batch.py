@@ -0,0 +1,46 @@
+import io
+
+from recoveriq import batch, build_response, compact, read_upload
+from recoveriq.ingest import stream_aggregate
+
+from conftest import normalised
+
+
+def test_portfolio_equals_one_file_holding_every_campaign(tmp_path, campaign_csv):
+    header, _, rows = campaign_csv.partition(b"\n")
+    rows  = rows.splitlines(keepends=True)
+    parts = [rows[:7_000], rows[7_000:15_000], rows[15_000:]]
+    paths = []
+    for i, part in enumerate(parts):
+        paths.append(str(tmp_path / f"part{i}.csv"))
+        with open(paths[-1], "wb") as fh:
+            fh.write(header + b"\n" + b"".join(part))
+    bad = tmp_path / "bad.csv"
+    bad.write_bytes(b"Lead_ID,Spend\nA,1\n")
+
+    result = batch.analyse_batch([paths[0], (paths[1], "second"), str(bad), paths[2]], workers=2)
+    assert [c["name"] for c in result["campaigns"]] == ["part0.csv", "second", "part2.csv"]
+    assert [c["kpis"]["total"] for c in result["campaigns"]] == [len(p) for p in parts]
+    [error] = result["errors"]
+    assert error["name"] == "bad.csv" and error["error"]
+
+    whole  = build_response(compact(read_upload(io.BytesIO(campaign_csv))))
+    merged = result["portfolio"]
+    assert merged["campaigns"] == 3
+    assert normalised(merged["kpis"]) == normalised(whole["kpis"])
+    assert normalised(merged["score"]) == normalised(whole["score"])
+
+
+def test_batch_of_unreadable_files_has_no_portfolio(tmp_path):
+    missing = str(tmp_path / "missing.csv")
+    result = batch.analyse_batch([missing], workers=1)
+    assert result["campaigns"] == [] and result["portfolio"] is None
+    assert [e["name"] for e in result["errors"]] == ["missing.csv"]
+
+
+def test_kpi_only_read_skips_the_chart_pass(campaign_csv):
+    seen = []
+    agg, charts = stream_aggregate(io.BytesIO(campaign_csv), chunk_rows=5_000,
+                                   progress=lambda stage, share: seen.append(stage), charts=False)
+    assert charts is None and set(seen) == {"aggregating"}
+    assert agg.kpis() == stream_aggregate(io.BytesIO(campaign_csv), chunk_rows=5_000)[0].kpis()
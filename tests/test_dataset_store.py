@@ -0,0 +1,81 @@
+import io
+
+import pandas as pd
+
+from recoveriq import build_response, read_upload, stream_response
+from recoveriq.dataset_store import DatasetStore
+
+from conftest import normalised
+
+
+def test_saved_campaign_loads_back_with_categorical_labels(tmp_path, campaign_csv):
+    store = DatasetStore(str(tmp_path))
+    df = read_upload(io.BytesIO(campaign_csv))
+    meta = store.save("a" * 16, df, name="campaign.csv")
+    assert meta["rows"] == len(df) and meta["name"] == "campaign.csv"
+    back = store.load("a" * 16)
+    pd.testing.assert_frame_equal(back, df, check_categorical=False, check_dtype=False)
+    assert isinstance(back["Lead_State"].dtype, pd.CategoricalDtype)
+    assert pd.concat(store.batches("a" * 16, 3_000), ignore_index=True).equals(back)
+    assert max(len(b) for b in store.batches("a" * 16, 3_000)) == 3_000
+    assert [m["dataset_id"] for m in store.list()] == ["a" * 16]
+
+
+def test_streamed_chunks_store_the_same_rows(tmp_path, campaign_csv):
+    store = DatasetStore(str(tmp_path))
+    with store.writer("a" * 16) as w:
+        streamed = stream_response(io.BytesIO(campaign_csv), chunk_rows=3_000, on_chunk=w.write)
+    assert normalised(build_response(store.load("a" * 16))) == normalised(streamed)
+
+
+def test_uploaded_campaign_is_reanalysed_from_the_store(client, server, campaign_csv):
+    body = client.post("/api/upload", data={"file": (io.BytesIO(campaign_csv), "c.csv")}).get_json()
+    dataset_id = body["dataset_id"]
+    assert dataset_id in [m["dataset_id"] for m in client.get("/api/datasets").get_json()]
+    assert normalised(client.get(f"/api/datasets/{dataset_id}").get_json()) == normalised(body)
+    # A re-upload whose result was evicted is rebuilt from the stored rows
+    server.results.clear()
+    again = client.post("/api/upload", data={"file": (io.BytesIO(campaign_csv), "c.csv")})
+    assert again.headers["X-Cache"] == "MISS" and normalised(again.get_json()) == normalised(body)
+    assert client.get("/api/datasets/nope").status_code == 404
+
+
+def test_store_over_its_budget_evicts_the_least_recently_used(tmp_path):
+    df    = read_upload(io.BytesIO(b"Lead_ID,Lead_Entity_Disposition,Lead_State,AI_Attempted_Calls,"
+                                   b"AI_Connected_Calls,Total_Spend_INR\nA,PTP,active,1,1,10\n"))
+    probe = DatasetStore(str(tmp_path / "probe"))
+    probe.save("a" * 16, df)
+    size  = sum(size for size, _ in probe.disk_usage().values())
+    store = DatasetStore(str(tmp_path / "lru"), max_bytes=int(2.5 * size))
+    store.save("a" * 16, df)
+    store.save("b" * 16, df)
+    store.load("a" * 16)
+    store.save("c" * 16, df)
+    assert sorted(m["dataset_id"] for m in store.list()) == ["a" * 16, "c" * 16]
+    assert store.evictions == 1
+
+
+def test_deleted_campaign_is_gone_with_its_cached_result(client, campaign_csv):
+    first = client.post("/api/upload", data={"file": (io.BytesIO(campaign_csv), "c.csv")})
+    dataset_id = first.get_json()["dataset_id"]
+    assert client.delete(f"/api/datasets/{dataset_id}").status_code == 204
+    assert client.get(f"/api/datasets/{dataset_id}").status_code == 404
+    assert client.delete(f"/api/datasets/{dataset_id}").status_code == 404
+    again = client.post("/api/upload", data={"file": (io.BytesIO(campaign_csv), "c.csv")})
+    assert again.headers["X-Cache"] == "MISS" and again.get_json()["dataset_id"] == dataset_id
+
+
+def test_only_upload_ids_name_a_dataset(client):
+    csv = (b"Lead_ID,Lead_Entity_Disposition,Lead_State,AI_Attempted_Calls,AI_Connected_Calls,Total_Spend_INR\n"
+           b"ID1,PTP,active,4,1,10\nID2,RTP,paused,9,0,25\n")
+    dataset_id = client.post("/api/upload", data={"file": (io.BytesIO(csv), "ids.csv")}).get_json()["dataset_id"]
+    assert client.post(f"/api/datasets/{dataset_id}/records",
+                       json=[{"Lead_ID": "ID1", "AI_Attempted_Calls": 5}]).status_code == 200
+    # The update's delta file is not a dataset of its own
+    for other in (f"{dataset_id}.delta00001", f"{dataset_id}.json", dataset_id.upper()):
+        assert client.delete(f"/api/datasets/{other}").status_code == 404
+        assert client.get(f"/api/datasets/{other}").status_code == 404
+        assert client.post(f"/api/datasets/{other}/records", json=[{"Lead_ID": "ID1"}]).status_code == 404
+        assert client.get(f"/api/datasets/{other}/events").status_code == 404
+    resp = client.get(f"/api/datasets/{dataset_id}")
+    assert resp.status_code == 200 and resp.get_json()["kpis"]["total"] == 2
@@ -0,0 +1,85 @@
+import numpy as np
+
+from recoveriq import compute_charts, compute_kpis, generate_demo_data
+from recoveriq.engine import DENSITY_OUTLIERS, SCATTER_POINTS
+from recoveriq.schema import spend_values
+
+
+def _reference(df) -> dict:
+    """The KPI fields computed column by column with pandas."""
+    cm  = df["AI_Connected_Calls"] > 0
+    att = df["AI_Attempted_Calls"]
+    sp  = df["Total_Spend_INR"]
+    q1, q3 = np.quantile(sp.dropna(), (0.25, 0.75))
+    fence  = round(float(q3 + 1.5 * (q3 - q1)), 2)
+    return dict(
+        ptp_count=int((df["Lead_Entity_Disposition"] == "PTP").sum()),
+        connected_leads=int(cm.sum()),
+        attempted_leads=int((att > 0).sum()),
+        active_count=int((df["Lead_State"] == "active").sum()),
+        overattempted=int(((att > 12) & (df["AI_Connected_Calls"] == 0)).sum()),
+        avg_attempts=round(float(att.mean()), 1),
+        avg_attempts_connected=round(float(att[cm].mean()), 1),
+        avg_attempts_not_connected=round(float(att[~cm].mean()), 1),
+        total_spend=round(float(sp.sum()), 2),
+        spend_mean=round(float(sp.mean()), 2),
+        spend_std=round(float(sp.std()), 2),
+        cost_outlier_fence=fence,
+        cost_outliers=int((sp > fence).sum()),
+        spend_p50=round(float(np.quantile(sp.dropna(), 0.5)), 2),
+        attempts_p90=round(float(np.quantile(att.dropna(), 0.9)), 2),
+        dispositions={str(k): int(v) for k, v in df["Lead_Entity_Disposition"].value_counts().items()},
+    )
+
+
+def test_kpis_match_column_by_column_pandas():
+    df = generate_demo_data(5_000)
+    rng = np.random.default_rng(0)
+    for col in ("AI_Attempted_Calls", "AI_Connected_Calls", "Total_Spend_INR"):
+        df[col] = df[col].astype(float).mask(rng.random(len(df)) < 0.02)
+    k = compute_kpis(df)
+    assert {key: k[key] for key in _reference(df)} == _reference(df)
+
+
+def test_small_campaigns_plot_every_lead():
+    df     = generate_demo_data(SCATTER_POINTS)
+    charts = compute_charts(df)
+    sc     = charts["scatter"]
+    samp   = df.sample(len(df), random_state=42)
+    assert sc["mode"] == "points"
+    assert sc["x"] == samp["AI_Attempted_Calls"].tolist()
+    assert sc["y"] == spend_values(samp["Total_Spend_INR"]).tolist()
+    assert [sc["dispositions"][d] for d in sc["d"]] == samp["Lead_Entity_Disposition"].tolist()
+    assert sc["connected"] == (samp["AI_Connected_Calls"] > 0).astype(int).tolist()
+    att = df["AI_Attempted_Calls"].value_counts().sort_index()
+    assert charts["attempt_dist"] == {"labels": att.index.tolist(), "values": att.tolist()}
+
+
+def test_leads_without_a_disposition_are_left_off_the_points():
+    df = generate_demo_data(50)
+    df["Lead_Entity_Disposition"] = df["Lead_Entity_Disposition"].astype(object)
+    df.loc[::7, "Lead_Entity_Disposition"] = None
+    sc = compute_charts(df)["scatter"]
+    assert len(sc["x"]) == len(sc["d"]) == len(sc["connected"]) == df["Lead_Entity_Disposition"].notna().sum()
+    assert min(sc["d"]) >= 0 and max(sc["d"]) < len(sc["dispositions"])
+
+
+def test_density_grid_counts_every_lead_and_keeps_the_costliest():
+    df = generate_demo_data(20_000)
+    # Heavy tail: every 50th lead costs 100-5000 rupees
+    tail = np.round(np.random.default_rng(1).uniform(100, 5_000, len(df[::50])), 2)
+    df["Total_Spend_INR"] = spend_values(df["Total_Spend_INR"])
+    df.loc[::50, "Total_Spend_INR"] = tail
+    k  = compute_kpis(df)
+    sc = compute_charts(df)["scatter"]
+    assert sc["mode"] == "density"
+    cells = sc["cells"]
+    per_disposition = {}
+    for d, n in zip(cells["d"], cells["n"]):
+        name = sc["dispositions"][d]
+        per_disposition[name] = per_disposition.get(name, 0) + n
+    assert per_disposition == k["dispositions"]
+    spend = spend_values(df["Total_Spend_INR"])
+    above = np.sort(spend[spend > k["cost_outlier_fence"]])[::-1][:DENSITY_OUTLIERS]
+    assert len(above) == DENSITY_OUTLIERS
+    assert sc["outliers"]["y"] == np.round(above, 2).tolist()
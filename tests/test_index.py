@@ -0,0 +1,58 @@
+import io
+
+import numpy as np
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from recoveriq import compact
+from recoveriq.index import LeadIndex, QueryError, parse_filters
+from recoveriq.ingest import read_upload
+from recoveriq.schema import spend_values
+
+
+@pytest.fixture(scope="module")
+def campaign(campaign_csv):
+    return compact(read_upload(io.BytesIO(campaign_csv)))
+
+
+def test_filters_are_parsed_into_canonical_form():
+    args = MultiDict([("state", "paused,active"), ("state", "active"),
+                      ("attempts_gt", "8"), ("spend_max", "1e3")])
+    assert parse_filters(args) == {"state": ["active", "paused"],
+                                   "attempts": {"gt": 8.0}, "spend": {"max": 1000.0}}
+    assert parse_filters({"connected_min": ["1", "2"]}) == {"connected": {"min": 2.0}}
+
+
+@pytest.mark.parametrize("key, value", [("attempts_gte", "1"), ("city", "x"),
+                                        ("spend_lt", "ten"), ("attempts_gt", ""),
+                                        ("attempts_gt", "nan"), ("spend_max", "inf"),
+                                        ("connected_min", "-Infinity"), ("state", ""),
+                                        ("disposition", ",")])
+def test_bad_filters_are_rejected(key, value):
+    with pytest.raises(QueryError):
+        parse_filters({key: [value]})
+
+
+def test_select_matches_a_boolean_mask(campaign):
+    index   = LeadIndex(campaign)
+    filters = parse_filters({"state": ["active"], "disposition": ["PTP", "RTP", "Nope"],
+                             "attempts_gt": ["3"], "attempts_max": ["12"], "spend_lt": ["5000"]})
+    attempts = campaign["AI_Attempted_Calls"].to_numpy(dtype=float)
+    mask = (campaign["Lead_State"].astype(str).eq("active")
+            & campaign["Lead_Entity_Disposition"].astype(str).isin(["PTP", "RTP"])
+            & (attempts > 3) & (attempts <= 12)
+            & (spend_values(campaign["Total_Spend_INR"]) < 5000))
+    got = index.select(filters)
+    assert len(got) and np.array_equal(got, np.flatnonzero(mask.to_numpy()))
+    assert np.array_equal(index.select({}), np.arange(len(campaign)))
+    assert len(index.select({"state": ["nowhere"]})) == 0
+
+
+def test_non_finite_bound_is_a_bad_request(client, campaign_csv):
+    body = client.post("/api/upload", data={"file": (io.BytesIO(campaign_csv), "c.csv")}).get_json()
+    url  = f"/api/datasets/{body['dataset_id']}/query"
+    assert client.get(f"{url}?attempts_gt=nan").status_code == 400
+    assert client.get(f"{url}?state=").status_code == 400
+    assert client.get(f"{url}?attempts_gt=1000000").status_code == 404
+    ok = client.get(f"{url}?state=active").get_json()
+    assert ok["filters"] == {"state": ["active"]} and ok["kpis"]["total"] < body["kpis"]["total"]
@@ -0,0 +1,103 @@
+import gzip
+import io
+import zipfile
+
+import pandas as pd
+import pytest
+
+from recoveriq import UploadError, build_response, ingest, read_upload, stream_response
+from recoveriq.compressed import open_upload
+
+from conftest import normalised
+
+HEADER = b"Lead_ID,Lead_Entity_Disposition,Lead_State,AI_Attempted_Calls,AI_Connected_Calls,Total_Spend_INR\n"
+
+
+def _zip(data: bytes) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("campaign.csv", data)
+    return buf.getvalue()
+
+
+def _zstd(data: bytes) -> bytes:
+    zstandard = pytest.importorskip("zstandard")
+    return zstandard.ZstdCompressor().compress(data)
+
+
+@pytest.mark.parametrize("chunk_rows", [777, 100_000])
+def test_streaming_reader_matches_whole_file(campaign_csv, chunk_rows):
+    whole  = build_response(read_upload(io.BytesIO(campaign_csv)))
+    stream = stream_response(io.BytesIO(campaign_csv), chunk_rows=chunk_rows)
+    assert normalised(stream) == normalised(whole)
+
+
+@pytest.mark.parametrize("compress", [gzip.compress, _zip, _zstd], ids=["gzip", "zip", "zstd"])
+def test_compressed_upload_matches_plain(campaign_csv, compress):
+    plain = normalised(build_response(read_upload(io.BytesIO(campaign_csv))))
+    packed = compress(campaign_csv)
+    assert normalised(build_response(read_upload(open_upload(io.BytesIO(packed))))) == plain
+    assert normalised(stream_response(open_upload(io.BytesIO(packed)), chunk_rows=5_000)) == plain
+
+
+def test_zip_is_read_from_a_memory_map(tmp_path, campaign_csv):
+    path = tmp_path / "campaign.zip"
+    path.write_bytes(_zip(campaign_csv))
+    with open(path, "rb") as fh, ingest.mapped(fh) as data:
+        got = stream_response(open_upload(data), chunk_rows=5_000)
+    assert normalised(got) == normalised(build_response(read_upload(io.BytesIO(campaign_csv))))
+
+
+def test_streamed_upload_checks_the_header_first():
+    with pytest.raises(UploadError, match="Missing columns: Lead_State"):
+        stream_response(io.BytesIO(HEADER.replace(b"Lead_State,", b"") + b"A,PTP,1,1,10\n"))
+    with pytest.raises(UploadError, match="No rows"):
+        stream_response(io.BytesIO(HEADER))
+
+
+def _wide_export(campaign_csv: bytes) -> bytes:
+    """The campaign with the spend column under its alias and dialer columns on either side."""
+    df = pd.read_csv(io.BytesIO(campaign_csv)).rename(columns={"Total_Spend_INR": "Total_Spend (INR)"})
+    df.insert(0, "Agent_Notes", "called, no answer")
+    df["Dialer_Queue"] = "Q7"
+    return df.to_csv(index=False).encode()
+
+
+@pytest.mark.parametrize("arrow", [True, False])
+def test_only_the_analysed_columns_are_parsed(campaign_csv, monkeypatch, arrow):
+    if arrow:
+        pytest.importorskip("pyarrow")
+    else:
+        monkeypatch.setattr(ingest, "_arrow", lambda: (None, None))
+    df = read_upload(io.BytesIO(_wide_export(campaign_csv)))
+    assert sorted(df.columns) == sorted(ingest.COLUMNS)
+    assert isinstance(df["Lead_State"].dtype, pd.CategoricalDtype)
+    assert normalised(build_response(df)) == normalised(build_response(read_upload(io.BytesIO(campaign_csv))))
+
+
+
+@pytest.mark.parametrize("read", [read_upload, lambda f: stream_response(f, chunk_rows=2)],
+                         ids=["whole", "streamed"])
+def test_text_in_a_count_column_is_an_upload_error(read):
+    data = HEADER + b"A,PTP,active,1,1,10\nB,RTP,active,2,0,5\nC,PTP,paused,x,1,7\n"
+    with pytest.raises(UploadError, match="Column AI_Attempted_Calls must be numeric"):
+        read(io.BytesIO(data))
+
+
+def test_non_numeric_upload_is_a_bad_request(client):
+    data = HEADER + b"A,PTP,active,1,1,ten\n"
+    for query in ("", "?stream=1"):
+        resp = client.post(f"/api/upload{query}", data={"file": (io.BytesIO(data), "c.csv")})
+        assert resp.status_code == 400
+        assert resp.get_json()["error"] == "Column Total_Spend_INR must be numeric"
+    stored = client.post("/api/upload", data={"file": (io.BytesIO(HEADER + b"A,PTP,active,1,1,3\n"), "c.csv")})
+    dataset_id = stored.get_json()["dataset_id"]
+    resp = client.post(f"/api/datasets/{dataset_id}/records", json=[{"Lead_ID": "A", "AI_Connected_Calls": "x"}])
+    assert resp.status_code == 400 and resp.get_json()["error"] == "Column AI_Connected_Calls must be numeric"
+
+
+def test_stream_query_takes_the_chunked_reader(client, campaign_csv):
+    whole  = client.post("/api/upload", data={"file": (io.BytesIO(campaign_csv), "c.csv")})
+    stream = client.post("/api/upload?stream=1", data={"file": (io.BytesIO(campaign_csv), "c.csv")})
+    assert stream.status_code == 200
+    assert normalised(stream.get_json()) == normalised(whole.get_json())
@@ -0,0 +1,69 @@
+import io
+import threading
+import time
+
+import pytest
+
+from recoveriq.jobs import JobManager, QueueFull
+
+from conftest import normalised
+
+
+def _wait(job, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while job.finished is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return job
+
+
+def test_job_reports_progress_then_keeps_its_body():
+    manager = JobManager(workers=1)
+
+    def work(report, text):
+        report("aggregating", 0.5)
+        return text.encode()
+    job = _wait(manager.submit(work, "done"))
+    assert (job.status, job.stage, job.progress, job.body) == ("done", "done", 1.0, b"done")
+    assert manager.get(job.id) is job
+
+
+def test_job_keeps_the_exception_it_raised():
+    def work(report):
+        raise ValueError("bad rows")
+    job = _wait(JobManager(workers=1).submit(work))
+    assert job.status == "error" and job.stage == "failed"
+    assert job.to_dict()["error"] == "bad rows"
+
+
+def test_queue_is_capped():
+    manager = JobManager(workers=1, max_queued=1)
+    release = threading.Event()
+    running = manager.submit(lambda report: release.wait(30) and b"")
+    while running.status == "queued":
+        time.sleep(0.01)
+    waiting = manager.submit(lambda report: b"")
+    with pytest.raises(QueueFull):
+        manager.submit(lambda report: b"")
+    release.set()
+    assert _wait(waiting).status == "done"
+    assert _wait(manager.submit(lambda report: b"")).status == "done"
+
+
+def test_upload_job_gives_the_upload_payload(client, campaign_csv):
+    direct = normalised(client.post("/api/upload", data={"file": (io.BytesIO(campaign_csv), "c.csv")}).get_json())
+    resp = client.post("/api/jobs", data={"file": (io.BytesIO(campaign_csv), "c.csv")})
+    assert resp.status_code == 202
+    status_url, result_url = resp.get_json()["status_url"], resp.get_json()["result_url"]
+    deadline = time.monotonic() + 30
+    while client.get(status_url).get_json()["status"] in ("queued", "running") and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert normalised(client.get(result_url).get_json()) == direct
+    assert client.get("/api/jobs/nope").status_code == 404
+
+
+def test_full_job_queue_answers_503(client, server, monkeypatch):
+    def full(*args):
+        raise QueueFull("16 jobs are already waiting")
+    monkeypatch.setattr(server.jobs, "submit", full)
+    resp = client.post("/api/jobs", data={"file": (io.BytesIO(b"a,b\n1,2\n"), "c.csv")})
+    assert resp.status_code == 503 and resp.headers["Retry-After"]
@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from recoveriq import LiveCampaign, build_response, compact, generate_demo_data
+from recoveriq.dataset_store import DatasetStore
+from recoveriq.live import LiveCampaigns
+from recoveriq.schema import spend_values
+
+from conftest import normalised
+
+CAMPAIGN = "c" * 16
+
+
+def _records(rng, ids, n_new, step) -> pd.DataFrame:
+    """Updates to ``ids`` (some fields left empty) and ``n_new`` unseen leads."""
+    upd = pd.DataFrame({
+        "Lead_ID":                 ids,
+        "Lead_Entity_Disposition": rng.choice(["PTP", "RTP", "Brand_New", None], len(ids)),
+        "AI_Attempted_Calls":      rng.integers(0, 40, len(ids)).astype(float),
+        "Total_Spend_INR":         rng.integers(0, 20_000_000, len(ids)) / 100,
+    })
+    new = pd.DataFrame({
+        "Lead_ID":                 [f"N{step}-{i}" for i in range(n_new)],
+        "Lead_Entity_Disposition": "PTP",
+        "Lead_State":              rng.choice(["active", "paused"], n_new),
+        "AI_Attempted_Calls":      rng.integers(0, 15, n_new),
+        "AI_Connected_Calls":      rng.integers(0, 3, n_new),
+        "Total_Spend_INR":         12.34,
+    })
+    return pd.concat([upd, new], ignore_index=True)
+
+
+def test_upserts_match_a_full_recompute():
+    rng   = np.random.default_rng(3)
+    live  = LiveCampaign(generate_demo_data(3_000))
+    # Plain object columns, so updates can bring new categories
+    truth = generate_demo_data(3_000).astype(object).set_index("Lead_ID")
+    for step in range(6):
+        # Updates hit uploaded leads and leads inserted by earlier steps
+        ids   = rng.choice(truth.index.to_numpy(), 200, replace=False)
+        delta = _records(rng, ids, 1_500, step)
+        live.upsert(compact(delta))
+        given = delta.set_index("Lead_ID")
+        truth = truth.reindex(truth.index.append(given.index.difference(truth.index)))
+        truth.update(given)
+    assert len(live) == len(truth)
+    expected = normalised(build_response(compact(truth.reset_index())))
+    payload  = normalised(live.payload())
+    assert payload["kpis"] == expected["kpis"]
+    assert payload == normalised(build_response(live.frame))
+
+
+def test_density_grid_follows_upserts():
+    rng = np.random.default_rng(8)
+    df  = generate_demo_data(12_000)
+    # Heavy tail, so more leads are cost outliers than the scatter shows
+    df["Total_Spend_INR"] = spend_values(df["Total_Spend_INR"])
+    df.loc[::25, "Total_Spend_INR"] = np.round(rng.uniform(100, 5_000, len(df[::25])), 2)
+    live = LiveCampaign(df)
+    ids  = df["Lead_ID"]
+    live.payload()
+    for step in range(6):
+        # Leads trading values keep the campaign's spread, so the grid's edges and fence stay
+        pos   = rng.choice(len(ids), 40, replace=False)
+        delta = live.frame.take(rng.permutation(pos)).reset_index(drop=True)
+        delta.insert(0, "Lead_ID", ids.take(pos).to_numpy())
+        live.upsert(delta)
+        assert live._density is not None
+        assert normalised(live.payload()) == normalised(build_response(live.frame))
+    # One of the outliers shown drops to the fence: which lead takes its place takes a rescan
+    spend = spend_values(live.frame["Total_Spend_INR"])
+    lead  = ids.iloc[np.argsort(-spend, kind="stable")[99]]
+    live.upsert(pd.DataFrame({"Lead_ID": [lead], "Total_Spend_INR": [live.agg.spend_fence() + 0.01]}))
+    assert live._density is None
+    assert normalised(live.payload()) == normalised(build_response(live.frame))
+
+
+def _stored(tmp_path) -> LiveCampaigns:
+    store = DatasetStore(str(tmp_path))
+    store.save(CAMPAIGN, generate_demo_data(500))
+    return LiveCampaigns(store)
+
+
+def _update(attempts) -> pd.DataFrame:
+    """The first demo lead's attempts changed."""
+    lead = generate_demo_data(500)["Lead_ID"].iloc[0]
+    return compact(pd.DataFrame({"Lead_ID": [lead], "AI_Attempted_Calls": [attempts]}))
+
+
+def test_failed_store_write_leaves_the_campaign_unchanged(tmp_path, monkeypatch):
+    campaigns = _stored(tmp_path)
+    live      = campaigns.get(CAMPAIGN)
+    before    = normalised(live.payload())
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+    monkeypatch.setattr(campaigns.store, "append", fail)
+    with pytest.raises(OSError):
+        campaigns.upsert(CAMPAIGN, _update(99))
+    assert live.version == 0
+    assert normalised(live.payload()) == before
+
+
+def test_stored_updates_replay_to_the_same_payload(tmp_path):
+    campaigns = _stored(tmp_path)
+    campaigns.upsert(CAMPAIGN, _update(2.5))
+    payload = normalised(campaigns.get(CAMPAIGN).payload())
+    campaigns.close(CAMPAIGN)
+    assert normalised(campaigns.get(CAMPAIGN).payload()) == payload
+
+
+def test_campaign_stored_again_is_reopened(tmp_path):
+    campaigns = _stored(tmp_path)
+    campaigns.upsert(CAMPAIGN, _update(99))
+    # Evicted and uploaded again with no request in between to notice
+    campaigns.store.delete(CAMPAIGN)
+    campaigns.store.save(CAMPAIGN, generate_demo_data(500))
+    live = campaigns.get(CAMPAIGN)
+    assert live.version == 0
+    assert normalised(live.payload()) == normalised(build_response(generate_demo_data(500)))
@@ -0,0 +1,47 @@
+import io
+
+from recoveriq import metrics
+
+
+def test_stages_are_timed_only_inside_a_trace():
+    with metrics.timed("kpis"):
+        pass                                    # no trace: nothing to record into
+    with metrics.tracing() as trace:
+        with metrics.timed("parse"):
+            metrics.count_rows("parse", 10)
+        with metrics.timed("parse"):
+            metrics.count_rows("parse", 5)
+        with metrics.timed("kpis"):
+            pass
+    assert list(trace.stages) == ["parse", "kpis"]
+    assert trace.rows == {"parse": 15}
+    assert trace.server_timing().startswith("parse;dur=")
+
+
+def test_registry_renders_cumulative_histograms_and_counters():
+    registry = metrics.Registry()
+    for secs in (0.002, 0.02, 100):
+        registry.observe("recoveriq_request_seconds", secs, endpoint="upload")
+    registry.inc("recoveriq_requests_total", endpoint="upload", status=200)
+    registry.inc("recoveriq_requests_total", endpoint="upload", status=200)
+    registry.set("recoveriq_process_peak_rss_bytes", 1024)
+    lines = registry.render().splitlines()
+    assert "# TYPE recoveriq_request_seconds histogram" in lines
+    assert 'recoveriq_request_seconds_bucket{endpoint="upload",le="0.001"} 0' in lines
+    assert 'recoveriq_request_seconds_bucket{endpoint="upload",le="0.005"} 1' in lines
+    assert 'recoveriq_request_seconds_bucket{endpoint="upload",le="60.0"} 2' in lines
+    assert 'recoveriq_request_seconds_bucket{endpoint="upload",le="+Inf"} 3' in lines
+    assert 'recoveriq_request_seconds_count{endpoint="upload"} 3' in lines
+    assert 'recoveriq_requests_total{endpoint="upload",status="200"} 2' in lines
+    assert "recoveriq_process_peak_rss_bytes 1024" in lines
+
+
+def test_metrics_endpoint_reports_upload_stages(client, server):
+    data = (b"Lead_ID,Lead_Entity_Disposition,Lead_State,AI_Attempted_Calls,AI_Connected_Calls,Total_Spend_INR\n"
+            b"A,PTP,active,1,1,10\n")
+    client.post("/api/upload", data={"file": (io.BytesIO(data), "c.csv")})
+    resp = client.get("/metrics")
+    assert resp.content_type.startswith("text/plain; version=0.0.4")
+    text = resp.get_data(as_text=True)
+    assert 'recoveriq_stage_seconds_count{endpoint="upload",stage="kpis"}' in text
+    assert 'recoveriq_requests_total{endpoint="upload",status="200"}' in text
@@ -0,0 +1,17 @@
+import subprocess
+import sys
+
+import recoveriq
+
+
+def test_exports_resolve_lazily():
+    assert "compute_kpis" in dir(recoveriq)
+    assert recoveriq.compute_kpis is recoveriq.engine.compute_kpis
+
+
+def test_engine_imports_no_front_end():
+    code = ("import sys, recoveriq; recoveriq.build_response(recoveriq.generate_demo_data()); "
+            "import recoveriq.ingest, recoveriq.batch; "
+            "print(sorted(m for m in ('flask', 'streamlit', 'plotly') if m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "[]"
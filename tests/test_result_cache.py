@@ -0,0 +1,50 @@
+import io
+import os
+
+from recoveriq.result_cache import ResultCache, content_key
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = ResultCache(max_bytes=30)
+    for key in "abc":
+        cache.put(key, key.encode() * 10)
+    assert cache.get("a") == b"a" * 10          # a is now the most recent
+    cache.put("d", b"d" * 10)
+    assert cache.get("b") is None
+    assert [cache.get(k) is not None for k in "acd"] == [True, True, True]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_evicted_bodies_spill_to_disk_and_come_back(tmp_path):
+    cache = ResultCache(max_bytes=20, disk_dir=str(tmp_path), max_disk_bytes=15)
+    for key in "abc":
+        cache.put(key, key.encode() * 10)
+    assert sorted(os.listdir(tmp_path)) == ["a.json"]
+    os.utime(tmp_path / "a.json", (0, 0))       # older than anything written next
+    cache.put("d", b"d" * 10)
+    # b followed a to disk, which holds 15 bytes, so the older a was dropped
+    assert sorted(os.listdir(tmp_path)) == ["b.json"]
+    assert cache.get("a") is None
+    assert cache.get("b") == b"b" * 10
+    stats = cache.stats()
+    assert stats["disk_hits"] == 1 and stats["misses"] == 1
+    # Promoted back into memory, which pushed c out to disk
+    assert "b" in cache._mem and (tmp_path / "c.json").exists()
+
+
+def test_discarded_entry_is_gone_from_both_tiers(tmp_path):
+    cache = ResultCache(max_bytes=10, disk_dir=str(tmp_path))
+    cache.put("a", b"a" * 10)
+    cache.put("b", b"b" * 10)                   # a spills to disk
+    for key in "ab":
+        cache.discard(key)
+    assert cache.get("a") is None and cache.get("b") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["bytes"], stats["disk_entries"]) == (0, 2, 0, 0)
+
+
+def test_content_key_rewinds_the_stream():
+    f = io.BytesIO(b"xxpayload")
+    f.seek(2)
+    assert content_key(f) == content_key(io.BytesIO(b"payload"))
+    assert f.tell() == 2
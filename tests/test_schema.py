@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+
+from recoveriq import compute_kpis
+from recoveriq.schema import DISPOSITIONS, compact, spend_values
+
+
+def test_compact_narrows_every_column_and_keeps_the_kpis():
+    df = pd.DataFrame({
+        "Lead_ID":                 ["A", "B", "C"],
+        "Lead_Entity_Disposition": ["RTP", "Brand_New", "PTP"],
+        "Lead_State":              ["active", "active", "completed"],
+        "AI_Attempted_Calls":      [0, 3, 300],
+        "AI_Connected_Calls":      [0, 1, np.nan],
+        "Total_Spend_INR":         [10.05, 0.07, 99_999.99],
+    })
+    out = compact(df)
+    assert list(out["Lead_Entity_Disposition"].cat.categories) == DISPOSITIONS + ["Brand_New"]
+    assert isinstance(out["Lead_State"].dtype, pd.CategoricalDtype)
+    assert out["AI_Attempted_Calls"].dtype == np.uint16
+    assert out["AI_Connected_Calls"].dtype == np.float32
+    assert out["Total_Spend_INR"].dtype == np.float32
+    assert spend_values(out["Total_Spend_INR"]).tolist() == [10.05, 0.07, 99_999.99]
+    assert compute_kpis(out) == compute_kpis(df)
+
+
+def test_spend_past_float32_paise_stays_float64():
+    df  = pd.DataFrame({"Total_Spend_INR": [150_000.01, 3.5]})
+    out = compact(df)
+    assert out["Total_Spend_INR"].dtype == np.float64
+    assert out["Total_Spend_INR"].tolist() == [150_000.01, 3.5]
@@ -0,0 +1,249 @@
+import gzip
+import io
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import normalised
+
+HEADER = b"Lead_ID,Lead_Entity_Disposition,Lead_State,AI_Attempted_Calls,AI_Connected_Calls,Total_Spend_INR\n"
+
+
+def _upload(client, data: bytes, name: str = "campaign.csv", query: str = ""):
+    return client.post(f"/api/upload{query}", data={"file": (io.BytesIO(data), name)})
+
+
+def test_settings_are_read_from_prefixed_environment_variables(tmp_path):
+    env  = dict(os.environ, RECOVERIQ_DATASET_DIR=str(tmp_path), RECOVERIQ_LIVE_CAMPAIGNS="3",
+                RECOVERIQ_JOB_WORKERS="1", RECOVERIQ_MAX_CONTENT_LENGTH="4096")
+    code = ("import server; c = server.app.config; "
+            "print(c['DATASET_DIR'], c['LIVE_CAMPAIGNS'], c['JOB_WORKERS'], c['MAX_CONTENT_LENGTH'])")
+    out  = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    assert out.stdout.split() == [str(tmp_path), "3", "1", "4096"]
+
+
+# ── Uploads ───────────────────────────────────────────────────────────────────
+def test_fractional_and_negative_counts_are_analysed_and_stored(client, server):
+    data = HEADER + b"A,PTP,active,1.5,1,10.5\nB,RTP,active,-1,0,0.07\n"
+    # A different last row each time, so the streamed upload is not found in the store
+    for i, query in enumerate(("", "?stream=1")):
+        resp = _upload(client, data + f"C,RTP,inactive,{i},,1\n".encode(), query=query)
+        assert resp.status_code == 200, resp.get_json()
+        body = resp.get_json()
+        assert body["kpis"]["total"] == 3
+        assert server.store.exists(body["dataset_id"])
+        stored = normalised(client.get(f"/api/datasets/{body['dataset_id']}").get_json())
+        assert stored["kpis"] == normalised(body["kpis"])
+
+
+def test_failed_store_write_keeps_the_analysis(client, server, monkeypatch):
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+    monkeypatch.setattr(server.store, "save", fail)
+    resp = _upload(client, HEADER + b"A,PTP,active,1,1,10.5\n")
+    assert resp.status_code == 200
+    assert resp.get_json()["dataset_id"] is None
+    assert resp.get_json()["kpis"]["total"] == 1
+
+
+def test_reupload_after_eviction_is_rebuilt_from_the_store(client, server, campaign_csv, monkeypatch):
+    first = _upload(client, campaign_csv).get_json()
+    server.results.clear()
+    monkeypatch.setattr(server, "CHUNK_ROWS", 3_000)        # several record batches
+    monkeypatch.setattr(server.store, "load", None)          # never the whole campaign at once
+    again = _upload(client, campaign_csv).get_json()
+    assert normalised(again) == normalised(first)
+
+
+def test_repeat_upload_is_served_from_the_result_cache(client, campaign_csv):
+    before = client.get("/api/cache/stats").get_json()
+    first = _upload(client, campaign_csv)
+    again = _upload(client, campaign_csv, name="renamed.csv")
+    assert (first.headers["X-Cache"], again.headers["X-Cache"]) == ("MISS", "HIT")
+    assert normalised(again.get_json()) == normalised(first.get_json())
+    stats = client.get("/api/cache/stats").get_json()
+    assert (stats["hits"] - before["hits"], stats["misses"] - before["misses"]) == (1, 1)
+
+
+def test_cached_body_without_its_campaign_counts_as_a_miss(client, server, monkeypatch):
+    data = HEADER + b"A,PTP,active,3,1,10\nB,RTP,paused,6,2,30\n"
+    dataset_id = _upload(client, data).get_json()["dataset_id"]
+    client.delete(f"/api/datasets/{dataset_id}")
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+    monkeypatch.setattr(server.store, "save", fail)
+    before = client.get("/api/cache/stats").get_json()
+    for _ in range(2):
+        # Deleted, then not stored again: each repeat is analysed afresh
+        resp = _upload(client, data)
+        assert resp.headers["X-Cache"] == "MISS" and resp.get_json()["dataset_id"] is None
+    stats = client.get("/api/cache/stats").get_json()
+    assert (stats["hits"] - before["hits"], stats["misses"] - before["misses"]) == (0, 2)
+
+
+def test_empty_upload_is_a_bad_request_and_is_not_stored(client, server):
+    for data in (b"", HEADER):
+        resp = _upload(client, data)
+        assert resp.status_code == 400 and resp.get_json()["error"]
+        assert not server.store.exists(server.content_key(io.BytesIO(data))[:16])
+
+
+def test_body_over_the_limit_is_refused_with_json_413(client, server, monkeypatch, campaign_csv):
+    monkeypatch.setitem(server.app.config, "MAX_CONTENT_LENGTH", 64 * 1024)
+    resp = _upload(client, campaign_csv)
+    assert resp.status_code == 413
+    assert "65,536 bytes" in resp.get_json()["error"]
+    assert _upload(client, HEADER + b"A,PTP,active,1,1,10.5\n").status_code == 200
+
+
+def test_spooled_upload_is_analysed_like_one_in_memory(client, server, monkeypatch, campaign_csv):
+    in_memory = _upload(client, campaign_csv).get_json()
+    server.results.clear()
+    monkeypatch.setitem(server.app.config, "UPLOAD_SPOOL_BYTES", 1024)
+    monkeypatch.setattr(server.store, "exists", lambda dataset_id: False)   # analyse it again
+    spooled = _upload(client, campaign_csv).get_json()
+    assert normalised(spooled) == normalised(in_memory)
+
+
+# ── Demo and page validators ──────────────────────────────────────────────────
+@pytest.mark.parametrize("url", ["/", "/api/demo"])
+def test_fixed_bodies_answer_a_matching_etag_with_304(client, url):
+    first = client.get(url)
+    etag  = first.headers["ETag"]
+    assert first.status_code == 200 and first.cache_control.no_cache
+    again = client.get(url)
+    assert again.headers["ETag"] == etag and again.data == first.data
+    cached = client.get(url, headers={"If-None-Match": etag})
+    assert cached.status_code == 304 and cached.data == b""
+    assert client.get(url, headers={"If-None-Match": '"stale"'}).status_code == 200
+
+
+def test_demo_body_matches_a_fresh_build(client, server):
+    assert normalised(client.get("/api/demo").get_json()) == normalised(
+        server.build_response(server.generate_demo_data()))
+
+
+# ── Response encoding ─────────────────────────────────────────────────────────
+def test_gzip_is_negotiated_with_its_own_etag(client):
+    plain  = client.get("/api/demo")
+    zipped = client.get("/api/demo", headers={"Accept-Encoding": "gzip"})
+    assert zipped.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(zipped.data) == plain.data
+    assert zipped.headers["ETag"] == plain.headers["ETag"][:-1] + '-gzip"'
+    assert {"Accept", "Accept-Encoding"} <= set(zipped.vary)
+    # A validator only matches the representation it came with
+    headers = {"Accept-Encoding": "gzip", "If-None-Match": zipped.headers["ETag"]}
+    assert client.get("/api/demo", headers=headers).status_code == 304
+    headers["If-None-Match"] = plain.headers["ETag"]
+    assert client.get("/api/demo", headers=headers).status_code == 200
+
+
+def test_small_bodies_are_sent_uncompressed(client, server):
+    resp = client.get("/api/jobs/nope", headers={"Accept-Encoding": "gzip"})
+    assert len(resp.data) < server.app.config["COMPRESS_MIN_BYTES"]
+    assert "Content-Encoding" not in resp.headers
+
+
+def test_msgpack_is_negotiated_over_json(client):
+    msgpack = pytest.importorskip("msgpack")
+    plain  = client.get("/api/demo")
+    packed = client.get("/api/demo", headers={"Accept": "application/msgpack, application/json;q=0.5"})
+    assert packed.mimetype == "application/msgpack"
+    assert msgpack.unpackb(packed.data) == plain.get_json()
+    assert packed.headers["ETag"] == plain.headers["ETag"][:-1] + '-msgpack"'
+
+
+# ── Live updates ──────────────────────────────────────────────────────────────
+def test_records_update_the_stored_campaign(client):
+    dataset_id = _upload(client, HEADER + b"A,PTP,active,3,1,10\nB,RTP,paused,5,0,20\n").get_json()["dataset_id"]
+    resp = client.post(f"/api/datasets/{dataset_id}/records",
+                       json=[{"Lead_ID": "B", "Lead_Entity_Disposition": "PTP"},
+                             {"Lead_ID": "C", "Lead_Entity_Disposition": "RTP", "Lead_State": "active",
+                              "AI_Attempted_Calls": 1, "AI_Connected_Calls": 0, "Total_Spend_INR": 5}])
+    assert resp.status_code == 200, resp.get_json()
+    body = resp.get_json()
+    assert (body["kpis"]["total"], body["kpis"]["ptp_count"]) == (3, 2)
+    assert normalised(client.get(f"/api/datasets/{dataset_id}").get_json())["kpis"] == normalised(body["kpis"])
+    assert client.post(f"/api/datasets/{dataset_id}/records", json={"Lead_ID": "A"}).status_code == 400
+    assert client.post("/api/datasets/nope/records", json=[]).status_code == 404
+
+
+def test_csv_records_match_zero_padded_ids(client):
+    dataset_id = _upload(client, HEADER + b"00123,PTP,active,3,1,10\n00124,RTP,paused,5,0,20\n").get_json()["dataset_id"]
+    update = b"Lead_ID,AI_Attempted_Calls\n00124,9\n"
+    resp = client.post(f"/api/datasets/{dataset_id}/records", data={"file": (io.BytesIO(update), "u.csv")})
+    assert resp.status_code == 200, resp.get_json()
+    body = resp.get_json()
+    assert (body["inserted"], body["updated"], body["kpis"]["total"]) == (0, 1, 2)
+
+
+def test_query_after_a_reupload_sees_the_new_campaign(client):
+    data = HEADER + b"A,PTP,active,3,1,10\nB,RTP,paused,7,0,20\n"
+    lead = {"Lead_Entity_Disposition": "RTP", "AI_Attempted_Calls": 1, "AI_Connected_Calls": 0,
+            "Total_Spend_INR": 5}
+    dataset_id = _upload(client, data).get_json()["dataset_id"]
+    url = f"/api/datasets/{dataset_id}/query?state=active"
+    client.post(f"/api/datasets/{dataset_id}/records", json=[dict(lead, Lead_ID="C", Lead_State="active")])
+    assert client.get(url).get_json()["kpis"]["total"] == 2
+    # Stored again from scratch, then brought to the same version by a different update
+    assert client.delete(f"/api/datasets/{dataset_id}").status_code == 204
+    assert _upload(client, data).get_json()["dataset_id"] == dataset_id
+    client.post(f"/api/datasets/{dataset_id}/records", json=[dict(lead, Lead_ID="D", Lead_State="paused")])
+    assert client.get(url).get_json()["kpis"]["total"] == 1
+
+
+# ── Live event stream ─────────────────────────────────────────────────────────
+def _events(chunks) -> list:
+    """(event, id, data) for each event in an SSE body; comments and the retry hint are skipped."""
+    out = []
+    for block in "".join(c.decode() if isinstance(c, bytes) else c for c in chunks).split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if "event" in fields:
+            out.append((fields["event"], int(fields["id"]), json.loads(fields["data"])))
+    return out
+
+
+@pytest.fixture
+def live_stream(server, monkeypatch):
+    monkeypatch.setitem(server.app.config, "LIVE_PUSH_SECONDS", 0)
+    monkeypatch.setitem(server.app.config, "LIVE_KEEPALIVE_SECONDS", 0.01)
+    monkeypatch.setitem(server.app.config, "LIVE_STREAM_SECONDS", 0.5)
+
+
+def test_event_stream_sends_a_snapshot_then_patches(client, live_stream):
+    dataset_id = _upload(client, HEADER + b"A,PTP,active,3,1,10\nB,RTP,paused,4,0,20\n").get_json()["dataset_id"]
+    resp = client.get(f"/api/datasets/{dataset_id}/events", buffered=False)
+    assert resp.mimetype == "text/event-stream"
+    chunks = iter(resp.response)
+    head = [next(chunks), next(chunks)]
+    [(event, version, snapshot)] = _events(head)
+    assert event == "snapshot" and snapshot["kpis"]["total"] == 2
+    client.post(f"/api/datasets/{dataset_id}/records",
+                json=[{"Lead_ID": "C", "Lead_Entity_Disposition": "PTP", "Lead_State": "active",
+                       "AI_Attempted_Calls": 1, "AI_Connected_Calls": 1, "Total_Spend_INR": 5}])
+    events = _events(chunks)
+    assert [e[0] for e in events] == ["patch"]
+    _, patched, patch = events[0]
+    assert patched > version and patch["kpis"]["total"] == 3
+    # Only the KPI fields that changed are sent
+    assert all(snapshot["kpis"].get(k) != v for k, v in patch["kpis"].items())
+
+
+def test_event_stream_skips_the_snapshot_the_client_has(client, live_stream):
+    dataset_id = _upload(client, HEADER + b"A,PTP,active,2,1,10\n").get_json()["dataset_id"]
+    url = f"/api/datasets/{dataset_id}/events"
+    [(_, version, _)] = _events(client.get(url).response)
+    assert _events(client.get(f"{url}?since={version}").response) == []
+    assert _events(client.get(url, headers={"Last-Event-ID": str(version)}).response) == []
+    assert client.get("/api/datasets/nope/events").status_code == 404
+
+
+def test_event_stream_for_a_campaign_gone_meanwhile_just_ends(client, server, live_stream, monkeypatch):
+    dataset_id = _upload(client, HEADER + b"A,PTP,active,2,1,11\n").get_json()["dataset_id"]
+    monkeypatch.setattr(server.live, "get", lambda dataset_id: None)
+    resp = client.get(f"/api/datasets/{dataset_id}/events")
+    assert resp.status_code == 200 and resp.get_data() == b""
@@ -0,0 +1,27 @@
+import pandas as pd
+import pytest
+
+from recoveriq import synth
+from recoveriq.ingest import REQUIRED
+
+
+def test_csv_holds_every_generated_chunk(tmp_path):
+    path = str(tmp_path / "leads.csv")
+    seen = []
+    synth.write(path, 2_500, chunk_rows=1_000, seed=3, progress=seen.append)
+    assert seen == [1_000, 2_000, 2_500]
+    want = pd.concat(synth.generate_chunks(2_500, 1_000, seed=3), ignore_index=True)
+    got  = pd.read_csv(path)
+    assert got["Lead_ID"].tolist() == want["Lead_ID"].tolist()
+    assert got["Total_Spend_INR"].tolist() == want["Total_Spend_INR"].tolist()
+    assert (got["AI_Connected_Calls"] <= got["AI_Attempted_Calls"]).all()
+
+
+def test_parquet_and_time_spread(tmp_path):
+    pytest.importorskip("pyarrow")
+    path = str(tmp_path / "leads.parquet")
+    synth.write(path, 1_200, chunk_rows=500, days=7, spend_dist="lognormal")
+    df = pd.read_parquet(path)
+    assert len(df) == 1_200 and REQUIRED <= set(df.columns)
+    span = pd.Timestamp("2025-01-01") - df["Last_Call_At"]
+    assert span.min() >= pd.Timedelta(0) and span.max() <= pd.Timedelta(days=7)